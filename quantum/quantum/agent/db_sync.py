@@ -0,0 +1,187 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import sqlalchemy
+from sqlalchemy import exc
+from sqlalchemy import orm
+
+
+class Row(object):
+    """A copy of a database row, still available once the row is gone"""
+
+    def __init__(self, row):
+        for column in orm.object_mapper(row).columns:
+            setattr(self, column.key, getattr(row, column.key))
+
+    def __repr__(self):
+        return "<Row(%s)>" % self.__dict__
+
+
+class DbSync(object):
+    """Keeps copies of quantum tables read through SqlSoup.
+
+    The quantum server records the rows it inserts, updates or deletes in
+    the numbered changes table, so that only the rows changed since the
+    last update are read. All the rows are read again every
+    resync_interval seconds, after request_resync(), when the changes
+    the copies are missing were pruned, and on every update if the
+    database has no changes table.
+
+    Changes are numbered when they are written but become visible when
+    their transaction commits, so a change may show up after one with a
+    higher number was read. The numbers missing below the last change
+    read are looked for again on every update, for gap_timeout seconds.
+
+    :param tables: the key column of each table to copy, by table name.
+    """
+
+    def __init__(self, tables, resync_interval=60, gap_timeout=60):
+        self.tables = tables
+        self.resync_interval = resync_interval
+        self.gap_timeout = gap_timeout
+        # Row objects by key, by table name
+        self.rows = dict((name, {}) for name in tables)
+        self.last_change = None
+        # When each missing change was found missing, by change id
+        self._gaps = {}
+        self._last_resync = None
+
+    def request_resync(self):
+        self._last_resync = None
+
+    def update(self, db):
+        """Brings the copies up to date.
+
+        :returns: whether all the rows were read again, and by table name,
+            the old and new Row objects by key of the rows that changed,
+            None for a row that was inserted or deleted.
+        """
+        try:
+            changes = db.changes
+        except exc.NoSuchTableError:
+            changes = None
+        if changes is None:
+            return True, self._read_all(db)
+
+        min_id, max_id = db.session.query(
+            sqlalchemy.func.min(changes.id),
+            sqlalchemy.func.max(changes.id)).one()
+        max_id = max_id or 0
+        pruned = (self.last_change is None or max_id < self.last_change or
+                  (min_id is not None and min_id > self.last_change + 1))
+        if pruned:
+            self.last_change = (min_id or 1) - 1
+            self._gaps = {}
+        if (pruned or self._last_resync is None or
+                time.time() - self._last_resync >= self.resync_interval):
+            # Keep track of the changes still missing, which the rows read
+            # now may not include
+            self._read_changes(changes, max_id)
+            return True, self._read_all(db)
+        if max_id == self.last_change and not self._gaps:
+            return False, {}
+
+        keys = dict((name, set()) for name in self.tables)
+        for change in self._read_changes(changes, max_id):
+            if change.table_name in keys:
+                keys[change.table_name].add(change.row_key)
+
+        changed = {}
+        for name, row_keys in keys.iteritems():
+            if row_keys:
+                changed[name] = self._read_rows(db, name, row_keys)
+        return False, changed
+
+    def update_column(self, db, name, column, values):
+        """Sets a column of rows of a table, with one UPDATE for all the
+        rows that get the same value. The copies are updated as well, the
+        changes are committed by the caller.
+
+        :param values: the new value of the column, by row key.
+        """
+        rows = self.rows[name]
+        keys_by_value = {}
+        for key, value in values.iteritems():
+            row = rows.get(key)
+            if row is not None and getattr(row, column) != value:
+                keys_by_value.setdefault(value, []).append(key)
+        if not keys_by_value:
+            return
+        entity = db.entity(name)
+        key_column = getattr(entity, self.tables[name])
+        for value, keys in keys_by_value.iteritems():
+            (db.session.query(entity).
+             filter(key_column.in_(keys)).
+             update({column: value}, synchronize_session=False))
+            for key in keys:
+                setattr(rows[key], column, value)
+
+    def _read_changes(self, changes, max_id):
+        """Returns the changes up to max_id that were not read yet, i.e.
+        those after the last one read and those missing below it.
+        """
+        query = changes.filter(changes.id > self.last_change)
+        if self._gaps:
+            query = changes.filter(sqlalchemy.or_(
+                changes.id > self.last_change,
+                changes.id.in_(list(self._gaps))))
+        found = query.filter(changes.id <= max_id).all()
+        seen = set(change.id for change in found)
+        now = time.time()
+        for change_id in xrange(self.last_change + 1, max_id + 1):
+            if change_id not in seen:
+                self._gaps[change_id] = now
+        for change_id, missing_since in self._gaps.items():
+            # Changes of transactions that were rolled back never show up
+            if (change_id in seen or
+                    now - missing_since >= self.gap_timeout):
+                del self._gaps[change_id]
+        self.last_change = max_id
+        return found
+
+    def _read_all(self, db):
+        self._last_resync = time.time()
+        old_rows = self.rows
+        self.rows = {}
+        changed = {}
+        for name, key in self.tables.iteritems():
+            self.rows[name] = dict((getattr(row, key), Row(row))
+                                   for row in db.entity(name).all())
+            old, new = old_rows.get(name, {}), self.rows[name]
+            changed[name] = dict((k, (old.get(k), new.get(k)))
+                                 for k in set(old) | set(new))
+        return changed
+
+    def _read_rows(self, db, name, row_keys):
+        entity = db.entity(name)
+        key = self.tables[name]
+        key_column = getattr(entity, key)
+        if isinstance(key_column.property.columns[0].type,
+                      sqlalchemy.Integer):
+            row_keys = [int(k) for k in row_keys]
+        new_rows = dict((getattr(row, key), Row(row)) for row in
+                        entity.filter(key_column.in_(row_keys)).all())
+        rows = self.rows[name]
+        changed = {}
+        for k in row_keys:
+            old = rows.pop(k, None)
+            new = new_rows.get(k)
+            if new is not None:
+                rows[k] = new
+            changed[k] = (old, new)
+        return changed
@@ -18,6 +18,9 @@
 # @author: Dan Wendlandt, Nicira Networks, Inc.
 # @author: Dave Lapsley, Nicira Networks, Inc.
 
+import contextlib
+import itertools
+import json
 import logging
 import shlex
 import signal
@@ -27,6 +30,24 @@ from quantum.agent.linux import utils
 
 LOG = logging.getLogger(__name__)
 
+# Whether "ovs-ofctl --bundle" works here, None until it has been tried
+_ofctl_bundle_supported = None
+
+
+def decode_ovsdb_value(value):
+    """Converts a value from the JSON output of ovs-vsctl or ovsdb-client to
+    python: maps to dicts, sets to lists and uuids to strings.
+    """
+    if isinstance(value, list) and len(value) == 2:
+        kind, data = value
+        if kind == "map":
+            return dict((k, decode_ovsdb_value(v)) for k, v in data)
+        if kind == "set":
+            return [decode_ovsdb_value(v) for v in data]
+        if kind in ("uuid", "named-uuid"):
+            return data
+    return value
+
 
 class VifPort:
     def __init__(self, port_name, ofport, vif_id, vif_mac, switch):
@@ -47,6 +68,9 @@ class OVSBridge:
     def __init__(self, br_name, root_helper):
         self.br_name = br_name
         self.root_helper = root_helper
+        # ("add" | "del" | "del_all", flow_str) while flows are deferred
+        self._deferred_flows = None
+        self._defer_depth = 0
 
     def run_vsctl(self, args):
         full_args = ["ovs-vsctl", "--timeout=2"] + args
@@ -68,15 +92,22 @@ class OVSBridge:
         args = ["clear", table_name, record, column]
         self.run_vsctl(args)
 
-    def run_ofctl(self, cmd, args):
+    def run_ofctl(self, cmd, args, process_input=None):
         full_args = ["ovs-ofctl", cmd, self.br_name] + args
-        return utils.execute(full_args, root_helper=self.root_helper)
+        if process_input is None:
+            return utils.execute(full_args, root_helper=self.root_helper)
+        return utils.execute(full_args, root_helper=self.root_helper,
+                             process_input=process_input)
 
     def count_flows(self):
         flow_list = self.run_ofctl("dump-flows", []).split("\n")[1:]
         return len(flow_list) - 1
 
     def remove_all_flows(self):
+        if self._deferred_flows is not None:
+            # supersedes whatever was deferred so far
+            self._deferred_flows = [("del_all", None)]
+            return
         self.run_ofctl("del-flows", [])
 
     def get_port_ofport(self, port_name):
@@ -124,6 +155,9 @@ class OVSBridge:
         flow_expr_arr = self._build_flow_expr_arr(**kwargs)
         flow_expr_arr.append("actions=%s" % (kwargs["actions"]))
         flow_str = ",".join(flow_expr_arr)
+        if self._deferred_flows is not None:
+            self._deferred_flows.append(("add", flow_str))
+            return
         self.run_ofctl("add-flow", [flow_str])
 
     def delete_flows(self, **kwargs):
@@ -132,8 +166,70 @@ class OVSBridge:
         if "actions" in kwargs:
             flow_expr_arr.append("actions=%s" % (kwargs["actions"]))
         flow_str = ",".join(flow_expr_arr)
+        if self._deferred_flows is not None:
+            self._deferred_flows.append(("del", flow_str))
+            return
         self.run_ofctl("del-flows", [flow_str])
 
+    @contextlib.contextmanager
+    def deferred_flows(self):
+        """Defers the flows added and deleted in the block.
+
+        They are applied in order when the outermost deferred_flows block
+        exits, with one ovs-ofctl call, reading the flows from stdin, per
+        run of additions or deletions. A remove_all_flows() followed only
+        by additions becomes a single replace_flows().
+        """
+        if self._deferred_flows is None:
+            self._deferred_flows = []
+        self._defer_depth += 1
+        try:
+            yield self
+        finally:
+            self._defer_depth -= 1
+            if not self._defer_depth:
+                flows, self._deferred_flows = self._deferred_flows, None
+                self._apply_flows(flows)
+
+    def _apply_flows(self, flows):
+        if flows and flows[0][0] == "del_all":
+            if all(action == "add" for action, flow_str in flows[1:]):
+                self.replace_flows([flow_str for action, flow_str
+                                    in flows[1:]])
+                return
+        for action, group in itertools.groupby(flows, lambda f: f[0]):
+            flow_strs = [flow_str for a, flow_str in group]
+            if action == "del_all":
+                self.run_ofctl("del-flows", [])
+            elif len(flow_strs) == 1:
+                self.run_ofctl(action == "add" and "add-flow" or "del-flows",
+                               flow_strs)
+            else:
+                self.run_ofctl("%s-flows" % action, ["-"],
+                               process_input="\n".join(flow_strs) + "\n")
+
+    def replace_flows(self, flow_strs):
+        """Replaces all the flows of the bridge with the given ones.
+
+        ovs-ofctl only changes the flows that differ, and does so
+        atomically when it supports --bundle (OpenFlow 1.4).
+        """
+        global _ofctl_bundle_supported
+        process_input = "".join(flow_str + "\n" for flow_str in flow_strs)
+        if _ofctl_bundle_supported is not False:
+            try:
+                self.run_ofctl("replace-flows", ["--bundle", "-"],
+                               process_input=process_input)
+                _ofctl_bundle_supported = True
+                return
+            except RuntimeError:
+                if _ofctl_bundle_supported:
+                    raise
+                LOG.info("ovs-ofctl --bundle is not supported, flows will "
+                         "not be replaced atomically")
+                _ofctl_bundle_supported = False
+        self.run_ofctl("replace-flows", ["-"], process_input=process_input)
+
     def add_tunnel_port(self, port_name, remote_ip):
         self.run_vsctl(["add-port", self.br_name, port_name])
         self.set_db_attribute("Interface", port_name, "type", "gre")
@@ -168,6 +264,18 @@ class OVSBridge:
             ret[arr[0]] = arr[1].strip("\"")
         return ret
 
+    def db_list(self, table, columns):
+        """Returns every row of a table, as a dict of the given columns, with
+        a single ovs-vsctl call.
+        """
+        res = self.run_vsctl(["--format=json",
+                              "--columns=%s" % ",".join(columns),
+                              "list", table])
+        result = json.loads(res)
+        return [dict(zip(result["headings"],
+                         [decode_ovsdb_value(v) for v in row]))
+                for row in result["data"]]
+
     def get_port_name_list(self):
         res = self.run_vsctl(["list-ports", self.br_name])
         return res.split("\n")[0:-1]
@@ -181,24 +289,41 @@ class OVSBridge:
                               "uuid=%s" % xs_vif_uuid],
                              root_helper=self.root_helper).strip()
 
+    # returns a VIF object for a port if it is a VIF port, None otherwise
+    def get_vif_port(self, name, ofport, external_ids):
+        if "iface-id" in external_ids and "attached-mac" in external_ids:
+            return VifPort(name, ofport, external_ids["iface-id"],
+                           external_ids["attached-mac"], self)
+        elif ("xs-vif-uuid" in external_ids and
+              "attached-mac" in external_ids):
+            # if this is a xenserver and iface-id is not automatically
+            # synced to OVS from XAPI, we grab it from XAPI directly
+            iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
+            return VifPort(name, ofport, iface_id,
+                           external_ids["attached-mac"], self)
+        return None
+
+    # returns (name, ofport, external_ids) for each port of the bridge, with
+    # two ovs-vsctl calls whatever the number of ports
+    def get_port_interfaces(self):
+        interfaces = dict((row["name"], row) for row in
+                          self.db_list("Interface",
+                                       ["name", "ofport", "external_ids"]))
+        port_interfaces = []
+        for name in self.get_port_name_list():
+            if name in interfaces:
+                row = interfaces[name]
+                # ofport as "ovs-vsctl get" prints it, "[]" if unset
+                port_interfaces.append((name, str(row["ofport"]),
+                                        row["external_ids"]))
+        return port_interfaces
+
     # returns a VIF object for each VIF port
     def get_vif_ports(self):
         edge_ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            external_ids = self.db_get_map("Interface", name, "external_ids")
-            ofport = self.db_get_val("Interface", name, "ofport")
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                p = VifPort(name, ofport, external_ids["iface-id"],
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-                p = VifPort(name, ofport, iface_id,
-                            external_ids["attached-mac"], self)
+        for name, ofport, external_ids in self.get_port_interfaces():
+            p = self.get_vif_port(name, ofport, external_ids)
+            if p:
                 edge_ports.append(p)
 
         return edge_ports
@@ -0,0 +1,194 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2012 Nicira Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import logging
+import os
+import select
+import shlex
+import subprocess
+import time
+
+from quantum.agent.linux import ovs_lib
+
+LOG = logging.getLogger(__name__)
+
+
+class OvsdbMonitor(object):
+    """Streams the changes to an OVSDB table from a long-lived
+    'ovsdb-client monitor' process.
+
+    The first update lists the existing rows, as if they had all just been
+    inserted.
+    """
+
+    def __init__(self, root_helper, table="Interface",
+                 columns=("name", "ofport", "external_ids")):
+        self.root_helper = root_helper
+        self.table = table
+        self.columns = columns
+        self._process = None
+        self._buffer = ""
+
+    def start(self):
+        cmd = ["ovsdb-client", "monitor", self.table, ",".join(self.columns),
+               "--format=json"]
+        if self.root_helper:
+            cmd = shlex.split(self.root_helper) + cmd
+        LOG.debug("Running command: " + " ".join(cmd))
+        self._process = subprocess.Popen(cmd, shell=False, close_fds=True,
+                                         stdout=subprocess.PIPE)
+        self._buffer = ""
+
+    def stop(self):
+        if self.is_running():
+            self._process.terminate()
+            self._process.wait()
+        self._process = None
+
+    def is_running(self):
+        return self._process is not None and self._process.poll() is None
+
+    def get_updates(self, timeout):
+        """Waits up to timeout seconds for changes to the table.
+
+        Returns the rows inserted or modified since the last call, by
+        name, and the names of the rows deleted since then. A row deleted
+        and inserted again is in both.
+        """
+        updates = {}
+        deletes = set()
+        for line in self._read_lines(timeout):
+            try:
+                update = json.loads(line)
+            except ValueError:
+                LOG.warn("Ignoring unexpected ovsdb-client output: %s" % line)
+                continue
+            headings = update.get("headings", [])
+            for data in update.get("data", []):
+                row = dict(zip(headings, [ovs_lib.decode_ovsdb_value(v)
+                                          for v in data]))
+                action = row.pop("action", None)
+                name = row.get("name")
+                if action == "delete":
+                    updates.pop(name, None)
+                    deletes.add(name)
+                elif action in ("initial", "insert", "new"):
+                    updates[name] = row
+        return updates, deletes
+
+    def _read_lines(self, timeout):
+        if not self.is_running():
+            return []
+        fd = self._process.stdout.fileno()
+        deadline = time.time() + timeout
+        while True:
+            ready = select.select([fd], [], [],
+                                  max(0, deadline - time.time()))[0]
+            if not ready:
+                break
+            data = os.read(fd, 65536)
+            if not data:
+                LOG.warn("ovsdb-client monitor exited")
+                self._process.wait()
+                break
+            self._buffer += data
+            # Only wait for the first chunk, then drain what is available
+            deadline = 0
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        return [line for line in lines if line.strip()]
+
+
+class VifPortWatcher(object):
+    """Reports the VIF ports of a bridge that appeared, changed or
+    disappeared.
+
+    Without a monitor, every call lists all the ports of the bridge
+    through ovs-vsctl. With an OvsdbMonitor of the Interface table, calls
+    wait up to polling_interval seconds for interface changes and only
+    look at the interfaces that changed. All the ports are still listed
+    every resync_interval seconds, when the monitor had to be (re)started
+    and after request_resync().
+    """
+
+    def __init__(self, bridge, monitor=None, polling_interval=2,
+                 resync_interval=60):
+        self.bridge = bridge
+        self.monitor = monitor
+        self.polling_interval = polling_interval
+        self.resync_interval = resync_interval
+        # VifPort objects by vif id, and vif ids by port name
+        self.vif_ports = {}
+        self._vif_ids = {}
+        self._last_resync = None
+
+    def request_resync(self):
+        self._last_resync = None
+
+    def get_changes(self):
+        """Returns whether all the ports were listed, the VIF ports that
+        appeared or changed (all of them after a listing) and the VIF
+        ports that disappeared.
+        """
+        if self.monitor:
+            if not self.monitor.is_running():
+                self.monitor.start()
+                self._last_resync = None
+            if ((self._last_resync is not None and
+                 time.time() - self._last_resync < self.resync_interval)):
+                updates, deletes = self.monitor.get_updates(
+                    self.polling_interval)
+                changed, gone = self._apply(updates, deletes)
+                return False, changed, gone
+            # The listing covers the changes streamed so far
+            self.monitor.get_updates(0)
+        self._last_resync = time.time()
+        ports = self.bridge.get_vif_ports()
+        new_vif_ports = dict((p.vif_id, p) for p in ports)
+        gone = [p for vif_id, p in self.vif_ports.iteritems()
+                if vif_id not in new_vif_ports]
+        self.vif_ports = new_vif_ports
+        self._vif_ids = dict((p.port_name, p.vif_id) for p in ports)
+        return True, ports, gone
+
+    def _apply(self, updates, deletes):
+        gone = []
+        for name in deletes:
+            vif_id = self._vif_ids.pop(name, None)
+            if vif_id in self.vif_ports:
+                gone.append(self.vif_ports.pop(vif_id))
+        if not updates:
+            return [], gone
+
+        changed = []
+        port_names = set(self.bridge.get_port_name_list())
+        for name, row in updates.iteritems():
+            port = None
+            ofport = row.get("ofport")
+            # ofport is an empty set, or -1, until the port is ready
+            if name in port_names and ofport not in ([], -1, None):
+                port = self.bridge.get_vif_port(name, str(ofport),
+                                                row.get("external_ids", {}))
+            old = self.vif_ports.get(self._vif_ids.pop(name, None))
+            if old and (not port or port.vif_id != old.vif_id or
+                        port.ofport != old.ofport):
+                gone.append(self.vif_ports.pop(old.vif_id))
+            if port:
+                self._vif_ids[name] = port.vif_id
+                self.vif_ports[port.vif_id] = port
+                changed.append(port)
+        return changed, gone
@@ -17,36 +17,137 @@
 #
 # @author: Juliano Martinez, Locaweb.
 
+import json
 import logging
 import os
 import shlex
+import socket
 import subprocess
+import threading
 
 LOG = logging.getLogger(__name__)
 
+_root_helper_daemon = None
+
+
+class RootHelperDaemonClient(object):
+    """Runs privileged commands through a quantum-rootwrap-daemon.
+
+    The daemon is started with daemon_cmd, e.g.
+    "sudo quantum-rootwrap-daemon", the first time a command is run, and
+    exits along with this process. A command then costs a round trip on
+    a UNIX socket instead of forking sudo and quantum-rootwrap.
+    """
+
+    def __init__(self, daemon_cmd):
+        self.daemon_cmd = daemon_cmd
+        self._lock = threading.Lock()
+        self._process = None
+        self._socket_path = None
+        self._sock = None
+        self._rfile = None
+
+    def _start_daemon(self):
+        """Starts the daemon and returns the path of its socket"""
+        if self._process and self._process.poll() is None:
+            return self._socket_path
+        cmd = shlex.split(self.daemon_cmd)
+        LOG.debug("Starting root helper daemon: " + " ".join(cmd))
+        self._process = subprocess.Popen(cmd, shell=False, close_fds=True,
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE)
+        # The daemon creates its socket where we cannot tamper with it
+        status = self._process.stdout.readline().split(None, 1)
+        if len(status) != 2 or status[0] != "ready":
+            self._process.wait()
+            raise RuntimeError("Root helper daemon %s failed to start" %
+                               self.daemon_cmd)
+        return status[1].strip()
+
+    def _connect(self):
+        self._socket_path = self._start_daemon()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self._socket_path)
+        self._rfile = self._sock.makefile("rb")
+
+    def _disconnect(self):
+        if self._sock:
+            self._rfile.close()
+            self._sock.close()
+        self._sock = self._rfile = None
+
+    def _call(self, request):
+        if not self._sock:
+            self._connect()
+        self._sock.sendall(request)
+        reply = self._rfile.readline()
+        if not reply:
+            raise socket.error("Root helper daemon closed the connection")
+        return json.loads(reply)
+
+    def execute(self, cmd, process_input=None):
+        """Returns the exit code, stdout and stderr of a command"""
+        if process_input is not None:
+            process_input = process_input.decode("latin-1")
+        request = json.dumps({"cmd": cmd,
+                              "process_input": process_input}) + "\n"
+        with self._lock:
+            try:
+                reply = self._call(request)
+            except socket.error:
+                # The daemon died or was restarted, try again once
+                self._disconnect()
+                reply = self._call(request)
+        return (reply["returncode"], reply["stdout"].encode("latin-1"),
+                reply["stderr"].encode("latin-1"))
+
+    def stop(self):
+        with self._lock:
+            self._disconnect()
+            if self._process:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process = None
+
+
+def set_root_helper_daemon(daemon_cmd):
+    """Runs the commands given a root_helper through a daemon started
+    with daemon_cmd, or again through the root_helper if it is None.
+    """
+    global _root_helper_daemon
+    if _root_helper_daemon:
+        _root_helper_daemon.stop()
+    _root_helper_daemon = daemon_cmd and RootHelperDaemonClient(daemon_cmd)
+
 
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False):
-    if root_helper:
-        cmd = shlex.split(root_helper) + cmd
     cmd = map(str, cmd)
+    if root_helper and _root_helper_daemon and not addl_env:
+        LOG.debug("Running command through the root helper daemon: " +
+                  " ".join(cmd))
+        returncode, _stdout, _stderr = _root_helper_daemon.execute(
+            cmd, process_input)
+    else:
+        if root_helper:
+            cmd = shlex.split(root_helper) + cmd
+        LOG.debug("Running command: " + " ".join(cmd))
+        env = os.environ.copy()
+        if addl_env:
+            env.update(addl_env)
+        obj = subprocess.Popen(cmd, shell=False, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               env=env)
 
-    LOG.debug("Running command: " + " ".join(cmd))
-    env = os.environ.copy()
-    if addl_env:
-        env.update(addl_env)
-    obj = subprocess.Popen(cmd, shell=False, stdin=subprocess.PIPE,
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                           env=env)
-
-    _stdout, _stderr = (process_input and
-                        obj.communicate(process_input) or
-                        obj.communicate())
-    obj.stdin.close()
+        _stdout, _stderr = (process_input and
+                            obj.communicate(process_input) or
+                            obj.communicate())
+        obj.stdin.close()
+        returncode = obj.returncode
     m = ("\nCommand: %s\nExit code: %s\nStdout: %r\nStderr: %r" %
-        (cmd, obj.returncode, _stdout, _stderr))
+        (cmd, returncode, _stdout, _stderr))
     LOG.debug(m)
-    if obj.returncode and check_exit_code:
+    if returncode and check_exit_code:
         raise RuntimeError(m)
 
     return return_stderr and (_stdout, _stderr) or _stdout
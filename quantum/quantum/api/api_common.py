@@ -46,6 +46,17 @@ class OperationalStatus:
     UNKNOWN = "UNKNOWN"
 
 
+def get_all_ports_details(plugin, tenant_id, net_id):
+    """
+    Returns the details of all the ports of a network, in one call if the
+    plugin supports it, or one call per port otherwise.
+    """
+    if hasattr(plugin, 'get_all_ports_details'):
+        return plugin.get_all_ports_details(tenant_id, net_id)
+    return [plugin.get_port_details(tenant_id, net_id, port['port-id'])
+            for port in plugin.get_all_ports(tenant_id, net_id)]
+
+
 def create_resource(version, controller_dict):
     """
     Generic function for creating a wsgi resource
@@ -51,16 +51,11 @@ class Controller(common.QuantumController):
         # We expect get_network_details to return information
         # concerning logical ports as well.
         network = self._plugin.get_network_details(tenant_id, network_id)
-        # Doing this in the API is inefficient
-        # TODO(salvatore-orlando): This should be fixed with Bug #834012
         # Don't pass filter options
         ports_data = None
         if port_details:
-            port_list = self._plugin.get_all_ports(tenant_id, network_id)
-            ports_data = [
-                self._plugin.get_port_details(tenant_id, network_id,
-                                              port['port-id'])
-                for port in port_list]
+            ports_data = common.get_all_ports_details(self._plugin,
+                                                      tenant_id, network_id)
         builder = networks_view.get_view_builder(request, self.version)
         result = builder.build(network, net_details,
                                ports_data, port_details)['network']
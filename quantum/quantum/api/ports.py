@@ -64,14 +64,13 @@ class Controller(common.QuantumController):
         builder = ports_view.get_view_builder(request, self.version)
 
         # Load extra data for ports if required.
-        # This can be inefficient.
-        # TODO(salvatore-orlando): the fix for bug #834012 should deal with it
+        # Only the ports left by the plugin's own filters are kept
         if port_details:
-            port_list_detail = [
-                self._plugin.get_port_details(tenant_id, network_id,
-                                              port['port-id'])
-                for port in port_list]
-            port_list = port_list_detail
+            port_ids = set(port['port-id'] for port in port_list)
+            port_list = [port for port in
+                         common.get_all_ports_details(self._plugin,
+                                                      tenant_id, network_id)
+                         if port['port-id'] in port_ids]
 
         # Perform manual filtering if not supported by plugin
         # Inefficient, API-layer filtering
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import logging
+import urllib
 
 import webob.exc
 
@@ -27,11 +28,15 @@ LOG = logging.getLogger(__name__)
 XML_NS_V20 = 'http://openstack.org/quantum/api/v2.0'
 
 FAULT_MAP = {exceptions.NotFound: webob.exc.HTTPNotFound,
+             exceptions.BadRequest: webob.exc.HTTPBadRequest,
              exceptions.InUse: webob.exc.HTTPConflict,
              exceptions.MacAddressGenerationFailure:
              webob.exc.HTTPServiceUnavailable,
              exceptions.StateInvalid: webob.exc.HTTPBadRequest}
 
+# Query parameters that control paging rather than filter the collection
+PAGING_PARAMS = ('limit', 'marker', 'page_reverse', 'sort_key', 'sort_dir')
+
 
 def fields(request):
     """
@@ -54,7 +59,7 @@ def filters(request):
     """
     res = {}
     for key in set(request.GET):
-        if key in ('verbose', 'fields'):
+        if key in ('verbose', 'fields') or key in PAGING_PARAMS:
             continue
 
         values = [v for v in request.GET.getall(key) if v]
@@ -95,6 +100,78 @@ def verbose(request):
     return verbose
 
 
+def sorting(request, attr_info):
+    """
+    Extracts the sort order from the request string
+
+    Returns a list of (key, ascending) tuples, pairing each sort_key with
+    the sort_dir at the same position:
+
+    sort_key=name&sort_dir=desc&sort_key=id
+
+    becomes
+
+    [('name', False), ('id', True)]
+    """
+    keys = [v for v in request.GET.getall('sort_key') if v]
+    dirs = [v for v in request.GET.getall('sort_dir') if v]
+    if len(dirs) > len(keys):
+        msg = _("The number of sort_dir and sort_key values differ")
+        raise webob.exc.HTTPBadRequest(msg)
+    sorts = []
+    for i, key in enumerate(keys):
+        if key not in attr_info:
+            msg = _("%s is not a valid sort key") % key
+            raise webob.exc.HTTPBadRequest(msg)
+        direction = i < len(dirs) and dirs[i].lower() or 'asc'
+        if direction not in ('asc', 'desc'):
+            msg = _("%s is not a valid sort direction") % dirs[i]
+            raise webob.exc.HTTPBadRequest(msg)
+        sorts.append((key, direction == 'asc'))
+    return sorts
+
+
+def pagination(request):
+    """
+    Extracts the page to return from the request string
+
+    Returns a (limit, marker, page_reverse) tuple. limit is None if the
+    whole collection was requested; otherwise the page holds up to limit
+    items after the item whose id is marker, or before it if page_reverse
+    is true.
+    """
+    limit = request.GET.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            msg = _("limit must be a positive integer")
+            raise webob.exc.HTTPBadRequest(msg)
+    marker = request.GET.get('marker') or None
+    page_reverse = utils.boolize(request.GET.get('page_reverse', False))
+    return limit, marker, page_reverse is True
+
+
+def _sort_key(sorts):
+    """Returns a key function for sorted() from a list of sorts"""
+    def key(obj):
+        return [_Reversed(obj.get(k)) if not asc else obj.get(k)
+                for k, asc in sorts]
+    return key
+
+
+class _Reversed(object):
+    """Wraps a value so that it sorts in descending order"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __cmp__(self, other):
+        return cmp(other.value, self.value)
+
+
 class Controller(object):
     def __init__(self, plugin, collection, resource, attr_info):
         self._plugin = plugin
@@ -102,25 +179,147 @@ class Controller(object):
         self._resource = resource
         self._attr_info = attr_info
         self._view = getattr(views, self._resource)
+        # NOTE: Only the plugin class that declares the attribute itself
+        #       handles paging; subclasses overriding get_<collection>
+        #       have to declare it again.
+        self._native_paging = getattr(
+            plugin, '_%s__native_pagination_support' %
+            plugin.__class__.__name__, False) is True
 
     def _items(self, request, do_authz=False):
         """Retrieves and formats a list of elements of the requested entity"""
         kwargs = {'filters': filters(request),
                   'verbose': verbose(request),
                   'fields': fields(request)}
+        sorts = sorting(request, self._attr_info)
+        limit, marker, page_reverse = pagination(request)
+        paging = bool(sorts or limit or marker)
+        if paging and 'id' not in [k for k, asc in sorts]:
+            # Makes the order unique, so markers are unambiguous
+            sorts.append(('id', True))
+        requested = kwargs['fields']
+        if paging and requested:
+            # The sort keys and ids are needed to page through the items
+            kwargs['fields'] = requested + [k for k, asc in sorts
+                                            if k not in requested]
+        if paging and self._native_paging:
+            kwargs['sorts'] = sorts
+            if limit:
+                # Asks for one more item to know if there is a next page
+                kwargs['limit'] = limit + 1
+            kwargs['marker'] = marker
+            kwargs['page_reverse'] = page_reverse
 
         obj_getter = getattr(self._plugin, "get_%s" % self._collection)
-        obj_list = obj_getter(request.context, **kwargs)
-
-        # Check authz
-        if do_authz:
-            # Omit items from list that should not be visible
-            obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
-                                        "get_%s" % self._resource,
-                                        obj)]
+        if paging and self._native_paging:
+            obj_list = self._fetch_page(request.context, obj_getter, kwargs,
+                                        limit, page_reverse, do_authz)
+        else:
+            obj_list = obj_getter(request.context, **kwargs)
+            if do_authz:
+                obj_list = self._authorized(request.context, obj_list)
+            if paging:
+                obj_list = self._emulate_paging(obj_list, sorts, limit,
+                                                marker, page_reverse)
+
+        links = []
+        if limit:
+            has_more = len(obj_list) > limit
+            if page_reverse:
+                obj_list = obj_list[-limit:]
+            else:
+                obj_list = obj_list[:limit]
+            links = self._paging_links(request, obj_list, limit, marker,
+                                       page_reverse, has_more)
+
+        if paging and requested:
+            obj_list = [dict((k, v) for k, v in obj.iteritems()
+                             if k in requested) for obj in obj_list]
+
+        # NOTE: The views are built as the response is serialized
+        result = {self._collection: (self._view(obj) for obj in obj_list)}
+        if links:
+            result['%s_links' % self._collection] = links
+        return result
+
+    def _authorized(self, context, obj_list):
+        """Omits the items that should not be visible in this context"""
+        return policy.filter(context, "get_%s" % self._resource, obj_list)
+
+    def _fetch_page(self, context, obj_getter, kwargs, limit, page_reverse,
+                    do_authz):
+        """
+        Gets a page from a plugin that sorts and pages itself. Items the
+        context may not see are dropped before the page is cut, so the
+        plugin is asked for more until there is one visible item more than
+        the limit, or no more items.
+        """
+        obj_list = []
+        while True:
+            fetched = visible = obj_getter(context, **kwargs)
+            if do_authz:
+                visible = self._authorized(context, fetched)
+            if page_reverse:
+                obj_list = visible + obj_list
+            else:
+                obj_list = obj_list + visible
+            if (not limit or len(fetched) < kwargs['limit'] or
+                    len(obj_list) > limit):
+                return obj_list
+            # Goes on after the furthest item fetched
+            if page_reverse:
+                kwargs['marker'] = fetched[0]['id']
+            else:
+                kwargs['marker'] = fetched[-1]['id']
 
-        return {self._collection: [self._view(obj) for obj in obj_list]}
+    def _emulate_paging(self, obj_list, sorts, limit, marker, page_reverse):
+        """
+        Sorts and pages the items of a plugin that does not do it itself,
+        returning one item more than the limit if there is another page
+        """
+        obj_list = sorted(obj_list, key=_sort_key(sorts),
+                          reverse=page_reverse)
+        if marker:
+            ids = [obj['id'] for obj in obj_list]
+            if marker not in ids:
+                msg = _("marker %s not found") % marker
+                raise webob.exc.HTTPBadRequest(msg)
+            obj_list = obj_list[ids.index(marker) + 1:]
+        if limit:
+            obj_list = obj_list[:limit + 1]
+        if page_reverse:
+            obj_list.reverse()
+        return obj_list
+
+    def _paging_links(self, request, obj_list, limit, marker, page_reverse,
+                      has_more):
+        """Builds the next and previous links of a page"""
+        if not obj_list:
+            return []
+        params = [(k, unicode(v).encode('utf-8'))
+                  for k, v in request.GET.items()
+                  if k not in ('limit', 'marker', 'page_reverse')]
+        params.append(('limit', limit))
+
+        def _link(rel, marker, page_reverse):
+            link_params = params + [('marker', marker)]
+            if page_reverse:
+                link_params.append(('page_reverse', 'True'))
+            href = '%s?%s' % (request.path_url, urllib.urlencode(link_params))
+            return {'rel': rel, 'href': href}
+
+        # Paging backwards, the marker is what comes next and the extra
+        # item fetched says whether there is a previous page
+        if page_reverse:
+            has_next, has_previous = bool(marker), has_more
+        else:
+            has_next, has_previous = has_more, bool(marker)
+        links = []
+        if has_next:
+            links.append(_link('next', obj_list[-1]['id'], False))
+        if has_previous:
+            links.append(_link('previous', obj_list[0]['id'], True))
+        return links
 
     def _item(self, request, id, do_authz=False):
         """Retrieves and formats a single element of the requested entity"""
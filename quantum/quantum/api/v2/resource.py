@@ -17,19 +17,66 @@
 Utility methods for working with WSGI servers redux
 """
 import logging
+import types
 
 import webob
 import webob.dec
 import webob.exc
 
 from quantum.common import exceptions
+from quantum.common import json_codec as json
 from quantum import context
-from quantum.openstack.common import jsonutils as json
 from quantum import wsgi
 
 
 LOG = logging.getLogger(__name__)
 
+# Bytes of encoded JSON gathered before a chunk is handed to the server
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def json_stream(data, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the JSON encoding of data in chunks.
+
+    The lists and generators that are values of a top level dictionary,
+    such as the collection of a list response, are encoded an item at a
+    time, so the whole document is never held in memory at once.
+    """
+    if not isinstance(data, dict):
+        yield json.dumps(data)
+        return
+    parts = ['{']
+    size = 1
+    for i, (key, value) in enumerate(data.iteritems()):
+        parts.append('%s%s: ' % (i and ', ' or '', json.dumps(key)))
+        if not isinstance(value, (list, tuple, types.GeneratorType)):
+            parts.append(json.dumps(value))
+            continue
+        parts.append('[')
+        for j, item in enumerate(value):
+            part = json.dumps(item)
+            if j:
+                parts.append(', ')
+            parts.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield ''.join(parts)
+                parts = []
+                size = 0
+        parts.append(']')
+    parts.append('}')
+    yield ''.join(parts)
+
+
+def _expand(result):
+    """Turns the generators in a result into lists"""
+    if not isinstance(result, dict):
+        return result
+    return dict((key, list(value)
+                 if isinstance(value, types.GeneratorType) else value)
+                for key, value in result.iteritems())
+
 
 class Request(webob.Request):
     """Add some Openstack API-specific logic to the base webob.Request."""
@@ -56,12 +103,15 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
                              'application/json': lambda x: json.loads(x)}
     default_serializers = {'application/xml': wsgi.XMLDictSerializer(),
                            'application/json': lambda x: json.dumps(x)}
+    stream_serializers = {'application/json': json_stream}
     format_types = {'xml': 'application/xml',
                     'json': 'application/json'}
     action_status = dict(create=201, delete=204)
 
     default_deserializers.update(deserializers or {})
     default_serializers.update(serializers or {})
+    for content_type in serializers or {}:
+        stream_serializers.pop(content_type, None)
 
     deserializers = default_deserializers
     serializers = default_serializers
@@ -114,12 +164,18 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             raise webob.exc.HTTPInternalServerError(**kwargs)
 
         status = action_status.get(action, 200)
-        body = serializer(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
-            content_type = ''
-            body = None
+            return webob.Response(request=request, status=status,
+                                  content_type='', body=None)
+
+        if content_type in stream_serializers:
+            app_iter = stream_serializers[content_type](result)
+            return webob.Response(request=request, status=status,
+                                  content_type=content_type,
+                                  app_iter=app_iter)
 
+        body = serializer(_expand(result))
         return webob.Response(request=request, status=status,
                               content_type=content_type,
                               body=body)
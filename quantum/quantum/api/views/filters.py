@@ -18,6 +18,8 @@
 
 import logging
 
+from quantum.api import api_common as common
+
 
 LOG = logging.getLogger(__name__)
 
@@ -28,12 +30,8 @@ def _load_network_ports_details(network, **kwargs):
     #load network details only if required
     if not 'net-ports' in network:
         # Don't pass filter options, don't care about unused filters
-        port_list = plugin.get_all_ports(tenant_id, network['net-id'])
-        ports_data = [plugin.get_port_details(
-                      tenant_id, network['net-id'],
-                      port['port-id'])
-                      for port in port_list]
-        network['net-ports'] = ports_data
+        network['net-ports'] = common.get_all_ports_details(
+            plugin, tenant_id, network['net-id'])
 
 
 def _filter_network_by_name(network, name, **kwargs):
@@ -102,7 +100,9 @@ def _do_filtering(items, filters, filter_opts, plugin,
                   tenant_id, network_id=None):
     filtered_items = []
     for item in items:
-        is_filter_match = False
+        # The plugin may have applied every filter known here already,
+        # and the options the API does not know are ignored
+        is_filter_match = True
         for flt in filters:
             if flt in filter_opts:
                 is_filter_match = filters[flt](item,
@@ -148,9 +148,10 @@ def filter_ports(ports, plugin, tenant_id, network_id, filter_opts):
         'op-status': _filter_port_by_op_status,
         'has-attachment': _filter_port_has_interface,
         'attachment': _filter_port_by_interface}
-    # port details are need for filtering
-    ports = [plugin.get_port_details(tenant_id, network_id,
-             port['port-id']) for port in ports]
+    # port details are need for filtering, unless already loaded
+    ports = [port if 'port-state' in port else
+             plugin.get_port_details(tenant_id, network_id, port['port-id'])
+             for port in ports]
     # filter ports
     return _do_filtering(ports,
                          filters,
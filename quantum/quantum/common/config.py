@@ -35,6 +35,7 @@ LOG = logging.getLogger(__name__)
 bind_opts = [
     cfg.StrOpt('bind_host', default='0.0.0.0'),
     cfg.IntOpt('bind_port', default=9696),
+    cfg.IntOpt('api_workers', default=0),
     cfg.StrOpt('api_paste_config', default="api-paste.ini"),
     cfg.StrOpt('api_extensions_path', default=""),
     cfg.StrOpt('core_plugin',
@@ -45,11 +46,22 @@ bind_opts = [
 cfg.CONF.register_opts(bind_opts)
 
 
+# The command line arguments the configuration was last parsed from
+_args = None
+
+
 def parse(args):
+    global _args
+    _args = args
     cfg.CONF(args=args, project='quantum',
              version='%%prog %s' % version_string())
 
 
+def reload_config():
+    """Reads the config files again, with the same command line arguments"""
+    parse(_args)
+
+
 def setup_logging(conf):
     """
     Sets up the logging options for a log with supplied name
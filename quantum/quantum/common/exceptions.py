@@ -105,6 +105,10 @@ class MalformedRequestBody(QuantumException):
     message = _("Malformed request body: %(reason)s")
 
 
+class BadRequest(QuantumException):
+    message = _("Bad %(resource)s request: %(msg)s")
+
+
 class Invalid(Error):
     pass
 
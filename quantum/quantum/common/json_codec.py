@@ -0,0 +1,89 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""JSON encoding and decoding of API requests and responses.
+
+dumps() and loads() behave like the ones of jsonutils, but use the first
+module of BACKENDS that can be imported and has its C extension, and
+build its encoder and decoder once rather than on every call. Plain
+dicts, lists and strings are encoded directly, to_primitive is only
+called for the values the backend cannot encode.
+"""
+
+import json
+import logging
+
+from quantum.openstack.common import importutils
+from quantum.openstack.common import jsonutils
+
+
+LOG = logging.getLogger(__name__)
+
+# Modules with the interface of json, by order of preference
+BACKENDS = ['simplejson', 'json']
+
+backend = None
+_encoder = None
+_decoder = None
+_decode_str = False
+
+
+def _has_speedups(module):
+    if module is json:
+        return True
+    try:
+        return module._import_c_make_encoder() is not None
+    except AttributeError:
+        return False
+
+
+def use_backend(module):
+    """Makes dumps() and loads() use a module with the interface of json"""
+    global backend, _encoder, _decoder, _decode_str
+    kwargs = {}
+    if module.__name__ == 'simplejson':
+        # Encode namedtuples and Decimals as the json module does
+        kwargs = {'namedtuple_as_object': False, 'use_decimal': False}
+    _encoder = module.JSONEncoder(default=jsonutils.to_primitive, **kwargs)
+    _decoder = module.JSONDecoder()
+    # Other modules may return the ASCII strings of a str as str
+    _decode_str = module is not json
+    backend = module
+
+
+def dumps(value):
+    return _encoder.encode(value)
+
+
+def loads(s):
+    if _decode_str and isinstance(s, str):
+        s = s.decode('utf-8')
+    return _decoder.decode(s)
+
+
+def _load_backend():
+    for name in BACKENDS:
+        try:
+            module = importutils.import_module(name)
+        except ImportError:
+            continue
+        if _has_speedups(module):
+            return module
+        LOG.debug(_("Not using %s, its C extension is missing"), name)
+    return json
+
+
+use_backend(_load_backend())
@@ -19,6 +19,7 @@
 
 import logging
 import time
+import weakref
 
 import sqlalchemy as sql
 from sqlalchemy import create_engine
@@ -36,6 +37,8 @@ LOG = logging.getLogger(__name__)
 _ENGINE = None
 _MAKER = None
 BASE = model_base.BASE
+# The engines of this module and of the plugins with their own database
+_ENGINES = weakref.WeakSet()
 
 
 class MySQLPingListener(object):
@@ -79,12 +82,28 @@ def configure_db(options):
             engine_args['listeners'] = [MySQLPingListener()]
 
         _ENGINE = create_engine(options['sql_connection'], **engine_args)
+        register_engine(_ENGINE)
         base = options.get('base', BASE)
         if not register_models(base):
             if 'reconnect_interval' in options:
                 retry_registration(options['reconnect_interval'], base)
 
 
+def register_engine(engine):
+    """Has dispose_engines() close the connections of an engine"""
+    _ENGINES.add(engine)
+
+
+def dispose_engines():
+    """
+    Closes the connections of the pools of every registered engine.
+    Processes forked afterwards open their own connections instead of
+    sharing them.
+    """
+    for engine in list(_ENGINES):
+        engine.dispose()
+
+
 def clear_db(base=BASE):
     global _ENGINE
     assert _ENGINE
@@ -146,11 +165,65 @@ def network_all_tenant_list():
     return session.query(models.Network).all()
 
 
-def network_list(tenant_id):
+def _port_criterion(name, value, active_op_status):
+    """
+    Returns the condition on ports for a filter of the API, None if the
+    filter is not known. With active_op_status, the op-status of ports
+    that are not ACTIVE is taken as DOWN, as plugins report it.
+    """
+    port = models.Port
+    if name == 'state':
+        return port.state == value
+    elif name == 'op-status':
+        if not active_op_status:
+            return port.op_status == value
+        elif value == OperationalStatus.DOWN:
+            return sql.or_(port.state != 'ACTIVE', port.op_status == value)
+        return sql.and_(port.state == 'ACTIVE', port.op_status == value)
+    elif name == 'attachment':
+        return port.interface_id == value
+    elif name == 'has-attachment':
+        if value.lower() == 'true':
+            return port.interface_id.isnot(None)
+        return port.interface_id.is_(None)
+    elif name == 'port':
+        return port.uuid == value
+
+
+# Network filters on the ports of the network, and the port filter each
+# one applies to them.
+NETWORK_PORT_FILTERS = {'port-state': 'state',
+                        'port-op-status': 'op-status',
+                        'attachment': 'attachment',
+                        'port': 'port'}
+
+
+def network_list(tenant_id, filter_opts=None, active_op_status=False):
+    """
+    Returns the networks of a tenant. The filters of the API in
+    filter_opts are applied by the query, and removed from filter_opts.
+    """
     session = get_session()
-    return (session.query(models.Network).
-            filter_by(tenant_id=tenant_id).
-            all())
+    query = (session.query(models.Network).
+             filter_by(tenant_id=tenant_id))
+    for name, value in (filter_opts or {}).items():
+        if name == 'name':
+            query = query.filter(models.Network.name == value)
+        elif name == 'op-status':
+            query = query.filter(models.Network.op_status == value)
+        elif name == 'has-attachment':
+            has_attachment = models.Network.ports.any(
+                models.Port.interface_id.isnot(None))
+            if value.lower() != 'true':
+                has_attachment = sql.not_(has_attachment)
+            query = query.filter(has_attachment)
+        elif name in NETWORK_PORT_FILTERS:
+            query = query.filter(models.Network.ports.any(_port_criterion(
+                NETWORK_PORT_FILTERS[name], value, active_op_status)))
+        else:
+            continue
+        del filter_opts[name]
+    return query.all()
 
 
 def network_get(net_id):
@@ -221,13 +294,24 @@ def port_create(net_id, state=None, op_status=OperationalStatus.UNKNOWN):
         return port
 
 
-def port_list(net_id):
+def port_list(net_id, filter_opts=None, active_op_status=False):
+    """
+    Returns the ports of a network. The filters of the API in filter_opts
+    are applied by the query, and removed from filter_opts.
+    """
     # confirm network exists
     network_get(net_id)
     session = get_session()
-    return (session.query(models.Port).
-            filter_by(network_id=net_id).
-            all())
+    query = (session.query(models.Port).
+             filter_by(network_id=net_id))
+    for name, value in (filter_opts or {}).items():
+        criterion = None
+        if name != 'port':
+            criterion = _port_criterion(name, value, active_op_status)
+        if criterion is not None:
+            query = query.filter(criterion)
+            del filter_opts[name]
+    return query.all()
 
 
 def port_get(port_id, net_id, session=None):
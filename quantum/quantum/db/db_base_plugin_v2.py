@@ -19,6 +19,7 @@ import random
 import netaddr
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
+from sqlalchemy import sql
 
 from quantum.api.v2 import router as api_router
 from quantum.common import exceptions as q_exc
@@ -39,6 +40,8 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         certain events.
     """
 
+    __native_pagination_support = True
+
     def __init__(self):
         # NOTE(jkoelker) This is an incomlete implementation. Subclasses
         #                must override __init__ and setup the database
@@ -63,8 +66,8 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         query = context.session.query(model)
 
         # NOTE(jkoelker) non-admin queries are scoped to their tenant_id
-        if not context.is_admin and hasattr(model.tenant_id):
-            query = query.filter(tenant_id=context.tenant_id)
+        if not context.is_admin and hasattr(model, 'tenant_id'):
+            query = query.filter_by(tenant_id=context.tenant_id)
 
         return query
 
@@ -121,14 +124,98 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         return resource
 
     def _get_collection(self, context, model, dict_func, filters=None,
-                        fields=None, verbose=None):
+                        fields=None, verbose=None, sorts=None, limit=None,
+                        marker=None, page_reverse=False, joins=()):
+        """
+        Lists the rows of model as dicts made by dict_func. joins names the
+        relationships dict_func reads; those needed for the requested
+        fields are loaded for all the rows at once, in one more query each,
+        rather than lazily for every row.
+        """
         collection = self._model_query(context, model)
         if filters:
             for key, value in filters.iteritems():
                 column = getattr(model, key, None)
                 if column:
                     collection = collection.filter(column.in_(value))
-        return [dict_func(c, fields) for c in collection.all()]
+        if sorts:
+            collection = self._apply_sorts(context, collection, model,
+                                           sorts, marker, page_reverse)
+        if limit:
+            collection = collection.limit(limit)
+        columns = model.__table__.columns
+        if fields and all(field in columns for field in fields):
+            # NOTE: Only plain columns were asked for, so the rows need not
+            #       be turned into full objects with their relationships
+            fields = list(set(fields))
+            collection = collection.with_entities(
+                *[getattr(model, field) for field in fields])
+            items = [dict(zip(fields, row)) for row in collection]
+        else:
+            options = [orm.subqueryload(join) for join in joins
+                       if not fields or join in fields]
+            if options:
+                collection = collection.options(*options)
+            items = [dict_func(c, fields) for c in collection]
+        if page_reverse:
+            items.reverse()
+        return items
+
+    def _apply_sorts(self, context, query, model, sorts, marker=None,
+                     page_reverse=False):
+        """
+        Orders the query by the given (key, ascending) sorts, which must
+        make the order unique. With a marker, only the rows that come after
+        the row whose id is marker are kept, or those that come before it
+        in reverse order if page_reverse is true. NULLs sort before any
+        value, as they do when the API sorts the items itself.
+        """
+        columns = []
+        order = []
+        for key, asc in sorts:
+            if key not in model.__table__.columns:
+                raise q_exc.BadRequest(resource=model.__tablename__,
+                                       msg=_("cannot sort by %s") % key)
+            column = getattr(model, key)
+            asc = asc != page_reverse
+            nullable = model.__table__.columns[key].nullable
+            columns.append((column, asc, nullable))
+            # NOTE: Databases differ on where NULLs go, so they are
+            #       explicitly put first in ascending order
+            clauses = [column]
+            if nullable:
+                clauses.insert(0, column != sql.null())
+            for clause in clauses:
+                if asc:
+                    order.append(clause.asc())
+                else:
+                    order.append(clause.desc())
+        query = query.order_by(*order)
+        if not marker:
+            return query
+        try:
+            marker_obj = self._get_by_id(context, model, marker)
+        except exc.NoResultFound:
+            raise q_exc.BadRequest(resource=model.__tablename__,
+                                   msg=_("marker %s not found") % marker)
+        values = [getattr(marker_obj, column.key) for column, a, n in columns]
+        criteria = []
+        for i, (column, asc, nullable) in enumerate(columns):
+            clause = [columns[j][0] == values[j] for j in range(i)]
+            if values[i] is None:
+                if not asc:
+                    # Nothing comes after a NULL in descending order
+                    continue
+                clause.append(column != sql.null())
+            elif asc:
+                clause.append(column > values[i])
+            elif nullable:
+                clause.append(sql.or_(column < values[i],
+                                      column == sql.null()))
+            else:
+                clause.append(column < values[i])
+            criteria.append(sql.and_(*clause))
+        return query.filter(sql.or_(*criteria))
 
     @staticmethod
     def _generate_mac(context, network_id):
@@ -197,7 +284,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         # NOTE(jkoelker) Get the tenant_id outside of the session to avoid
         #                unneeded db action if the operation raises
         tenant_id = self._get_tenant_id_for_create(context, n)
-        with context.session.begin():
+        with context.session.begin(subtransactions=True):
             network = models_v2.Network(tenant_id=tenant_id,
                                         name=n['name'],
                                         admin_state_up=n['admin_state_up'],
@@ -213,7 +300,7 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         return self._make_network_dict(network)
 
     def delete_network(self, context, id):
-        with context.session.begin():
+        with context.session.begin(subtransactions=True):
             network = self._get_network(context, id)
 
             filter = {'network_id': [id]}
@@ -229,11 +316,15 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         network = self._get_network(context, id, verbose=verbose)
         return self._make_network_dict(network, fields)
 
-    def get_networks(self, context, filters=None, fields=None, verbose=None):
+    def get_networks(self, context, filters=None, fields=None, verbose=None,
+                     sorts=None, limit=None, marker=None, page_reverse=False):
         return self._get_collection(context, models_v2.Network,
                                     self._make_network_dict,
                                     filters=filters, fields=fields,
-                                    verbose=verbose)
+                                    verbose=verbose, sorts=sorts,
+                                    limit=limit, marker=marker,
+                                    page_reverse=page_reverse,
+                                    joins=('subnets',))
 
     def create_subnet(self, context, subnet):
         s = subnet['subnet']
@@ -272,11 +363,14 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         subnet = self._get_subnet(context, id, verbose=verbose)
         return self._make_subnet_dict(subnet, fields)
 
-    def get_subnets(self, context, filters=None, fields=None, verbose=None):
+    def get_subnets(self, context, filters=None, fields=None, verbose=None,
+                    sorts=None, limit=None, marker=None, page_reverse=False):
         return self._get_collection(context, models_v2.Subnet,
                                     self._make_subnet_dict,
                                     filters=filters, fields=fields,
-                                    verbose=verbose)
+                                    verbose=verbose, sorts=sorts,
+                                    limit=limit, marker=marker,
+                                    page_reverse=page_reverse)
 
     def create_port(self, context, port):
         p = port['port']
@@ -334,8 +428,12 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         port = self._get_port(context, id, verbose=verbose)
         return self._make_port_dict(port, fields)
 
-    def get_ports(self, context, filters=None, fields=None, verbose=None):
+    def get_ports(self, context, filters=None, fields=None, verbose=None,
+                  sorts=None, limit=None, marker=None, page_reverse=False):
         return self._get_collection(context, models_v2.Port,
                                     self._make_port_dict,
                                     filters=filters, fields=fields,
-                                    verbose=verbose)
+                                    verbose=verbose, sorts=sorts,
+                                    limit=limit, marker=marker,
+                                    page_reverse=page_reverse,
+                                    joins=('fixed_ips',))
@@ -20,7 +20,7 @@
 
 import uuid
 
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, event, ForeignKey, Integer, String
 from sqlalchemy.orm import relation
 
 from quantum.api import api_common as common
@@ -29,6 +29,47 @@ from quantum.db import model_base
 
 BASE = model_base.BASE
 
+# Changes older than the last KEPT_CHANGES are dropped every PRUNE_CHANGES
+# changes; agents that fall that far behind read the tables again.
+KEPT_CHANGES = 10000
+PRUNE_CHANGES = 1000
+
+
+class Change(model_base.BASE):
+    """Records that a row of a table followed by the agents was inserted,
+    updated or deleted. Changes are numbered in increasing order, so that
+    agents can read only the rows that changed since the last change they
+    saw.
+    """
+    __tablename__ = 'changes'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(255), nullable=False)
+    row_key = Column(String(255), nullable=False)
+
+    def __repr__(self):
+        return "<Change(%s,%s,%s)>" % (self.id, self.table_name,
+                                       self.row_key)
+
+
+def track_changes(model, key):
+    """Records the changes to the rows of model, identified by their key
+    column, in the changes table.
+    """
+    changes = Change.__table__
+
+    def record_change(mapper, connection, target):
+        result = connection.execute(changes.insert(),
+                                    table_name=model.__tablename__,
+                                    row_key=str(getattr(target, key)))
+        change_id = result.inserted_primary_key[0]
+        if change_id and change_id % PRUNE_CHANGES == 0:
+            connection.execute(changes.delete().where(
+                changes.c.id <= change_id - KEPT_CHANGES))
+
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, event_name, record_change)
+
 
 class Port(model_base.BASE):
     """Represents a port on a quantum network"""
@@ -55,6 +96,9 @@ class Port(model_base.BASE):
                                            self.interface_id)
 
 
+track_changes(Port, 'uuid')
+
+
 class Network(model_base.BASE):
     """Represents a quantum network"""
     __tablename__ = 'networks'
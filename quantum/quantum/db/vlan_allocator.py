@@ -0,0 +1,252 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+VLAN ID allocation from a compact list of free ranges
+"""
+
+import bisect
+import logging
+
+import sqlalchemy as sa
+
+
+LOG = logging.getLogger(__name__)
+
+# Rows inserted per executemany when populating a VLAN table
+INSERT_CHUNK_SIZE = 1000
+
+
+def to_ranges(vlan_ids):
+    """Compresses VLAN IDs into a sorted list of (first, last) ranges"""
+    ranges = []
+    for vlan_id in sorted(vlan_ids):
+        if ranges and ranges[-1][1] >= vlan_id - 1:
+            ranges[-1][1] = max(ranges[-1][1], vlan_id)
+        else:
+            ranges.append([vlan_id, vlan_id])
+    return [tuple(r) for r in ranges]
+
+
+def subtract_ranges(ranges, other):
+    """Returns the parts of ranges that are not covered by other"""
+    result = []
+    for first, last in ranges:
+        for o_first, o_last in other:
+            if o_last < first or o_first > last:
+                continue
+            if o_first > first:
+                result.append((first, o_first - 1))
+            first = o_last + 1
+            if first > last:
+                break
+        if first <= last:
+            result.append((first, last))
+    return result
+
+
+def sync_vlan_ids(session, model, vlan_min, vlan_max):
+    """
+    Makes a table of VLAN IDs with a vlan_used flag hold a row for every
+    VLAN from vlan_min to vlan_max.
+
+    The configured range is compared with the ranges already in the table,
+    and only the difference is written: missing VLANs are inserted in
+    chunks with executemany, and unused VLANs outside the range are deleted
+    a range at a time. VLANs outside the range that are still in use are
+    kept until they are released. Returns the number of rows inserted and
+    deleted.
+    """
+    count, first, last = session.query(sa.func.count(model.vlan_id),
+                                       sa.func.min(model.vlan_id),
+                                       sa.func.max(model.vlan_id)).one()
+    if (first, last, count) == (vlan_min, vlan_max, vlan_max - vlan_min + 1):
+        return 0, 0
+    configured = [(vlan_min, vlan_max)]
+    existing = to_ranges(row[0] for row in session.query(model.vlan_id))
+    missing = subtract_ranges(configured, existing)
+    stale = subtract_ranges(existing, configured)
+    LOG.debug("Setting VLAN range to %s-%s, adding %s, removing %s" %
+              (vlan_min, vlan_max, missing, stale))
+    inserted = deleted = 0
+    with session.begin(subtransactions=True):
+        rows = []
+        for first, last in missing:
+            for vlan_id in xrange(first, last + 1):
+                rows.append({'vlan_id': vlan_id, 'vlan_used': False})
+                if len(rows) == INSERT_CHUNK_SIZE:
+                    session.execute(model.__table__.insert(), rows)
+                    inserted += len(rows)
+                    rows = []
+        if rows:
+            session.execute(model.__table__.insert(), rows)
+            inserted += len(rows)
+        for first, last in stale:
+            deleted += (session.query(model).
+                        filter(model.vlan_id.between(first, last)).
+                        filter_by(vlan_used=False).
+                        delete(synchronize_session=False))
+    return inserted, deleted
+
+
+class VlanAllocator(object):
+    """
+    Keeps the free VLAN IDs as a sorted list of disjoint ranges. Handing
+    out the lowest free VLAN is O(1); marking a given VLAN as used or free
+    is O(log n) in the number of ranges.
+    """
+
+    def __init__(self, vlan_min=None, vlan_max=None):
+        self._starts = []
+        self._ends = []
+        if vlan_min is not None and vlan_max is not None:
+            self.load(xrange(vlan_min, vlan_max + 1))
+
+    def load(self, free_vlans):
+        """Replaces the free VLANs with the given ones"""
+        ranges = to_ranges(free_vlans)
+        self._starts = [first for first, last in ranges]
+        self._ends = [last for first, last in ranges]
+
+    def free_count(self):
+        """Returns the number of free VLANs"""
+        return sum(end - start + 1
+                   for start, end in zip(self._starts, self._ends))
+
+    def is_free(self, vlan_id):
+        i = bisect.bisect_right(self._starts, vlan_id) - 1
+        return i >= 0 and vlan_id <= self._ends[i]
+
+    def allocate(self):
+        """Marks the lowest free VLAN as used and returns it, or None"""
+        if not self._starts:
+            return None
+        vlan_id = self._starts[0]
+        if vlan_id == self._ends[0]:
+            del self._starts[0]
+            del self._ends[0]
+        else:
+            self._starts[0] += 1
+        return vlan_id
+
+    def mark_used(self, vlan_id):
+        """Marks a VLAN as used, returning False if it was not free"""
+        i = bisect.bisect_right(self._starts, vlan_id) - 1
+        if i < 0 or vlan_id > self._ends[i]:
+            return False
+        start, end = self._starts[i], self._ends[i]
+        if start == end:
+            del self._starts[i]
+            del self._ends[i]
+        elif vlan_id == start:
+            self._starts[i] += 1
+        elif vlan_id == end:
+            self._ends[i] -= 1
+        else:
+            self._ends[i] = vlan_id - 1
+            self._starts.insert(i + 1, vlan_id + 1)
+            self._ends.insert(i + 1, end)
+        return True
+
+    def mark_free(self, vlan_id):
+        """Marks a VLAN as free, returning False if it already was"""
+        if self.is_free(vlan_id):
+            return False
+        i = bisect.bisect_left(self._starts, vlan_id)
+        joins_left = i > 0 and self._ends[i - 1] == vlan_id - 1
+        joins_right = (i < len(self._starts) and
+                       self._starts[i] == vlan_id + 1)
+        if joins_left and joins_right:
+            self._ends[i - 1] = self._ends[i]
+            del self._starts[i]
+            del self._ends[i]
+        elif joins_left:
+            self._ends[i - 1] = vlan_id
+        elif joins_right:
+            self._starts[i] = vlan_id
+        else:
+            self._starts.insert(i, vlan_id)
+            self._ends.insert(i, vlan_id)
+        return True
+
+
+class DbVlanAllocator(VlanAllocator):
+    """
+    VlanAllocator for a table of VLAN IDs with a vlan_used flag, which may
+    be shared by several quantum-server processes.
+
+    The free VLANs are read from the table once. A VLAN is only handed out
+    once a conditional UPDATE of its row from unused to used succeeds, so
+    two servers can never reserve the same VLAN; when another server got
+    there first, or this one has run out of VLANs that other servers may
+    have released since, the free VLANs are read again.
+
+    If vlan_min and vlan_max are given, VLANs outside that range are left
+    over from an earlier configuration: they are never handed out and their
+    rows are deleted when they are released.
+    """
+
+    def __init__(self, model, vlan_min=None, vlan_max=None):
+        super(DbVlanAllocator, self).__init__()
+        self.model = model
+        self.vlan_min = vlan_min
+        self.vlan_max = vlan_max
+        self._loaded = False
+
+    def _in_range(self, vlan_id):
+        return ((self.vlan_min is None or vlan_id >= self.vlan_min) and
+                (self.vlan_max is None or vlan_id <= self.vlan_max))
+
+    def load_from_db(self, session):
+        query = (session.query(self.model.vlan_id).
+                 filter_by(vlan_used=False))
+        self.load(row[0] for row in query if self._in_range(row[0]))
+        self._loaded = True
+
+    def reserve(self, session):
+        """Reserves the lowest free VLAN and returns it, or None"""
+        if not self._loaded:
+            self.load_from_db(session)
+        reloaded = False
+        while True:
+            vlan_id = self.allocate()
+            if vlan_id is None:
+                if reloaded:
+                    return None
+                self.load_from_db(session)
+                reloaded = True
+                continue
+            updated = (session.query(self.model).
+                       filter_by(vlan_id=vlan_id, vlan_used=False).
+                       update({'vlan_used': True},
+                              synchronize_session=False))
+            if updated:
+                return vlan_id
+            LOG.debug("VLAN %s was reserved by another server" % vlan_id)
+            self.load_from_db(session)
+            reloaded = True
+
+    def release(self, session, vlan_id):
+        """Marks a VLAN as unused, returning False if it does not exist"""
+        query = session.query(self.model).filter_by(vlan_id=vlan_id)
+        if not self._in_range(vlan_id):
+            return bool(query.delete(synchronize_session=False))
+        updated = query.update({'vlan_used': False},
+                               synchronize_session=False)
+        if updated and self._loaded:
+            self.mark_free(vlan_id)
+        return bool(updated)
@@ -1,8 +1,7 @@
 import logging
 
-from ncclient import manager
-
 from quantum.plugins.cisco.catalyst import cisco_catalyst_snippets as snipp
+from quantum.plugins.cisco.common import cisco_netconf_pool as nc_pool
 
 LOG = logging.getLogger(__name__)
 
@@ -17,12 +16,11 @@ class CiscoCATALYSTDriver():
     def ssh_connect(self, catalyst_host, catalyst_ssh_port, catalyst_user,
                     catalyst_password):
         """
-        Makes the SSH connection to the switch
+        Checks out a pooled SSH connection to the switch, to be used as a
+        context manager
         """
-        man = manager.connect(host=catalyst_host, port=catalyst_ssh_port,
-                              username=catalyst_user,
-                              password=catalyst_password)
-        return man
+        return nc_pool.get_pool().session(catalyst_host, catalyst_ssh_port,
+                                          catalyst_user, catalyst_password)
 
     def create_subinterface(self, catalyst_host, catalyst_ssh_port,
                             catalyst_user, catalyst_password):
@@ -34,4 +32,3 @@ class CiscoCATALYSTDriver():
                               catalyst_user, catalyst_password) as m:
             confstr = snipp.SUBINTERFACE_CREATE
             m.edit_config(target='running', config=confstr)
-            m.close_session()
@@ -0,0 +1,80 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+Dispatch of L2Network operations to the device plugins
+"""
+
+import inspect
+import logging
+import sys
+
+
+LOG = logging.getLogger(__name__)
+
+
+def caller_name(offset=0):
+    """
+    Returns the name of the function that called the caller of
+    caller_name, or of a function further up the stack with an offset.
+
+    Unlike inspect.stack(), this neither builds a record for every frame
+    of the stack nor reads source files.
+    """
+    return sys._getframe(2 + offset).f_code.co_name
+
+
+class DispatchTable(object):
+    """
+    The public methods of a device plugin, together with the number of
+    positional arguments each one takes, worked out once when the plugin
+    is loaded rather than on every call
+    """
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self._methods = {}
+        for name, method in inspect.getmembers(plugin, inspect.ismethod):
+            if name.startswith('_'):
+                continue
+            try:
+                argspec = inspect.getargspec(method)
+            except TypeError:
+                continue
+            self._methods[name] = (method, len(argspec.args) - 1)
+
+    def lookup(self, function_name):
+        """Returns the method and the number of its positional arguments"""
+        try:
+            return self._methods[function_name]
+        except KeyError:
+            # Not a plain method, e.g. a callable set on the instance
+            method = getattr(self.plugin, function_name)
+            return method, len(inspect.getargspec(method).args) - 1
+
+    def call(self, function_name, args, kwargs):
+        """
+        Calls a method with args. Arguments beyond the positional ones the
+        method takes are dicts, whose items are passed as keyword
+        arguments together with kwargs.
+        """
+        method, nargs = self.lookup(function_name)
+        if len(args) > nargs:
+            for dict_arg in args[nargs:]:
+                kwargs.update(dict_arg)
+            args = args[:nargs]
+        return method(*args, **kwargs)
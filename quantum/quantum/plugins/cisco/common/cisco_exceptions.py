@@ -183,3 +183,37 @@ class InvalidAttach(exceptions.QuantumException):
                 "attachment ID with port ID happens implicitly when "
                 "VM is instantiated; attach operation can be "
                 "performed subsequently.")
+
+
+class NetconfSessionTimeout(exceptions.QuantumException):
+    """No pooled NETCONF session became available in time"""
+    message = _("Timed out waiting for a NETCONF session to switch "
+                "%(host)s")
+
+
+class ConfigBatchTimeout(exceptions.QuantumException):
+    """A batched configuration change was not sent in time"""
+    message = _("Timed out waiting for %(host)s to accept a configuration "
+                "change")
+
+
+class ConfigBatchAborted(exceptions.QuantumException):
+    """The caller sending a batch of configuration changes was interrupted"""
+    message = _("The batch of configuration changes for %(host)s was "
+                "aborted before it was sent")
+
+
+class UCSMLoginFailed(exceptions.QuantumException):
+    """UCSM did not hand out a session cookie"""
+    message = _("Unable to log in to UCSM %(ucsm_ip)s: %(error)s")
+
+
+class UCSMRequestFailed(exceptions.QuantumException):
+    """UCSM answered a configuration request with an error"""
+    message = _("UCSM %(ucsm_ip)s rejected the request: %(error)s")
+
+
+class DeviceCallTimeout(exceptions.QuantumException):
+    """A device plugin did not finish a call in time"""
+    message = _("Device call %(call)s did not complete within %(timeout)s "
+                "seconds")
@@ -0,0 +1,112 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+Concurrent calls of device plugins, with per call timeouts and rollback of
+the calls that succeeded when others failed
+"""
+
+import logging
+import sys
+
+import eventlet
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+
+
+LOG = logging.getLogger(__name__)
+
+
+class FanOut(object):
+    """
+    Runs calls in green threads, each limited to timeout seconds, and
+    waits for all of them. A call is identified by a key, e.g. the device
+    plugin and device it configures.
+
+    The timeout interrupts a call when it yields to the hub, i.e. while it
+    waits for a device over a green socket or in eventlet.sleep(). Calls
+    that submitted a change to a ConfigBatcher only stop waiting for it;
+    the batch is still sent for the other calls sharing it.
+    """
+
+    def __init__(self, timeout=None, pool_size=1000):
+        self.timeout = timeout
+        self._pool = eventlet.GreenPool(pool_size)
+        self._calls = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def spawn(self, key, func, *args, **kwargs):
+        """Starts a call"""
+        self._calls.append((key, self._pool.spawn(self._run, key, func,
+                                                  args, kwargs)))
+
+    def wait(self):
+        """
+        Waits for every call. Returns the (key, result) of the calls that
+        succeeded and the (key, exc_info) of those that failed, each in the
+        order the calls were started.
+        """
+        results = []
+        failures = []
+        for key, thread in self._calls:
+            try:
+                results.append((key, thread.wait()))
+            except Exception:
+                failures.append((key, sys.exc_info()))
+        self._calls = []
+        return results, failures
+
+    def _run(self, key, func, args, kwargs):
+        if not self.timeout:
+            return func(*args, **kwargs)
+        timeout = eventlet.Timeout(self.timeout, cexc.DeviceCallTimeout(
+            call=key, timeout=self.timeout))
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timeout.cancel()
+
+
+def call_all(calls, rollback=None, timeout=None):
+    """
+    Runs (key, func, args) calls concurrently and returns their results in
+    order. If any call fails, rollback(key, result) is called concurrently
+    for each call that succeeded, and the first failure is re-raised.
+    Errors while rolling back are logged but not raised.
+    """
+    fanout = FanOut(timeout)
+    for key, func, args in calls:
+        fanout.spawn(key, func, *args)
+    results, failures = fanout.wait()
+    if not failures:
+        return [result for key, result in results]
+
+    for key, exc_info in failures:
+        LOG.error("Device call %s failed: %s" % (key, exc_info[1]))
+    if rollback and results:
+        LOG.debug("Rolling back device calls %s" %
+                  [key for key, result in results])
+        for key, result in results:
+            fanout.spawn(key, rollback, key, result)
+        rolled_back, rollback_failures = fanout.wait()
+        for key, exc_info in rollback_failures:
+            LOG.error("Rollback of device call %s failed: %s" %
+                      (key, exc_info[1]))
+    exc_info = failures[0][1]
+    raise exc_info[0], exc_info[1], exc_info[2]
@@ -0,0 +1,183 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+Batching of switch configuration changes into as few NETCONF edit_config
+RPCs as possible
+"""
+
+import logging
+
+import eventlet
+from eventlet import event
+from eventlet import semaphore
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.common import cisco_netconf_pool as nc_pool
+from quantum.plugins.cisco import l2network_plugin_configuration as conf
+
+
+LOG = logging.getLogger(__name__)
+
+_BATCHER = None
+
+
+class ConfigTransaction(object):
+    """
+    An ordered list of configuration operations for a single switch.
+    Subclasses know how to render the operations into the configuration
+    document sent with edit_config.
+    """
+
+    def __init__(self):
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add(self, *operation):
+        """Appends an operation, a tuple whose first item is its kind"""
+        self.operations.append(operation)
+
+    def merge(self, other):
+        """Appends the operations of another transaction to this one"""
+        self.operations.extend(other.operations)
+
+    def to_xml(self):
+        """Renders the operations into an edit_config document"""
+        raise NotImplementedError()
+
+
+class _PendingChange(object):
+    """A transaction waiting for its batch to be sent to the switch"""
+
+    def __init__(self, txn):
+        self.txn = txn
+        self.done = event.Event()
+
+    def wait(self, host, timeout=None):
+        error = None
+        with eventlet.Timeout(timeout, False):
+            error = self.done.wait()
+        if not self.done.ready():
+            raise cexc.ConfigBatchTimeout(host=host)
+        if error:
+            raise error
+
+
+class ConfigBatcher(object):
+    """
+    Coalesces the transactions that callers submit for the same switch
+    within window seconds into a single edit_config RPC.
+
+    The first transaction submitted for an idle switch starts a green
+    thread that leads the batch: it waits for the window to pass, takes
+    every transaction queued for that switch in the meantime and sends them
+    merged. Batches for one switch are sent one at a time, so changes reach
+    the switch in the order they were submitted. If a merged batch is
+    rejected, its transactions are retried one by one so that each caller
+    gets the outcome of its own change.
+
+    Callers only wait for the outcome, so interrupting one of them, e.g.
+    with eventlet.Timeout, leaves the batch to be sent for the others. If
+    the leader itself dies before its batch was sent, the callers of the
+    batch get an error instead of waiting for it; they give up after
+    timeout seconds in any case.
+    """
+
+    def __init__(self, pool, window=0.05, timeout=None):
+        self.pool = pool
+        self.window = window
+        self.timeout = timeout
+        self._pending = {}
+        self._flush_locks = {}
+        self._stats = {'transactions': 0, 'rpcs': 0, 'retries': 0}
+
+    def apply(self, txn, host, port, username, password):
+        """Applies a transaction, blocking until the switch accepted it"""
+        key = (host, int(port), username)
+        change = _PendingChange(txn)
+        self._stats['transactions'] += 1
+        if key in self._pending:
+            self._pending[key].append(change)
+        else:
+            self._pending[key] = [change]
+            eventlet.spawn_n(self._flush, key, password)
+        change.wait(host, self.timeout)
+
+    def get_stats(self):
+        """Returns a snapshot of the batcher counters"""
+        return dict(self._stats)
+
+    def _flush(self, key, password):
+        batch = None
+        try:
+            eventlet.sleep(self.window)
+            lock = self._flush_locks.setdefault(key, semaphore.Semaphore())
+            with lock:
+                batch = self._pending.pop(key)
+                self._send_batch(key, password, batch)
+        finally:
+            # Whatever interrupted the leader, nobody else would ever send
+            # this batch or tell its callers
+            if batch is None:
+                batch = self._pending.pop(key, [])
+            for change in batch:
+                if not change.done.ready():
+                    change.done.send(cexc.ConfigBatchAborted(host=key[0]))
+
+    def _send_batch(self, key, password, batch):
+        txn = batch[0].txn.__class__()
+        for change in batch:
+            txn.merge(change.txn)
+        LOG.debug("Sending %d operations from %d transactions to %s in "
+                  "one edit_config" % (len(txn), len(batch), key[0]))
+        try:
+            self._send(key, password, txn)
+        except Exception, e:
+            if len(batch) == 1:
+                batch[0].done.send(e)
+                return
+            LOG.debug("Batched edit_config to %s failed, retrying "
+                      "transactions one by one: %s" % (key[0], e))
+            for change in batch:
+                self._stats['retries'] += 1
+                try:
+                    self._send(key, password, change.txn)
+                except Exception, e:
+                    change.done.send(e)
+                else:
+                    change.done.send(None)
+        else:
+            for change in batch:
+                change.done.send(None)
+
+    def _send(self, key, password, txn):
+        self._stats['rpcs'] += 1
+        host, port, username = key
+        with self.pool.session(host, port, username, password) as mgr:
+            mgr.edit_config(target='running', config=txn.to_xml())
+
+
+def get_batcher():
+    """Returns the configuration batcher shared by the switch drivers"""
+    global _BATCHER
+    if not _BATCHER:
+        _BATCHER = ConfigBatcher(nc_pool.get_pool(),
+                                 window=float(conf.NETCONF_BATCH_WINDOW),
+                                 timeout=float(conf.NETCONF_BATCH_TIMEOUT))
+    return _BATCHER
@@ -0,0 +1,234 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+Per-switch pool of long-lived NETCONF sessions shared by the Nexus and
+Catalyst drivers
+"""
+
+import contextlib
+import logging
+import time
+
+import eventlet
+from eventlet import semaphore
+from ncclient import manager
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco import l2network_plugin_configuration as conf
+from quantum import wsgi
+
+
+LOG = logging.getLogger(__name__)
+
+_POOL = None
+
+
+class _PooledSession(object):
+    """A NETCONF manager along with its bookkeeping"""
+
+    def __init__(self, mgr):
+        self.mgr = mgr
+        self.last_used = time.time()
+
+
+class NetconfSessionPool(object):
+    """
+    Keeps up to max_sessions open NETCONF sessions per switch and hands
+    them out to callers, so that a configuration change does not pay for
+    a full SSH handshake. Sessions are health checked when checked out,
+    closed once they have been idle for longer than idle_timeout and
+    transparently re-opened when the switch has dropped them.
+
+    The sessions idle for too long are closed on checkout, and by the
+    reaper every reap_interval seconds, which also logs the pool counters.
+    """
+
+    def __init__(self, max_sessions=2, idle_timeout=300,
+                 keepalive_interval=30, checkout_timeout=60,
+                 reap_interval=60, connect=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.checkout_timeout = checkout_timeout
+        self.reap_interval = reap_interval
+        self._connect = connect or manager.connect
+        self._reaper = None
+        self._slots = {}
+        self._idle = {}
+        self._in_use = {}
+        self._stats = {'checkouts': 0, 'hits': 0, 'opens': 0, 'closes': 0,
+                       'evictions': 0, 'reconnects': 0, 'waits': 0,
+                       'wait_time': 0.0}
+
+    @contextlib.contextmanager
+    def session(self, host, port, username, password):
+        """
+        Context manager yielding a connected ncclient manager for the
+        given switch. The session goes back to the pool on exit, unless
+        the switch closed it while it was in use.
+        """
+        key = (host, int(port), username)
+        pooled = self._checkout(key, password)
+        try:
+            yield pooled.mgr
+        finally:
+            self._checkin(key, pooled)
+
+    def get_stats(self):
+        """Returns a snapshot of the pool counters"""
+        stats = dict(self._stats)
+        stats['idle'] = sum(len(s) for s in self._idle.values())
+        stats['in_use'] = sum(self._in_use.values())
+        return stats
+
+    def reap(self):
+        """Closes every session that has been idle for too long"""
+        now = time.time()
+        expired = []
+        for key in self._idle.keys():
+            expired.extend(self._pop_expired(key, now))
+        self._close_all(expired)
+
+    def close_all(self):
+        """Closes every idle session, e.g. on plugin shutdown"""
+        sessions = []
+        for idle in self._idle.values():
+            sessions.extend(idle)
+        self._idle = {}
+        self._close_all(sessions)
+
+    def start_reaper(self):
+        """Starts reaping the idle sessions in a green thread"""
+        if not self._reaper and self.reap_interval:
+            self._reaper = eventlet.spawn(self._reap_loop)
+
+    def stop(self):
+        """Stops the reaper and closes every idle session"""
+        if self._reaper:
+            self._reaper.kill()
+            self._reaper = None
+        self.close_all()
+
+    def _reap_loop(self):
+        while True:
+            eventlet.sleep(self.reap_interval)
+            try:
+                self.reap()
+                LOG.info("NETCONF session pool: %s" % self.get_stats())
+            except Exception:
+                LOG.exception("Error closing idle NETCONF sessions")
+
+    def _checkout(self, key, password):
+        self._stats['checkouts'] += 1
+        slots = self._slots.setdefault(
+            key, semaphore.Semaphore(self.max_sessions))
+        acquired = slots.acquire(blocking=False)
+        if not acquired:
+            LOG.debug("Waiting for a NETCONF session to %s" % key[0])
+            start = time.time()
+            with eventlet.Timeout(self.checkout_timeout, False):
+                acquired = slots.acquire()
+            self._stats['waits'] += 1
+            self._stats['wait_time'] += time.time() - start
+        if not acquired:
+            raise cexc.NetconfSessionTimeout(host=key[0])
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        stale = self._pop_expired(key, time.time())
+        pooled = None
+        idle = self._idle.get(key, [])
+        while idle:
+            candidate = idle.pop()
+            if candidate.mgr.connected:
+                self._stats['hits'] += 1
+                pooled = candidate
+                break
+            LOG.debug("NETCONF session to %s was dropped by the switch, "
+                      "reconnecting" % key[0])
+            self._stats['reconnects'] += 1
+            stale.append(candidate)
+        try:
+            self._close_all(stale)
+            if not pooled:
+                pooled = self._open(key, password)
+        except Exception:
+            self._in_use[key] -= 1
+            slots.release()
+            raise
+        return pooled
+
+    def _checkin(self, key, pooled):
+        pooled.last_used = time.time()
+        self._in_use[key] -= 1
+        if pooled.mgr.connected:
+            self._idle.setdefault(key, []).append(pooled)
+        else:
+            self._close_all([pooled])
+        self._slots[key].release()
+
+    def _open(self, key, password):
+        host, port, username = key
+        LOG.debug("Opening NETCONF session to %s:%s" % (host, port))
+        mgr = self._connect(host=host, port=port, username=username,
+                            password=password)
+        self._enable_keepalive(mgr)
+        self._stats['opens'] += 1
+        return _PooledSession(mgr)
+
+    def _enable_keepalive(self, mgr):
+        """Turns on SSH keepalives so that idle sessions stay open"""
+        if not self.keepalive_interval:
+            return
+        transport = getattr(getattr(mgr, '_session', None), '_transport',
+                            None)
+        if transport is not None and hasattr(transport, 'set_keepalive'):
+            transport.set_keepalive(self.keepalive_interval)
+
+    def _pop_expired(self, key, now):
+        """Removes and returns the idle sessions past idle_timeout"""
+        idle = self._idle.get(key, [])
+        fresh = [s for s in idle if now - s.last_used < self.idle_timeout]
+        expired = [s for s in idle if now - s.last_used >= self.idle_timeout]
+        self._idle[key] = fresh
+        self._stats['evictions'] += len(expired)
+        return expired
+
+    def _close_all(self, sessions):
+        for pooled in sessions:
+            try:
+                if pooled.mgr.connected:
+                    pooled.mgr.close_session()
+            except Exception:
+                LOG.debug("Ignoring error while closing NETCONF session",
+                          exc_info=True)
+            self._stats['closes'] += 1
+
+
+def get_pool():
+    """Returns the NETCONF session pool shared by the switch drivers"""
+    global _POOL
+    if not _POOL:
+        _POOL = NetconfSessionPool(
+            max_sessions=int(conf.NETCONF_MAX_SESSIONS),
+            idle_timeout=int(conf.NETCONF_IDLE_TIMEOUT),
+            keepalive_interval=int(conf.NETCONF_KEEPALIVE_INTERVAL),
+            checkout_timeout=int(conf.NETCONF_CHECKOUT_TIMEOUT),
+            reap_interval=int(conf.NETCONF_REAP_INTERVAL))
+        wsgi.call_when_serving(_POOL.start_reaper)
+        wsgi.call_when_stopping(_POOL.stop)
+    return _POOL
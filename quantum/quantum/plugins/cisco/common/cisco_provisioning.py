@@ -0,0 +1,252 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+Durable queue of device provisioning jobs, and the worker that runs them in
+the background of the quantum-server
+"""
+
+import json
+import logging
+import time
+
+import eventlet
+
+
+LOG = logging.getLogger(__name__)
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+FAILED = 'FAILED'
+
+
+class JobQueue(object):
+    """
+    Device provisioning jobs kept in a table, so that they survive a
+    restart of the server. A job is an operation on a resource, e.g. the
+    creation of a network on the devices, together with a JSON payload.
+
+    Jobs for the same resource run one at a time, in the order they were
+    queued. Any number of servers may share the table: a job is only run
+    by the server whose conditional update of it from PENDING to RUNNING
+    succeeds.
+    """
+
+    def __init__(self, model, get_session):
+        self.model = model
+        self.get_session = get_session
+
+    def enqueue(self, resource_id, operation, payload, cancels=(),
+                session=None):
+        """
+        Queues an operation on a resource, merging it with the jobs already
+        pending for that resource. If one of them is for an operation in
+        cancels, e.g. the creation of a network that is now deleted, the
+        pending jobs are dropped along with the new operation and None is
+        returned. If the last pending job is for the same operation, it
+        gets the new payload instead of a job being added. Returns the id
+        of the job the operation went to.
+
+        Given the session of a transaction that changes the resource, the
+        job is only queued if that transaction commits.
+        """
+        session = session or self.get_session()
+        with session.begin(subtransactions=True):
+            pending = (session.query(self.model).
+                       filter_by(resource_id=resource_id, status=PENDING).
+                       order_by(self.model.id).all())
+            if [job for job in pending if job.operation in cancels]:
+                LOG.debug("Jobs %s for %s cancelled by %s" %
+                          ([job.operation for job in pending], resource_id,
+                           operation))
+                for job in pending:
+                    session.delete(job)
+                return None
+            if pending and pending[-1].operation == operation:
+                pending[-1].payload = json.dumps(payload)
+                return pending[-1].id
+            job = self.model(resource_id=resource_id, operation=operation,
+                             payload=json.dumps(payload), status=PENDING,
+                             attempts=0, run_at=time.time())
+            session.add(job)
+        return job.id
+
+    def claim(self, limit, job_timeout=None):
+        """
+        Marks up to limit jobs that are due as RUNNING and returns them,
+        skipping the resources that already have a job running or an
+        earlier job waiting for a retry. Jobs that have not had a heartbeat
+        for longer than job_timeout, e.g. because the server running them
+        died, are run again.
+        """
+        session = self.get_session()
+        now = time.time()
+        if job_timeout:
+            (session.query(self.model).
+             filter_by(status=RUNNING).
+             filter(self.model.run_at < now - job_timeout).
+             update({'status': PENDING}, synchronize_session=False))
+        busy = set(row[0] for row in
+                   session.query(self.model.resource_id).
+                   filter_by(status=RUNNING))
+        claimed = []
+        for job in (session.query(self.model).
+                    filter_by(status=PENDING).
+                    order_by(self.model.id)):
+            if len(claimed) >= limit:
+                break
+            if job.resource_id in busy:
+                continue
+            busy.add(job.resource_id)
+            if job.run_at > now:
+                continue
+            updated = (session.query(self.model).
+                       filter_by(id=job.id, status=PENDING).
+                       update({'status': RUNNING, 'run_at': now},
+                              synchronize_session=False))
+            if updated:
+                claimed.append(job)
+        return claimed
+
+    def heartbeat(self, job_ids):
+        """Keeps running jobs from being claimed again as stale"""
+        session = self.get_session()
+        (session.query(self.model).
+         filter(self.model.id.in_(job_ids)).
+         filter_by(status=RUNNING).
+         update({'run_at': time.time()}, synchronize_session=False))
+
+    def complete(self, job):
+        """Removes a job that ran successfully"""
+        session = self.get_session()
+        (session.query(self.model).filter_by(id=job.id).
+         delete(synchronize_session=False))
+
+    def retry(self, job, error, delay):
+        """Puts a failed job back in the queue to run after delay seconds"""
+        session = self.get_session()
+        (session.query(self.model).filter_by(id=job.id).
+         update({'status': PENDING, 'attempts': job.attempts + 1,
+                 'run_at': time.time() + delay,
+                 'last_error': str(error)[:255]},
+                synchronize_session=False))
+
+    def fail(self, job, error):
+        """Keeps a job that will not be retried, for inspection"""
+        session = self.get_session()
+        (session.query(self.model).filter_by(id=job.id).
+         update({'status': FAILED, 'attempts': job.attempts + 1,
+                 'last_error': str(error)[:255]},
+                synchronize_session=False))
+
+    def get_jobs(self, resource_id):
+        """Returns the jobs queued or failed for a resource"""
+        session = self.get_session()
+        return (session.query(self.model).
+                filter_by(resource_id=resource_id).
+                order_by(self.model.id).all())
+
+
+class ProvisioningWorker(object):
+    """
+    Runs the jobs of a JobQueue in green threads. handlers maps each
+    operation to a callable taking the resource id and the payload; its
+    failures are retried up to max_attempts times, waiting retry_interval
+    seconds, doubled on every attempt, in between. on_failure, if given,
+    is called with the operation, the resource id, the payload and the
+    error once a job has failed for good.
+
+    Jobs for different resources run concurrently, so the changes they
+    make to the same device can be batched by the device drivers. Every
+    poll refreshes the heartbeat of the jobs still running, so a slow job
+    is only run again by another server if this one stops polling for
+    job_timeout seconds.
+    """
+
+    def __init__(self, queue, handlers, on_failure=None, pool_size=8,
+                 poll_interval=1, max_attempts=5, retry_interval=10,
+                 job_timeout=600):
+        self.queue = queue
+        self.handlers = handlers
+        self.on_failure = on_failure
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.job_timeout = job_timeout
+        self._pool = eventlet.GreenPool(pool_size)
+        self._thread = None
+        self._running = set()
+
+    def start(self):
+        """Starts polling the queue in a green thread"""
+        if not self._thread:
+            self._thread = eventlet.spawn(self._loop)
+
+    def stop(self):
+        if self._thread:
+            self._thread.kill()
+            self._thread = None
+
+    def run_once(self):
+        """Starts the jobs that are due, returning how many were started"""
+        if self._running:
+            self.queue.heartbeat(list(self._running))
+        jobs = self.queue.claim(self._pool.free(), self.job_timeout)
+        for job in jobs:
+            self._running.add(job.id)
+            self._pool.spawn_n(self._run, job)
+        return len(jobs)
+
+    def wait(self):
+        """Waits for the running jobs to finish"""
+        self._pool.waitall()
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                LOG.exception("Error polling the device provisioning queue")
+            eventlet.sleep(self.poll_interval)
+
+    def _run(self, job):
+        try:
+            self._run_job(job)
+        finally:
+            self._running.discard(job.id)
+
+    def _run_job(self, job):
+        payload = json.loads(job.payload)
+        LOG.debug("Running job %s for %s, attempt %s" %
+                  (job.operation, job.resource_id, job.attempts + 1))
+        try:
+            self.handlers[job.operation](job.resource_id, payload)
+        except Exception, e:
+            if job.attempts + 1 >= self.max_attempts:
+                LOG.error("Job %s for %s failed: %s" %
+                          (job.operation, job.resource_id, e))
+                self.queue.fail(job, e)
+                if self.on_failure:
+                    self.on_failure(job.operation, job.resource_id, payload,
+                                    e)
+            else:
+                delay = self.retry_interval * 2 ** job.attempts
+                LOG.warn("Job %s for %s failed, retrying in %s seconds: %s" %
+                         (job.operation, job.resource_id, delay, e))
+                self.queue.retry(job, e, delay)
+        else:
+            self.queue.complete(job)
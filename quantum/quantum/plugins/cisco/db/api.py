@@ -27,7 +27,8 @@ from sqlalchemy.orm import sessionmaker, exc
 
 from quantum.api.api_common import OperationalStatus
 from quantum.common import exceptions as q_exc
-from quantum.plugins.cisco.db import model_base, models
+from quantum.db import api as quantum_db
+from quantum.plugins.cisco.db import models
 
 
 LOG = logging.getLogger(__name__)
@@ -35,7 +36,7 @@ LOG = logging.getLogger(__name__)
 
 _ENGINE = None
 _MAKER = None
-BASE = model_base.BASE
+BASE = models.BASE
 
 
 class MySQLPingListener(object):
@@ -79,6 +80,7 @@ def configure_db(options):
             engine_args['listeners'] = [MySQLPingListener()]
 
         _ENGINE = create_engine(options['sql_connection'], **engine_args)
+        quantum_db.register_engine(_ENGINE)
         base = options.get('base', BASE)
         if not register_models(base):
             if 'reconnect_interval' in options:
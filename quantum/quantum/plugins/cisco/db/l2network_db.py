@@ -18,6 +18,7 @@
 from sqlalchemy.orm import exc
 
 from quantum.common import exceptions as q_exc
+from quantum.db import vlan_allocator
 from quantum.plugins.cisco.common import cisco_exceptions as c_exc
 from quantum.plugins.cisco.db import l2network_models
 from quantum.plugins.cisco import l2network_plugin_configuration as conf
@@ -26,6 +27,9 @@ import logging as LOG
 import quantum.plugins.cisco.db.api as db
 
 
+_VLAN_ALLOCATOR = None
+
+
 def initialize():
     'Establish database connection and load models'
     options = {"sql_connection": "mysql://%s:%s@%s/%s" % (conf.DB_USER,
@@ -34,22 +38,28 @@ def initialize():
 
 
 def create_vlanids():
-    """Prepopulates the vlan_bindings table"""
+    """Prepopulates the vlan_ids table"""
     LOG.debug("create_vlanids() called")
     session = db.get_session()
-    try:
-        vlanid = session.query(l2network_models.VlanID).one()
-    except exc.MultipleResultsFound:
-        pass
-    except exc.NoResultFound:
-        start = int(conf.VLAN_START)
-        end = int(conf.VLAN_END)
-        while start <= end:
-            vlanid = l2network_models.VlanID(start)
-            session.add(vlanid)
-            start += 1
-        session.flush()
-    return
+    inserted, deleted = vlan_allocator.sync_vlan_ids(
+        session, l2network_models.VlanID,
+        int(conf.VLAN_START), int(conf.VLAN_END))
+    if inserted or deleted:
+        _reset_vlan_allocator()
+
+
+def _get_vlan_allocator():
+    global _VLAN_ALLOCATOR
+    if not _VLAN_ALLOCATOR:
+        _VLAN_ALLOCATOR = vlan_allocator.DbVlanAllocator(
+            l2network_models.VlanID, int(conf.VLAN_START),
+            int(conf.VLAN_END))
+    return _VLAN_ALLOCATOR
+
+
+def _reset_vlan_allocator():
+    global _VLAN_ALLOCATOR
+    _VLAN_ALLOCATOR = None
 
 
 def get_all_vlanids():
@@ -79,16 +89,9 @@ def release_vlanid(vlan_id):
     """Sets the vlanid state to be unused"""
     LOG.debug("release_vlanid() called")
     session = db.get_session()
-    try:
-        vlanid = (session.query(l2network_models.VlanID).
-                  filter_by(vlan_id=vlan_id).one())
-        vlanid["vlan_used"] = False
-        session.merge(vlanid)
-        session.flush()
-        return vlanid["vlan_used"]
-    except exc.NoResultFound:
+    if not _get_vlan_allocator().release(session, vlan_id):
         raise c_exc.VlanIDNotFound(vlan_id=vlan_id)
-    return
+    return False
 
 
 def delete_vlanid(vlan_id):
@@ -100,6 +103,7 @@ def delete_vlanid(vlan_id):
                   filter_by(vlan_id=vlan_id).one())
         session.delete(vlanid)
         session.flush()
+        _get_vlan_allocator().mark_used(vlan_id)
         return vlanid
     except exc.NoResultFound:
         pass
@@ -109,19 +113,10 @@ def reserve_vlanid():
     """Reserves the first unused vlanid"""
     LOG.debug("reserve_vlanid() called")
     session = db.get_session()
-    try:
-        rvlan = (session.query(l2network_models.VlanID).
-                 filter_by(vlan_used=False).first())
-        if not rvlan:
-            raise exc.NoResultFound
-        rvlanid = (session.query(l2network_models.VlanID).
-                   filter_by(vlan_id=rvlan["vlan_id"]).one())
-        rvlanid["vlan_used"] = True
-        session.merge(rvlanid)
-        session.flush()
-        return rvlan["vlan_id"]
-    except exc.NoResultFound:
+    vlan_id = _get_vlan_allocator().reserve(session)
+    if vlan_id is None:
         raise c_exc.VlanIDNotAvailable()
+    return vlan_id
 
 
 def get_all_vlanids_used():
@@ -17,7 +17,8 @@
 
 import uuid
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float
+from sqlalchemy import Text
 from sqlalchemy.orm import relation, object_mapper
 
 from quantum.db import models_v2
@@ -128,7 +129,7 @@ class PortProfileBinding(models_v2.model_base.BASEV2, L2NetworkBaseV2):
     id = Column(Integer, primary_key=True, autoincrement=True)
     tenant_id = Column(String(255))
 
-    port_id = Column(String(255), ForeignKey("ports.uuid"), nullable=False)
+    port_id = Column(String(255), ForeignKey("ports.id"), nullable=False)
     portprofile_id = Column(String(255), ForeignKey("portprofiles.uuid"),
                             nullable=False)
     default = Column(Boolean)
@@ -191,3 +192,22 @@ class Credential(models_v2.model_base.BASEV2, L2NetworkBaseV2):
                                                   self.credential_name,
                                                   self.user_name,
                                                   self.password)
+
+
+class DeviceJob(models_v2.model_base.BASEV2, L2NetworkBaseV2):
+    """Represents device configuration queued for a provisioning worker"""
+    __tablename__ = 'device_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    resource_id = Column(String(36), nullable=False, index=True)
+    operation = Column(String(255), nullable=False)
+    payload = Column(Text)
+    status = Column(String(16), nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(Float, nullable=False)
+    last_error = Column(String(255))
+
+    def __repr__(self):
+        return "<DeviceJob(%s,%s,%s,%s,%s)>" % (self.id, self.resource_id,
+                                                self.operation, self.status,
+                                                self.attempts)
@@ -16,13 +16,13 @@
 #
 # @author: Sumit Naiksatam, Cisco Systems, Inc.
 
-import inspect
 import logging
 
 from quantum.common import exceptions as exc
 from quantum.openstack.common import importutils
 from quantum.plugins.cisco.common import cisco_constants as const
 from quantum.plugins.cisco.common import cisco_credentials as cred
+from quantum.plugins.cisco.common import cisco_dispatch
 from quantum.plugins.cisco.common import cisco_exceptions as cexc
 from quantum.plugins.cisco.common import cisco_utils as cutil
 from quantum.plugins.cisco.db import api as db
@@ -173,6 +173,14 @@ class L2Network(QuantumPluginBase):
 
         return ports_on_net
 
+    def get_all_ports_details(self, tenant_id, net_id):
+        """
+        Retrieves the details of all the ports of the specified Virtual
+        Network, which get_all_ports already returns.
+        """
+        LOG.debug("get_all_ports_details() called\n")
+        return self.get_all_ports(tenant_id, net_id)
+
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
         """
         Creates a port on the specified Virtual Network.
@@ -563,4 +571,4 @@ class L2Network(QuantumPluginBase):
 
     def _func_name(self, offset=0):
         """Getting the name of the calling funciton"""
-        return inspect.stack()[1 + offset][3]
+        return cisco_dispatch.caller_name(offset)
@@ -43,6 +43,26 @@ MAX_NETWORKS = SECTION_CONF['max_networks']
 SECTION_CONF = CONF_PARSER_OBJ['MODEL']
 MODEL_CLASS = SECTION_CONF['model_class']
 
+SECTION_CONF = CONF_PARSER_OBJ.get('NETCONF', {})
+NETCONF_MAX_SESSIONS = SECTION_CONF.get('max_sessions_per_switch', 2)
+NETCONF_IDLE_TIMEOUT = SECTION_CONF.get('idle_timeout', 300)
+NETCONF_KEEPALIVE_INTERVAL = SECTION_CONF.get('keepalive_interval', 30)
+NETCONF_CHECKOUT_TIMEOUT = SECTION_CONF.get('checkout_timeout', 60)
+NETCONF_REAP_INTERVAL = SECTION_CONF.get('reap_interval', 60)
+NETCONF_BATCH_WINDOW = SECTION_CONF.get('batch_window', 0.05)
+NETCONF_BATCH_TIMEOUT = SECTION_CONF.get('batch_timeout', 120)
+
+SECTION_CONF = CONF_PARSER_OBJ.get('DEVICE_CALLS', {})
+DEVICE_CALL_TIMEOUT = SECTION_CONF.get('timeout', 60)
+
+SECTION_CONF = CONF_PARSER_OBJ.get('PROVISIONING', {})
+PROVISIONING_ASYNC = SECTION_CONF.get('async', 'False')
+PROVISIONING_WORKERS = SECTION_CONF.get('workers', 8)
+PROVISIONING_POLL_INTERVAL = SECTION_CONF.get('poll_interval', 1)
+PROVISIONING_MAX_ATTEMPTS = SECTION_CONF.get('max_attempts', 5)
+PROVISIONING_RETRY_INTERVAL = SECTION_CONF.get('retry_interval', 10)
+PROVISIONING_JOB_TIMEOUT = SECTION_CONF.get('job_timeout', 600)
+
 CONF_FILE = find_config_file({'plugin': 'cisco'}, "cisco_plugins.ini")
 
 SECTION_CONF = CONF_PARSER_OBJ['SEGMENTATION']
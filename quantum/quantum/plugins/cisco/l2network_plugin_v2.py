@@ -16,22 +16,27 @@
 #
 # @author: Sumit Naiksatam, Cisco Systems, Inc.
 
-import inspect
 import logging
 
 from sqlalchemy.orm import exc
 
 from quantum.db.db_base_plugin_v2 import QuantumDbPluginV2
 from quantum.common import exceptions as q_exc
+from quantum import context as q_context
 from quantum.openstack.common import importutils
 from quantum.plugins.cisco import l2network_plugin_configuration as conf
 from quantum.plugins.cisco.common import cisco_constants as const
 from quantum.plugins.cisco.common import cisco_credentials as cred
+from quantum.plugins.cisco.common import cisco_dispatch
 from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.common import cisco_provisioning
 from quantum.plugins.cisco.common import cisco_utils as cutil
 from quantum.plugins.cisco.db import api as db
 from quantum.plugins.cisco.db import l2network_db as cdb
+from quantum.plugins.cisco.db import l2network_models_v2
+from quantum.db import api as quantum_db
 from quantum.db import models_v2
+from quantum import wsgi
 
 
 LOG = logging.getLogger(__name__)
@@ -54,13 +59,21 @@ class L2NetworkV2(QuantumDbPluginV2):
 
         sql_connection = "mysql://%s:%s@%s/%s" % (conf.DB_USER,
                           conf.DB_PASS, conf.DB_HOST, conf.DB_NAME)
-        db.configure_db({'sql_connection': sql_connection,
-                         'base': models_v2.model_base.BASEV2})
+        options = {'sql_connection': sql_connection,
+                   'base': models_v2.model_base.BASEV2}
+        db.configure_db(options)
+        # The networks are kept through the sessions of the contexts
+        quantum_db.configure_db(options)
+        self._jobs = None
+        if str(conf.PROVISIONING_ASYNC).lower() == 'true':
+            self._start_provisioning()
         LOG.debug("L2Network plugin initialization done successfully\n")
 
     def create_network(self, context, network):
         LOG.debug("L2Network's create_network() called")
-        n = super().create_network(context, network)
+        if self._jobs:
+            return self._create_network_async(context, network)
+        n = super(L2NetworkV2, self).create_network(context, network)
         tenant_id = n['tenant_id']
         new_net_id = n['id']
         net_name = n['name']
@@ -74,7 +87,7 @@ class L2NetworkV2(QuantumDbPluginV2):
 
     def update_network(self, context, id, network):
         LOG.debug("L2Network's update_network() called")
-        n = super().update_network(context, id, network)
+        n = super(L2NetworkV2, self).update_network(context, id, network)
         self._invoke_device_plugins(self._func_name(), [context, id,
                                                         network])
         return n
@@ -83,24 +96,29 @@ class L2NetworkV2(QuantumDbPluginV2):
         LOG.debug("L2Network's delete_network() called")
 
         tenant_id = context.tenant_id
+        if self._jobs:
+            return self._delete_network_async(context, id)
         self._invoke_device_plugins(self._func_name(), [context, id])
         self._release_vlan_for_tenant(tenant_id, id)
         cdb.remove_vlan_binding(id)
-        super().delete_network(context, id)
+        super(L2NetworkV2, self).delete_network(context, id)
 
     def get_network(self, context, id, fields=None, verbose=None):
         LOG.debug("L2Network's get_network() called")
 
-        network = super().get_network(context, id, fields=fields,
-                                      verbose=verbose)
+        network = super(L2NetworkV2, self).get_network(context, id,
+                                                       fields=fields,
+                                                       verbose=verbose)
         self._invoke_device_plugins(self._func_name(), [context, id, fields,
                                                         verbose])
         return network
 
     def get_networks(self, context, filters=None, fields=None, verbose=None):
         LOG.debug("L2Network's get_networks() called")
-        networks = super().get_networks(self, context, filters=filters,
-                                        fields=fields, verbose=verbose)
+        networks = super(L2NetworkV2, self).get_networks(context,
+                                                         filters=filters,
+                                                         fields=fields,
+                                                         verbose=verbose)
         self._invoke_device_plugins(self._func_name(), [context, filters,
                                                         fields, verbose])
         return networks
@@ -110,7 +128,7 @@ class L2NetworkV2(QuantumDbPluginV2):
         """
         Method for subnet-vlan binding yet to be added
         """
-        subnet = super().create_subnet(context, subnet)
+        subnet = super(L2NetworkV2, self).create_subnet(context, subnet)
         self._invoke_device_plugins(self._func_name(), [context, subnet])
         return subnet
 
@@ -119,7 +137,7 @@ class L2NetworkV2(QuantumDbPluginV2):
         """
         Methods for subnet binding to vlan yet to be added.
         """
-        subnet = super().update_subnet(context, id, subnet)
+        subnet = super(L2NetworkV2, self).update_subnet(context, id, subnet)
         self._invoke_device_plugins(self._func_name(), [context, id, subnet])
         return subnet
 
@@ -129,15 +147,16 @@ class L2NetworkV2(QuantumDbPluginV2):
         Methods for vlan and subnet release yet to be added.
         """
         self._invoke_device_plugins(self._func_name(), [context, id])
-        super().delete_subnet(context, id)
+        super(L2NetworkV2, self).delete_subnet(context, id)
 
     def get_subnet(self, context, id, fields=None, verbose=None):
         LOG.debug("L2Network's get_subnet() called")
         """
         Methods for vlan and subnet binding yet to be added.
         """
-        subnet = super().get_subnet(context, id, fields=fields,
-                                    verbose=verbose)
+        subnet = super(L2NetworkV2, self).get_subnet(context, id,
+                                                     fields=fields,
+                                                     verbose=verbose)
         self._invoke_device_plugins(self._func_name(), [context, id, fields,
                                                         verbose])
         return subnet
@@ -147,33 +166,35 @@ class L2NetworkV2(QuantumDbPluginV2):
         """
         Methods for vlan and subnet binding yet to be added.
         """
-        subnets = super().get_subnets(context, filters=filters, fields=fields,
-                                      verbose=verbose)
+        subnets = super(L2NetworkV2, self).get_subnets(context,
+                                                       filters=filters,
+                                                       fields=fields,
+                                                       verbose=verbose)
         self._invoke_device_plugins(self._func_name(), [context, filters,
                                                         fields, verbose])
         return subnets
 
     def create_port(self, context, port):
         LOG.debug("L2Network's create_port() called")
-        port = super().create_port(context, port)
+        port = super(L2NetworkV2, self).create_port(context, port)
         self._invoke_device_plugins(self._func_name(), [context, port])
 
         return port
 
     def update_port(self, context, id, port):
         LOG.debug("L2Network's update_port() called")
-        port = super().update_port(context, id, port)
+        port = super(L2NetworkV2, self).update_port(context, id, port)
         self._invoke_device_plugins(self._func_name(), [context, id, port])
         return port
 
     def delete_port(self, context, id):
         LOG.debug("L2Network's delete_port() called")
         self._invoke_device_plugin(self._func_name(), [context, id])
-        super().delete_port(context, id)
+        super(L2NetworkV2, self).delete_port(context, id)
 
     def get_port(self, context, id, fields=None, verbose=None):
         LOG.debug("L2Network's get_port() called")
-        port = super().get_port(context, id, fields, verbose)
+        port = super(L2NetworkV2, self).get_port(context, id, fields, verbose)
         self._invoke_device_plugins(self._func_name(), [context, id, fields,
                                                         verbose])
         return port
@@ -183,8 +204,9 @@ class L2NetworkV2(QuantumDbPluginV2):
         """
         Vlan specific _device_invoke_plugin needs special net_id
         """
-        ports = super().get_ports(context, filters=filters, fields=fields,
-                                  verbose=verbose)
+        ports = super(L2NetworkV2, self).get_ports(context, filters=filters,
+                                                   fields=fields,
+                                                   verbose=verbose)
         self._invoke_device_plugins(self._func_name(), [context, filters,
                                                         fields, verbose])
         return ports
@@ -434,6 +456,108 @@ class L2NetworkV2(QuantumDbPluginV2):
         """
         return getattr(self._model, function_name)(args)
 
+    def _start_provisioning(self):
+        """
+        Starts the worker that configures the devices of new and deleted
+        networks in the background
+        """
+        # NOTE: The jobs are queued in the transactions that change the
+        #       networks, so they share the database session of the context
+        self._jobs = cisco_provisioning.JobQueue(
+            l2network_models_v2.DeviceJob, quantum_db.get_session)
+        handlers = {'create_network': self._provision_create_network,
+                    'delete_network': self._provision_delete_network}
+        self._provisioner = cisco_provisioning.ProvisioningWorker(
+            self._jobs, handlers, on_failure=self._provisioning_failed,
+            pool_size=int(conf.PROVISIONING_WORKERS),
+            poll_interval=float(conf.PROVISIONING_POLL_INTERVAL),
+            max_attempts=int(conf.PROVISIONING_MAX_ATTEMPTS),
+            retry_interval=float(conf.PROVISIONING_RETRY_INTERVAL),
+            job_timeout=float(conf.PROVISIONING_JOB_TIMEOUT))
+        # In every API worker, which may be forked after the plugin is loaded
+        wsgi.call_when_serving(self._provisioner.start)
+
+    def _create_network_async(self, context, network):
+        """
+        Creates a network in the BUILD state, together with the job that
+        configures the devices for it
+        """
+        session = context.session
+        binding = None
+        try:
+            with session.begin(subtransactions=True):
+                n = super(L2NetworkV2, self).create_network(context, network)
+                vlan_id = self._get_vlan_for_tenant(n['tenant_id'],
+                                                    n['name'])
+                vlan_name = self._get_vlan_name(str(n['id']), str(vlan_id))
+                # The device plugins look the VLAN up when the job runs
+                binding = cdb.add_vlan_binding(vlan_id, vlan_name,
+                                               str(n['id']))
+                self._set_network_status(context, n['id'], 'BUILD')
+                n['status'] = 'BUILD'
+                self._jobs.enqueue(n['id'], 'create_network',
+                                   {'network': n, 'vlan_name': vlan_name,
+                                    'vlan_id': vlan_id},
+                                   session=session)
+        except Exception:
+            if binding:
+                self._release_vlan_for_tenant(n['tenant_id'], n['id'])
+                cdb.remove_vlan_binding(n['id'])
+            raise
+        return n
+
+    def _delete_network_async(self, context, id):
+        """
+        Deletes a network, together with queuing the job that removes it
+        from the devices
+        """
+        with context.session.begin(subtransactions=True):
+            network = self._get_network(context, id)
+            payload = {'network': {'id': id, 'name': network['name'],
+                                   'tenant_id': network['tenant_id']}}
+            super(L2NetworkV2, self).delete_network(context, id)
+            job_id = self._jobs.enqueue(id, 'delete_network', payload,
+                                        cancels=('create_network',),
+                                        session=context.session)
+        # Nothing to remove from the devices if they were never configured
+        # for this network
+        if not job_id:
+            self._release_vlan_for_tenant(network['tenant_id'], id)
+            cdb.remove_vlan_binding(id)
+
+    def _provision_create_network(self, network_id, payload):
+        """Configures the devices for a network created in async mode"""
+        context = q_context.get_admin_context()
+        self._invoke_device_plugins("create_network",
+                                    [context, payload['network'],
+                                     payload['vlan_name'],
+                                     payload['vlan_id']])
+        self._set_network_status(context, network_id, 'ACTIVE')
+
+    def _provision_delete_network(self, network_id, payload):
+        """Removes a network deleted in async mode from the devices"""
+        context = q_context.get_admin_context()
+        self._invoke_device_plugins("delete_network", [context, network_id])
+        self._release_vlan_for_tenant(payload['network']['tenant_id'],
+                                      network_id)
+        cdb.remove_vlan_binding(network_id)
+
+    def _provisioning_failed(self, operation, network_id, payload, error):
+        """
+        Marks a network whose devices could not be configured as ERROR. The
+        VLAN of a network that could not be removed from the devices stays
+        reserved.
+        """
+        if operation == 'create_network':
+            self._set_network_status(q_context.get_admin_context(),
+                                     network_id, 'ERROR')
+
+    def _set_network_status(self, context, network_id, status):
+        with context.session.begin(subtransactions=True):
+            (context.session.query(models_v2.Network).
+             filter_by(id=network_id).
+             update({'status': status}, synchronize_session=False))
+
     def _get_vlan_for_tenant(self, tenant_id, net_name):
         """Get vlan ID"""
         return self._vlan_mgr.reserve_segmentation_id(tenant_id, net_name)
@@ -455,4 +579,4 @@ class L2NetworkV2(QuantumDbPluginV2):
 
     def _func_name(self, offset=0):
         """Getting the name of the calling funciton"""
-        return inspect.stack()[1 + offset][3]
+        return cisco_dispatch.caller_name(offset)
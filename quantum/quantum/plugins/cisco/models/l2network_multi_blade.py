@@ -17,11 +17,11 @@
 # @author: Sumit Naiksatam, Cisco Systems, Inc.
 
 from copy import deepcopy
-import inspect
 import logging
 
 from quantum.openstack.common import importutils
 from quantum.plugins.cisco.common import cisco_constants as const
+from quantum.plugins.cisco.common import cisco_dispatch
 from quantum.plugins.cisco.l2network_model_base import L2NetworkModelBase
 from quantum.plugins.cisco import l2network_plugin_configuration as conf
 
@@ -39,11 +39,14 @@ class L2NetworkMultiBlade(L2NetworkModelBase):
     """
     _plugins = {}
     _inventory = {}
+    _dispatch = {}
 
     def __init__(self):
         for key in conf.PLUGINS[const.PLUGINS].keys():
             plugin_obj = conf.PLUGINS[const.PLUGINS][key]
             self._plugins[key] = importutils.import_object(plugin_obj)
+            self._dispatch[key] = cisco_dispatch.DispatchTable(
+                self._plugins[key])
             LOG.debug("Loaded device plugin %s\n" %
                       conf.PLUGINS[const.PLUGINS][key])
             if key in conf.PLUGINS[const.INVENTORY].keys():
@@ -54,7 +57,7 @@ class L2NetworkMultiBlade(L2NetworkModelBase):
 
     def _func_name(self, offset=0):
         """Get the name of the calling function"""
-        return inspect.stack()[1 + offset][3]
+        return cisco_dispatch.caller_name(offset)
 
     def _invoke_plugin_per_device(self, plugin_key, function_name, args):
         """Invoke only device plugin for all the devices in the system"""
@@ -92,11 +95,11 @@ class L2NetworkMultiBlade(L2NetworkModelBase):
 
     def _invoke_plugin(self, plugin_key, function_name, args, kwargs):
         """Invoke only the device plugin"""
-        func = getattr(self._plugins[plugin_key], function_name)
+        func, nargs = self._dispatch[plugin_key].lookup(function_name)
 
         # If there are more args than needed, add them to kwargs
         args_copy = deepcopy(args)
-        if (args.__len__() + 1) > inspect.getargspec(func).args.__len__():
+        if len(args) > nargs:
             kwargs.update(args_copy.pop())
 
         return func(*args_copy, **kwargs)
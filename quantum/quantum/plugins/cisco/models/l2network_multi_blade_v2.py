@@ -16,12 +16,12 @@
 #
 # @author: Sumit Naiksatam, Cisco Systems, Inc.
 
-from copy import deepcopy
-import inspect
 import logging
 
 from quantum.openstack.common import importutils
 from quantum.plugins.cisco.common import cisco_constants as const
+from quantum.plugins.cisco.common import cisco_dispatch
+from quantum.plugins.cisco.common import cisco_fanout
 from quantum.plugins.cisco.db import network_db_v2 as cdb
 from quantum.plugins.cisco import l2network_plugin_configuration as conf
 from quantum import quantum_plugin_base_v2
@@ -39,6 +39,7 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     """
     _plugins = {}
     _inventory = {}
+    _dispatch = {}
 
     def __init__(self):
         """
@@ -50,6 +51,8 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         for key in conf.PLUGINS[const.PLUGINS].keys():
             plugin_obj = conf.PLUGINS[const.PLUGINS][key]
             self._plugins[key] = importutils.import_object(plugin_obj)
+            self._dispatch[key] = cisco_dispatch.DispatchTable(
+                self._plugins[key])
             LOG.debug("Loaded device plugin %s\n" %
                       conf.PLUGINS[const.PLUGINS][key])
             if key in conf.PLUGINS[const.INVENTORY].keys():
@@ -62,7 +65,7 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
 
     def _func_name(self, offset=0):
         """Get the name of the calling function"""
-        return inspect.stack()[1 + offset][3]
+        return cisco_dispatch.caller_name(offset)
 
     def _invoke_plugin_per_device(self, plugin_key, function_name, args):
         """
@@ -74,20 +77,63 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
             LOG.info("%s: %s with args %s ignored" %
                      (plugin_key, function_name, args))
             return
+        calls = self._device_calls(plugin_key, function_name, args)
+        return self._invoke_device_calls(calls)
+
+    def _device_calls(self, plugin_key, function_name, args):
+        """
+        Asks a device plugin's inventory which devices this operation
+        concerns, and returns the (key, function_name, args, device_params)
+        of the plugin call for each of them. The key is the plugin key and
+        the device IP.
+        """
+        if not plugin_key in self._plugins.keys():
+            LOG.info("No %s Plugin loaded" % plugin_key)
+            LOG.info("%s: %s with args %s ignored" %
+                     (plugin_key, function_name, args))
+            return []
         device_params = self._invoke_inventory(plugin_key, function_name,
                                                args)
         device_ips = device_params[const.DEVICE_IP]
         if not device_ips:
-            return [self._invoke_plugin(plugin_key, function_name, args,
-                                        device_params)]
-        else:
-            output = []
-            for device_ip in device_ips:
-                new_device_params = deepcopy(device_params)
-                new_device_params[const.DEVICE_IP] = device_ip
-                output.append(self._invoke_plugin(plugin_key, function_name,
-                                                  args, new_device_params))
-            return output
+            return [((plugin_key, None), function_name, args, device_params)]
+        calls = []
+        for device_ip in device_ips:
+            new_device_params = dict(device_params)
+            new_device_params[const.DEVICE_IP] = device_ip
+            calls.append(((plugin_key, device_ip), function_name, args,
+                          new_device_params))
+        return calls
+
+    def _invoke_device_calls(self, calls, rollback=None):
+        """
+        Invokes device plugin calls concurrently, each one limited to the
+        configured timeout, and returns their results in order. If a call
+        fails, rollback(key, device_params) is invoked for the calls that
+        succeeded before the error is raised.
+        """
+        device_params = dict((call[0], call[3]) for call in calls)
+
+        def _rollback(key, result):
+            return rollback(key, device_params[key])
+
+        return cisco_fanout.call_all(
+            [(key, self._invoke_plugin, (key[0], function_name, args, params))
+             for key, function_name, args, params in calls],
+            rollback=rollback and _rollback,
+            timeout=float(conf.DEVICE_CALL_TIMEOUT))
+
+    def _compensate(self, function_name, plugin_args):
+        """
+        Returns a rollback for _invoke_device_calls, which invokes
+        function_name on the same device with the args for that plugin
+        """
+        def rollback(key, device_params):
+            LOG.debug("Compensating on %s with %s" % (key, function_name))
+            return self._invoke_plugin(key[0], function_name,
+                                       list(plugin_args[key[0]]),
+                                       dict(device_params))
+        return rollback
 
     def _invoke_inventory(self, plugin_key, function_name, args):
         """
@@ -107,47 +153,39 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         Invokes the relevant function on a device plugin's
         implementation for completing this operation.
         """
-        func = getattr(self._plugins[plugin_key], function_name)
-        func_args_len = int(inspect.getargspec(func).args.__len__()) - 1
-        if args.__len__() > func_args_len:
-            func_args = args[:func_args_len]
-            extra_args = args[func_args_len:]
-            for dict_arg in extra_args:
-                for k, v in dict_arg.iteritems():
-                    kwargs[k] = v
-            return func(*func_args, **kwargs)
-        else:
-            return func(*args, **kwargs)
+        return self._dispatch[plugin_key].call(function_name, args, kwargs)
 
     def create_network(self, context, network):
         """
         Perform this operation in the context of the configured device
-        plugins.
+        plugins. The devices are configured concurrently; if any of them
+        fails, the network is deleted again from the others.
         """
         n = network
+        vlan_id = self._vlan_mgr.reserve_segmentation_id(n['tenant_id'],
+                                                         n['name'])
+        vlan_name = self._vlan_mgr.get_vlan_name(n['id'], str(vlan_id))
+        args = [n['tenant_id'], n['name'], n['id'], vlan_name, vlan_id]
+        arg = [context, n, vlan_name, vlan_id]
+        # The device plugins look the VLAN up when deleting the network
+        cdb.add_vlan_binding(vlan_id, vlan_name, n['id'])
         try:
-            vlan_id = self._vlan_mgr.reserve_segmentation_id(n['tenant_id'],
-                                                             n['name'])
-            vlan_name = self._vlan_mgr.get_vlan_name(n['id'], str(vlan_id))
-            args = [n['tenant_id'], n['name'], n['id'], vlan_name, vlan_id]
-            arg = [context, n, vlan_name, vlan_id]
-            output = []
-            ucs_output = self._invoke_plugin_per_device(const.UCS_PLUGIN,
-                                                        self._func_name(),
-                                                        args)
-            nexus_output = self._invoke_plugin_per_device(const.NEXUS_PLUGIN,
-                                                          self._func_name(),
-                                                          args)
-            catalyst_output = self._invoke_plugin_per_device(
-                                const.CATALYST_PLUGIN, self._func_name(), arg)
-
-            output.extend(ucs_output or [])
-            output.extend(nexus_output or [])
-            output.extend(catalyst_output or [])
-            cdb.add_vlan_binding(vlan_id, vlan_name, n['id'])
-            return output
+            calls = (self._device_calls(const.UCS_PLUGIN, self._func_name(),
+                                        args) +
+                     self._device_calls(const.NEXUS_PLUGIN, self._func_name(),
+                                        args) +
+                     self._device_calls(const.CATALYST_PLUGIN,
+                                        self._func_name(), arg))
+            delete_args = {
+                const.UCS_PLUGIN: [n['tenant_id'], n['id']],
+                const.NEXUS_PLUGIN: [n['tenant_id'], n['id']],
+                const.CATALYST_PLUGIN: [context, n['tenant_id'], n['id']],
+            }
+            return self._invoke_device_calls(
+                calls, self._compensate("delete_network", delete_args))
         except:
-            # TODO (Sumit): Check if we need to perform any rollback here
+            self._vlan_mgr.release_segmentation_id(n['tenant_id'], n['id'])
+            cdb.remove_vlan_binding(n['id'])
             raise
 
     def get_network(self, context, id, fields=None, verbose=None):
@@ -165,35 +203,37 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     def delete_network(self, context, id, tenant_id, kwargs):
         """
         Perform this operation in the context of the configured device
-        plugins.
+        plugins. The devices are configured concurrently; if any of them
+        fails, the network is created again on the others.
         """
-        try:
-            base_plugin_ref = kwargs[const.BASE_PLUGIN_REF]
-            n = kwargs[const.NETWORK]
-            tenant_id = n['tenant_id']
-            args = [tenant_id, id, {const.CONTEXT:context},
-                    {const.BASE_PLUGIN_REF:base_plugin_ref}]
-            arg = [tenant_id, id]
-            # TODO (Sumit): Might first need to check here if there are active
-            # ports
-            output = []
-            ucs_output = self._invoke_plugin_per_device(const.UCS_PLUGIN,
-                                                        self._func_name(),
-                                                        args)
-            nexus_output = self._invoke_plugin_per_device(const.NEXUS_PLUGIN,
-                                                          self._func_name(),
-                                                          args)
-            catalyst_output = self._invoke_plugin_per_device(
-                                const.CATALYST_PLUGIN, self._func_name(), arg)
-            output.extend(ucs_output or [])
-            output.extend(nexus_output or [])
-            output.extend(catalyst_output or [])
-            self._vlan_mgr.release_segmentation_id(tenant_id, id)
-            cdb.remove_vlan_binding(id)
-            return output
-        except:
-            # TODO (Sumit): Check if we need to perform any rollback here
-            raise
+        base_plugin_ref = kwargs[const.BASE_PLUGIN_REF]
+        n = kwargs[const.NETWORK]
+        tenant_id = n['tenant_id']
+        args = [tenant_id, id, {const.CONTEXT: context},
+                {const.BASE_PLUGIN_REF: base_plugin_ref}]
+        arg = [context, tenant_id, id]
+        vlan_binding = cdb.get_vlan_binding(id)
+        vlan_id = vlan_binding[const.VLANID]
+        vlan_name = vlan_binding[const.VLANNAME]
+        # TODO (Sumit): Might first need to check here if there are active
+        # ports
+        calls = (self._device_calls(const.UCS_PLUGIN, self._func_name(),
+                                    args) +
+                 self._device_calls(const.NEXUS_PLUGIN, self._func_name(),
+                                    args) +
+                 self._device_calls(const.CATALYST_PLUGIN, self._func_name(),
+                                    arg))
+        create_args = {
+            const.UCS_PLUGIN: [tenant_id, n['name'], id, vlan_name, vlan_id],
+            const.NEXUS_PLUGIN: [tenant_id, n['name'], id, vlan_name,
+                                 vlan_id],
+            const.CATALYST_PLUGIN: [context, n, vlan_name, vlan_id],
+        }
+        output = self._invoke_device_calls(
+            calls, self._compensate("create_network", create_args))
+        self._vlan_mgr.release_segmentation_id(tenant_id, id)
+        cdb.remove_vlan_binding(id)
+        return output
 
     def create_port(self, context, port):
         """
@@ -250,7 +290,7 @@ class NetworkMultiBladeV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         try:
             args = [context, subnet]
             output = []
-            cataylst_output = self._invoke_plugin_per_device(
+            catalyst_output = self._invoke_plugin_per_device(
                                 const.CATALYST_PLUGIN, self._func_name(), 
                                 args)
             output.extend(catalyst_output or [])
@@ -17,11 +17,11 @@
 # @author: Sumit Naiksatam, Cisco Systems, Inc.
 
 from copy import deepcopy
-import inspect
 import logging
 
 from quantum.openstack.common import importutils
 from quantum.plugins.cisco.common import cisco_constants as const
+from quantum.plugins.cisco.common import cisco_dispatch
 from quantum.plugins.cisco.l2network_model_base import L2NetworkModelBase
 from quantum.plugins.cisco import l2network_plugin_configuration as conf
 
@@ -51,7 +51,7 @@ class L2NetworkSingleBlade(L2NetworkModelBase):
 
     def _func_name(self, offset=0):
         """Get the name of the calling function"""
-        return inspect.stack()[1 + offset][3]
+        return cisco_dispatch.caller_name(offset)
 
     def _invoke_plugin_per_device(self, plugin_key, function_name, args):
         """Invoke only device plugin for all the devices in the system"""
@@ -35,6 +35,8 @@ NEXUS_IP_ADDRESS = SECTION['nexus_ip_address']
 NEXUS_FIRST_PORT = SECTION['nexus_first_port']
 NEXUS_SECOND_PORT = SECTION['nexus_second_port']
 NEXUS_SSH_PORT = SECTION['nexus_ssh_port']
+NEXUS_TRUNK_RECONCILE_INTERVAL = SECTION.get('trunk_reconcile_interval',
+                                             3600)
 
 SECTION = CP['DRIVER']
 NEXUS_DRIVER = SECTION['name']
@@ -22,31 +22,128 @@ Implements a Nexus-OS NETCONF over SSHv2 API Client
 """
 
 import logging
+import time
 
-from ncclient import manager
-
+from quantum.plugins.cisco.common import cisco_netconf_batch as nc_batch
+from quantum.plugins.cisco.common import cisco_netconf_pool as nc_pool
 from quantum.plugins.cisco.db import l2network_db as cdb
+from quantum.plugins.cisco.nexus import cisco_nexus_configuration as conf
 from quantum.plugins.cisco.nexus import cisco_nexus_snippets as snipp
 
 
 LOG = logging.getLogger(__name__)
 
 
+def vlan_ranges(vlanids):
+    """
+    Compresses a collection of VLAN IDs into the range notation accepted
+    by NX-OS, e.g. [100, 101, 102, 200] becomes "100-102,200"
+    """
+    ranges = []
+    for vlanid in sorted(set(int(v) for v in vlanids)):
+        if ranges and ranges[-1][1] == vlanid - 1:
+            ranges[-1][1] = vlanid
+        else:
+            ranges.append([vlanid, vlanid])
+    if not ranges:
+        return 'none'
+    return ','.join(first == last and str(first) or '%d-%d' % (first, last)
+                    for first, last in ranges)
+
+
+class NexusConfigTransaction(nc_batch.ConfigTransaction):
+    """
+    VLAN and trunk changes for a Nexus Switch, sent in one edit_config
+    """
+    def create_vlan(self, vlanid, vlanname):
+        self.add('vlan', vlanid, vlanname)
+
+    def delete_vlan(self, vlanid):
+        self.add('no_vlan', vlanid)
+
+    def add_vlan_to_trunk_int(self, interface, vlanid):
+        self.add('trunk_add', interface, int(vlanid))
+
+    def remove_vlan_from_trunk_int(self, interface, vlanid):
+        self.add('trunk_remove', interface, int(vlanid))
+
+    def replace_trunk_int_vlans(self, interface, vlanids):
+        self.add('trunk', interface, set(int(v) for v in vlanids))
+
+    def to_xml(self):
+        """
+        Renders the operations inside a single exec_configure block. The
+        trunk changes of each interface are folded into at most one remove
+        and one add of VLAN ranges, or into a single rewrite of the allowed
+        VLAN list if the transaction replaces it. A batch merges several
+        transactions, so the VLANs added or removed by those before the
+        replace are kept on top of the new list.
+        """
+        confstr = ''
+        trunks = {}
+        interfaces = []
+        for op in self.operations:
+            if op[0] == 'vlan':
+                confstr += snipp.CMD_VLAN_CONF_SNIPPET % (op[1], op[2])
+                continue
+            if op[0] == 'no_vlan':
+                confstr += snipp.CMD_NO_VLAN_CONF_SNIPPET % op[1]
+                continue
+            interface = op[1]
+            if interface not in trunks:
+                interfaces.append(interface)
+                trunks[interface] = (None, set(), set())
+            allowed, adds, removes = trunks[interface]
+            if op[0] == 'trunk':
+                trunks[interface] = ((set(op[2]) | adds) - removes,
+                                     adds, removes)
+            elif op[0] == 'trunk_add':
+                if allowed is not None:
+                    allowed.add(op[2])
+                adds.add(op[2])
+                removes.discard(op[2])
+            elif op[0] == 'trunk_remove':
+                if allowed is not None:
+                    allowed.discard(op[2])
+                removes.add(op[2])
+                adds.discard(op[2])
+        for interface in interfaces:
+            allowed, adds, removes = trunks[interface]
+            if allowed is not None:
+                confstr += snipp.CMD_VLAN_INT_SNIPPET % (interface,
+                                                         vlan_ranges(allowed))
+                continue
+            if removes:
+                confstr += snipp.CMD_VLAN_INT_REMOVE_SNIPPET % (
+                    interface, vlan_ranges(removes))
+            if adds:
+                confstr += snipp.CMD_VLAN_INT_ADD_SNIPPET % (
+                    interface, vlan_ranges(adds))
+        return snipp.EXEC_CONF_SNIPPET % confstr
+
+
 class CiscoNEXUSDriver():
     """
     Nexus Driver Main Class
+
+    The driver remembers which VLANs it allowed on each trunk interface, so
+    that creating or deleting a network only adds or removes that VLAN.
+    Every trunk_reconcile_interval seconds the allowed VLAN list is instead
+    rewritten from the VLANs in use, which also covers the first change
+    after a restart.
     """
     def __init__(self):
-        pass
+        self._trunk_vlans = {}
+        self._last_reconcile = {}
 
     def nxos_connect(self, nexus_host, nexus_ssh_port, nexus_user,
                      nexus_password):
         """
-        Makes the SSH connection to the Nexus Switch
+        Checks out a pooled SSH connection to the Nexus Switch, to be used
+        as a context manager
         """
-        man = manager.connect(host=nexus_host, port=nexus_ssh_port,
-                              username=nexus_user, password=nexus_password)
-        return man
+        return nc_pool.get_pool().session(nexus_host, nexus_ssh_port,
+                                          nexus_user, nexus_password)
 
     def create_xml_snippet(self, cutomized_config):
         """
@@ -116,15 +213,11 @@ class CiscoNEXUSDriver():
         Creates a VLAN and Enable on trunk mode an interface on Nexus Switch
         given the VLAN ID and Name and Interface Number
         """
-        with self.nxos_connect(nexus_host, int(nexus_ssh_port), nexus_user,
-                               nexus_password) as man:
-            self.enable_vlan(man, vlan_id, vlan_name)
-            vlan_ids = self.build_vlans_cmd()
-            LOG.debug("NexusDriver VLAN IDs: %s" % vlan_ids)
-            self.enable_vlan_on_trunk_int(man, nexus_first_interface,
-                                          vlan_ids)
-            self.enable_vlan_on_trunk_int(man, nexus_second_interface,
-                                          vlan_ids)
+        txn = NexusConfigTransaction()
+        txn.create_vlan(vlan_id, vlan_name)
+        self._update_trunks(txn, 'add', vlan_id, nexus_host, nexus_user,
+                            nexus_password, nexus_first_interface,
+                            nexus_second_interface, nexus_ssh_port)
 
     def delete_vlan(self, vlan_id, nexus_host, nexus_user, nexus_password,
                     nexus_first_interface, nexus_second_interface,
@@ -133,22 +226,69 @@ class CiscoNEXUSDriver():
         Delete a VLAN and Disables trunk mode an interface on Nexus Switch
         given the VLAN ID and Interface Number
         """
-        with self.nxos_connect(nexus_host, int(nexus_ssh_port), nexus_user,
-                               nexus_password) as man:
-            self.disable_vlan(man, vlan_id)
-            self.disable_vlan_on_trunk_int(man, nexus_first_interface,
-                                           vlan_id)
-            self.disable_vlan_on_trunk_int(man, nexus_second_interface,
-                                           vlan_id)
+        txn = NexusConfigTransaction()
+        txn.delete_vlan(vlan_id)
+        self._update_trunks(txn, 'remove', vlan_id, nexus_host, nexus_user,
+                            nexus_password, nexus_first_interface,
+                            nexus_second_interface, nexus_ssh_port)
+
+    def _update_trunks(self, txn, action, vlan_id, nexus_host, nexus_user,
+                       nexus_password, nexus_first_interface,
+                       nexus_second_interface, nexus_ssh_port):
+        """
+        Adds the trunk changes for vlan_id to the transaction and applies
+        it, keeping track of the VLANs allowed on each trunk interface
+        """
+        vlan_id = int(vlan_id)
+        interfaces = (nexus_first_interface, nexus_second_interface)
+        interval = int(conf.NEXUS_TRUNK_RECONCILE_INTERVAL)
+        now = time.time()
+        reconcile = (now - self._last_reconcile.get(nexus_host, 0) >= interval
+                     or [i for i in interfaces
+                         if (nexus_host, i) not in self._trunk_vlans])
+        if reconcile:
+            allowed = self._get_used_vlans()
+            if action == 'add':
+                allowed.add(vlan_id)
+            else:
+                allowed.discard(vlan_id)
+            LOG.debug("NexusDriver reconciling trunk VLANs: %s" %
+                      vlan_ranges(allowed))
+            for interface in interfaces:
+                txn.replace_trunk_int_vlans(interface, allowed)
+        else:
+            for interface in interfaces:
+                known = self._trunk_vlans.get((nexus_host, interface))
+                if action == 'add' and vlan_id not in known:
+                    txn.add_vlan_to_trunk_int(interface, vlan_id)
+                elif action == 'remove' and vlan_id in known:
+                    txn.remove_vlan_from_trunk_int(interface, vlan_id)
+        try:
+            nc_batch.get_batcher().apply(txn, nexus_host, nexus_ssh_port,
+                                         nexus_user, nexus_password)
+        except Exception:
+            # The switch may have applied part of the change
+            self._last_reconcile.pop(nexus_host, None)
+            raise
+        for interface in interfaces:
+            if reconcile:
+                self._trunk_vlans[(nexus_host, interface)] = set(allowed)
+            elif action == 'add':
+                self._trunk_vlans[(nexus_host, interface)].add(vlan_id)
+            else:
+                self._trunk_vlans[(nexus_host, interface)].discard(vlan_id)
+        if reconcile:
+            self._last_reconcile[nexus_host] = now
+
+    def _get_used_vlans(self):
+        """
+        Returns the set of VLAN IDs in use
+        """
+        return set(int(vlanid["vlan_id"])
+                   for vlanid in cdb.get_all_vlanids_used())
 
     def build_vlans_cmd(self):
         """
         Builds a string with all the VLANs on the same Switch
         """
-        assigned_vlan = cdb.get_all_vlanids_used()
-        vlans = ''
-        for vlanid in assigned_vlan:
-            vlans = str(vlanid["vlan_id"]) + ',' + vlans
-        if vlans == '':
-            vlans = 'none'
-        return vlans.strip(',')
+        return vlan_ranges(self._get_used_vlans())
@@ -87,6 +87,48 @@ CMD_VLAN_INT_SNIPPET = """
           </interface>
 """
 
+CMD_VLAN_INT_ADD_SNIPPET = """
+          <interface>
+            <ethernet>
+              <interface>%s</interface>
+              <__XML__MODE_if-ethernet-switch>
+                <switchport>
+                  <trunk>
+                    <allowed>
+                      <vlan>
+                        <add>
+                          <vlan>%s</vlan>
+                        </add>
+                      </vlan>
+                    </allowed>
+                  </trunk>
+                </switchport>
+              </__XML__MODE_if-ethernet-switch>
+            </ethernet>
+          </interface>
+"""
+
+CMD_VLAN_INT_REMOVE_SNIPPET = """
+          <interface>
+            <ethernet>
+              <interface>%s</interface>
+              <__XML__MODE_if-ethernet-switch>
+                <switchport>
+                  <trunk>
+                    <allowed>
+                      <vlan>
+                        <remove>
+                          <vlan>%s</vlan>
+                        </remove>
+                      </vlan>
+                    </allowed>
+                  </trunk>
+                </switchport>
+              </__XML__MODE_if-ethernet-switch>
+            </ethernet>
+          </interface>
+"""
+
 CMD_PORT_TRUNK = """
           <interface>
             <ethernet>
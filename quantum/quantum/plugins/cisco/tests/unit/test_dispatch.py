@@ -0,0 +1,118 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests for the device plugin dispatch helpers. Run as a script, this module
+also times them against the inspect based lookups they replace.
+"""
+
+import inspect
+import logging
+import timeit
+import unittest
+
+from quantum.plugins.cisco.common import cisco_dispatch
+
+
+LOG = logging.getLogger('quantum.tests.test_dispatch')
+
+
+class FakeDevicePlugin(object):
+
+    def create_network(self, tenant_id, net_name, net_id, vlan_name,
+                       vlan_id, **kwargs):
+        return (tenant_id, net_name, net_id, vlan_name, vlan_id, kwargs)
+
+    def get_network_details(self, tenant_id, net_id, **kwargs):
+        return (tenant_id, net_id, kwargs)
+
+    def _private(self):
+        pass
+
+
+class FakeModel(object):
+
+    def _func_name(self, offset=0):
+        return cisco_dispatch.caller_name(offset)
+
+    def create_network(self):
+        return self._func_name()
+
+    def nested(self):
+        return self._helper()
+
+    def _helper(self):
+        return self._func_name(1)
+
+
+class TestDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.table = cisco_dispatch.DispatchTable(FakeDevicePlugin())
+
+    def test_caller_name(self):
+        """The lookup names the same function inspect.stack() would"""
+        model = FakeModel()
+        self.assertEqual(model.create_network(), 'create_network')
+        self.assertEqual(model.nested(), 'nested')
+
+    def test_lookup(self):
+        method, nargs = self.table.lookup('create_network')
+        self.assertEqual(nargs, 5)
+        method, nargs = self.table.lookup('get_network_details')
+        self.assertEqual(nargs, 2)
+        self.assertFalse('_private' in self.table._methods)
+
+    def test_call_maps_extra_args_to_kwargs(self):
+        result = self.table.call('get_network_details',
+                                 ['t1', 'n1', {'device_ip': '1.1.1.1'}],
+                                 {'extra': True})
+        self.assertEqual(result, ('t1', 'n1', {'device_ip': '1.1.1.1',
+                                               'extra': True}))
+
+    def test_call_with_exact_args(self):
+        result = self.table.call('create_network',
+                                 ['t1', 'net', 'n1', 'vlan', 10], {})
+        self.assertEqual(result, ('t1', 'net', 'n1', 'vlan', 10, {}))
+
+
+def benchmark(number=10000):
+    """Prints the time per call of the old and new lookups"""
+    plugin = FakeDevicePlugin()
+    table = cisco_dispatch.DispatchTable(plugin)
+
+    class StackModel(FakeModel):
+        def _func_name(self, offset=0):
+            return inspect.stack()[1 + offset][3]
+
+    def _getargspec():
+        func = getattr(plugin, 'create_network')
+        return len(inspect.getargspec(func).args) - 1
+
+    timings = [
+        ('inspect.stack() _func_name',
+         StackModel().create_network, number / 100),
+        ('caller_name() _func_name', FakeModel().create_network, number),
+        ('inspect.getargspec()', _getargspec, number),
+        ('DispatchTable.lookup()',
+         lambda: table.lookup('create_network'), number)]
+    for name, func, count in timings:
+        seconds = timeit.timeit(func, number=count)
+        print '%-30s %10.2f usec per call' % (name, seconds * 1e6 / count)
+
+
+if __name__ == '__main__':
+    benchmark()
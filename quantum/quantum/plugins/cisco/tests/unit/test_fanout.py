@@ -0,0 +1,135 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import time
+import unittest
+
+import eventlet
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.common import cisco_fanout
+from quantum.plugins.cisco.common import cisco_netconf_batch as nc_batch
+
+
+LOG = logging.getLogger('quantum.tests.test_fanout')
+
+
+class FakeDevice(object):
+    """Configures a VLAN after a delay, or fails"""
+
+    def __init__(self, delay=0, error=None):
+        self.delay = delay
+        self.error = error
+        self.vlans = set()
+
+    def create_vlan(self, vlan_id):
+        eventlet.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.vlans.add(vlan_id)
+        return vlan_id
+
+    def delete_vlan(self, vlan_id):
+        self.vlans.discard(vlan_id)
+
+
+class FakeTransaction(nc_batch.ConfigTransaction):
+
+    def to_xml(self):
+        return ','.join(str(op[0]) for op in self.operations)
+
+
+class FakeSwitchPool(object):
+    """Hands out one session to a switch that is slow to answer"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.configs = []
+
+    def session(self, host, port, username, password):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def edit_config(self, target, config):
+        eventlet.sleep(self.delay)
+        self.configs.append(config)
+
+
+class TestFanOut(unittest.TestCase):
+
+    def _rollback(self, devices):
+        return lambda key, result: devices[key].delete_vlan(result)
+
+    def test_calls_run_concurrently(self):
+        devices = [FakeDevice(delay=0.1) for i in range(5)]
+        start = time.time()
+        results = cisco_fanout.call_all(
+            [(i, devices[i].create_vlan, (100 + i,)) for i in range(5)])
+        self.assertTrue(time.time() - start < 0.3)
+        self.assertEqual(results, [100, 101, 102, 103, 104])
+
+    def test_failure_rolls_back_the_others(self):
+        devices = [FakeDevice(), FakeDevice(error=ValueError('boom')),
+                   FakeDevice()]
+        self.assertRaises(ValueError, cisco_fanout.call_all,
+                          [(i, devices[i].create_vlan, (100,))
+                           for i in range(3)],
+                          rollback=self._rollback(devices))
+        self.assertEqual([d.vlans for d in devices], [set(), set(), set()])
+
+    def test_slow_device_times_out(self):
+        devices = [FakeDevice(), FakeDevice(delay=1)]
+        start = time.time()
+        self.assertRaises(cexc.DeviceCallTimeout, cisco_fanout.call_all,
+                          [(i, devices[i].create_vlan, (100,))
+                           for i in range(2)],
+                          rollback=self._rollback(devices), timeout=0.05)
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertFalse(devices[0].vlans)
+
+    def test_failed_rollback_raises_original_error(self):
+        def rollback(key, result):
+            raise RuntimeError('rollback failed')
+
+        device = FakeDevice(error=ValueError('boom'))
+        self.assertRaises(ValueError, cisco_fanout.call_all,
+                          [(0, FakeDevice().create_vlan, (100,)),
+                           (1, device.create_vlan, (100,))],
+                          rollback=rollback)
+
+    def test_timed_out_batched_call(self):
+        switch = FakeSwitchPool(delay=0.2)
+        batcher = nc_batch.ConfigBatcher(switch, window=0.01, timeout=5)
+
+        def create_vlan(vlan_id):
+            txn = FakeTransaction()
+            txn.add(vlan_id)
+            batcher.apply(txn, '1.1.1.1', 22, 'admin', 'pw')
+            return vlan_id
+
+        self.assertRaises(cexc.DeviceCallTimeout, cisco_fanout.call_all,
+                          [(i, create_vlan, (100 + i,)) for i in range(2)],
+                          timeout=0.05)
+        with eventlet.Timeout(1):
+            self.assertEqual(cisco_fanout.call_all(
+                [(0, create_vlan, (102,))], timeout=0.5), [102])
+        self.assertEqual(switch.configs, ['100,101', '102'])
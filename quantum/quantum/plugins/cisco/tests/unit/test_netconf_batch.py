@@ -0,0 +1,137 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import unittest
+
+import eventlet
+import greenlet
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.common import cisco_netconf_batch as nc_batch
+from quantum.plugins.cisco.common import cisco_netconf_pool as nc_pool
+
+
+LOG = logging.getLogger('quantum.tests.test_netconf_batch')
+
+
+class FakeTransaction(nc_batch.ConfigTransaction):
+
+    def to_xml(self):
+        return ','.join(str(op[0]) for op in self.operations)
+
+
+class FakeManager(object):
+
+    def __init__(self, configs, **kwargs):
+        self.configs = configs
+        self.connected = True
+
+    def edit_config(self, target, config):
+        eventlet.sleep(0)
+        if 'slow' in config.split(','):
+            eventlet.sleep(1)
+        if 'bad' in config.split(','):
+            raise ValueError(config)
+        self.configs.append(config)
+
+    def close_session(self):
+        self.connected = False
+
+
+class TestConfigBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.configs = []
+        pool = nc_pool.NetconfSessionPool(
+            connect=lambda **kw: FakeManager(self.configs, **kw))
+        self.batcher = nc_batch.ConfigBatcher(pool, window=0.01)
+
+    def _apply(self, *ops):
+        txn = FakeTransaction()
+        for op in ops:
+            txn.add(op)
+        self.batcher.apply(txn, '1.1.1.1', 22, 'admin', 'pw')
+
+    def test_single_transaction(self):
+        """A transaction on its own is sent as one edit_config"""
+        self._apply('a', 'b', 'c')
+        self.assertEqual(self.configs, ['a,b,c'])
+
+    def test_concurrent_transactions_are_coalesced(self):
+        """Transactions submitted within the window share one RPC"""
+        pool = eventlet.GreenPool()
+        for i in range(20):
+            pool.spawn_n(self._apply, i)
+        pool.waitall()
+        self.assertEqual(len(self.configs), 1)
+        self.assertEqual(self.configs[0],
+                         ','.join(str(i) for i in range(20)))
+        stats = self.batcher.get_stats()
+        self.assertEqual(stats['transactions'], 20)
+        self.assertEqual(stats['rpcs'], 1)
+
+    def test_failed_batch_is_retried_per_transaction(self):
+        """Only the caller whose change was rejected sees the error"""
+        results = {}
+
+        def _apply(op):
+            try:
+                self._apply(op)
+                results[op] = 'ok'
+            except ValueError:
+                results[op] = 'error'
+
+        pool = eventlet.GreenPool()
+        for op in ('a', 'bad', 'c'):
+            pool.spawn_n(_apply, op)
+        pool.waitall()
+        self.assertEqual(results, {'a': 'ok', 'bad': 'error', 'c': 'ok'})
+        self.assertEqual(self.configs, ['a', 'c'])
+
+    def test_interrupted_caller(self):
+        """Interrupting a caller does not abort the batch it joined"""
+        first = eventlet.spawn(self._apply, 'a')
+        second = eventlet.spawn(self._apply, 'b')
+        eventlet.sleep(0)
+        first.kill()
+        with eventlet.Timeout(1):
+            second.wait()
+            self._apply('c')
+        self.assertEqual(self.configs, ['a,b', 'c'])
+
+    def test_interrupted_leader(self):
+        """Callers of a batch whose leader dies are not left waiting"""
+        def _send_batch(key, password, batch):
+            raise greenlet.GreenletExit()
+
+        self.batcher._send_batch = _send_batch
+        with eventlet.Timeout(1):
+            self.assertRaises(cexc.ConfigBatchAborted, self._apply, 'a')
+        del self.batcher._send_batch
+        with eventlet.Timeout(1):
+            self._apply('b')
+        self.assertEqual(self.configs, ['b'])
+
+    def test_wait_timeout(self):
+        """Callers stop waiting for a switch after the batch timeout"""
+        self.batcher.timeout = 0.1
+        with eventlet.Timeout(3):
+            self.assertRaises(cexc.ConfigBatchTimeout, self._apply, 'slow')
+            self.assertEqual(self.configs, [])
+            eventlet.sleep(1)
+            self._apply('a')
+        self.assertEqual(self.configs, ['slow', 'a'])
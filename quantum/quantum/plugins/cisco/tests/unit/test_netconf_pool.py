@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import unittest
+
+import eventlet
+import mock
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.common import cisco_netconf_pool as nc_pool
+
+
+LOG = logging.getLogger('quantum.tests.test_netconf_pool')
+
+
+class FakeManager(object):
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.connected = True
+        self.closed = False
+
+    def close_session(self):
+        self.connected = False
+        self.closed = True
+
+
+class TestNetconfSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.managers = []
+        self.pool = nc_pool.NetconfSessionPool(max_sessions=1,
+                                               checkout_timeout=0,
+                                               connect=self._connect)
+
+    def _connect(self, **kwargs):
+        mgr = FakeManager(**kwargs)
+        self.managers.append(mgr)
+        return mgr
+
+    def test_session_is_reused(self):
+        """Second checkout to the same switch reuses the open session"""
+        with self.pool.session('1.1.1.1', '22', 'admin', 'pw') as first:
+            pass
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as second:
+            pass
+        self.assertTrue(first is second)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['opens'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_sessions_are_per_switch(self):
+        """Each switch gets its own session"""
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw'):
+            with self.pool.session('2.2.2.2', 22, 'admin', 'pw'):
+                pass
+        self.assertEqual(len(self.managers), 2)
+        self.assertEqual(self.managers[1].kwargs['host'], '2.2.2.2')
+
+    def test_dropped_session_is_reopened(self):
+        """A session closed by the switch is replaced on checkout"""
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as mgr:
+            pass
+        mgr.connected = False
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as new_mgr:
+            pass
+        self.assertFalse(mgr is new_mgr)
+        self.assertEqual(self.pool.get_stats()['reconnects'], 1)
+
+    def test_broken_session_not_returned(self):
+        """A session that died while in use is not put back in the pool"""
+        try:
+            with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as mgr:
+                mgr.connected = False
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(self.pool.get_stats()['idle'], 0)
+
+    def test_idle_sessions_are_evicted(self):
+        """Sessions idle for longer than idle_timeout are closed"""
+        self.pool.idle_timeout = 0
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as mgr:
+            pass
+        self.pool.reap()
+        self.assertTrue(mgr.closed)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['idle'], 0)
+
+    def test_reaper_evicts_idle_sessions(self):
+        """The reaper closes idle sessions without waiting for a checkout"""
+        self.pool.idle_timeout = 0
+        self.pool.reap_interval = 0.01
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as mgr:
+            pass
+        with mock.patch.object(nc_pool.LOG, 'info') as info:
+            self.pool.start_reaper()
+            try:
+                eventlet.sleep(0.05)
+            finally:
+                self.pool.stop()
+        self.assertTrue(mgr.closed)
+        self.assertEqual(self.pool.get_stats()['evictions'], 1)
+        # The pool counters are logged by the reaper
+        self.assertTrue(info.called)
+        self.assertTrue("'evictions': 1" in info.call_args[0][0])
+
+    def test_stop_closes_idle_sessions(self):
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw') as mgr:
+            pass
+        self.pool.stop()
+        self.assertTrue(mgr.closed)
+        self.assertEqual(self.pool.get_stats()['idle'], 0)
+
+    def test_checkout_timeout(self):
+        """Checkout fails once max_sessions are busy past the timeout"""
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw'):
+            self.assertRaises(cexc.NetconfSessionTimeout,
+                              self.pool.session('1.1.1.1', 22, 'admin',
+                                                'pw').__enter__)
+
+    def test_failed_connect_releases_slot(self):
+        """A failed connect does not leak a session slot"""
+        def _fail(**kwargs):
+            raise IOError()
+        self.pool._connect = _fail
+        self.assertRaises(IOError,
+                          self.pool.session('1.1.1.1', 22, 'admin',
+                                            'pw').__enter__)
+        self.pool._connect = self._connect
+        with self.pool.session('1.1.1.1', 22, 'admin', 'pw'):
+            pass
+        self.assertEqual(self.pool.get_stats()['opens'], 1)
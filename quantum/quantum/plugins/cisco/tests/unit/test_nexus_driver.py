@@ -0,0 +1,209 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import unittest
+
+import mock
+
+from quantum.plugins.cisco.common import cisco_netconf_batch as nc_batch
+from quantum.plugins.cisco.db import l2network_db as cdb
+from quantum.plugins.cisco.nexus import cisco_nexus_configuration as conf
+from quantum.plugins.cisco.nexus import cisco_nexus_network_driver as driver
+from quantum.plugins.cisco.nexus import cisco_nexus_snippets as snipp
+
+
+LOG = logging.getLogger('quantum.tests.test_nexus_driver')
+
+HOST = '1.1.1.1'
+INTERFACES = ('1/1', '1/2')
+
+
+class TestVlanRanges(unittest.TestCase):
+
+    def test_no_vlans(self):
+        self.assertEqual(driver.vlan_ranges([]), 'none')
+
+    def test_single_vlan(self):
+        self.assertEqual(driver.vlan_ranges([100]), '100')
+
+    def test_consecutive_vlans_are_folded(self):
+        self.assertEqual(driver.vlan_ranges([102, 100, 101, 200]),
+                         '100-102,200')
+
+    def test_duplicates_and_strings(self):
+        self.assertEqual(driver.vlan_ranges(['5', 5, 6, '8']), '5-6,8')
+
+
+class TestNexusConfigTransaction(unittest.TestCase):
+
+    def _xml(self, *snippets):
+        return snipp.EXEC_CONF_SNIPPET % ''.join(snippets)
+
+    def test_vlans(self):
+        txn = driver.NexusConfigTransaction()
+        txn.create_vlan(100, 'net1')
+        txn.delete_vlan(200)
+        self.assertEqual(txn.to_xml(),
+                         self._xml(snipp.CMD_VLAN_CONF_SNIPPET %
+                                   (100, 'net1'),
+                                   snipp.CMD_NO_VLAN_CONF_SNIPPET % 200))
+
+    def test_trunk_changes_are_folded(self):
+        """The changes of an interface become one remove and one add"""
+        txn = driver.NexusConfigTransaction()
+        txn.add_vlan_to_trunk_int('1/1', 100)
+        txn.add_vlan_to_trunk_int('1/1', '101')
+        txn.remove_vlan_from_trunk_int('1/1', 300)
+        txn.add_vlan_to_trunk_int('1/1', 300)
+        txn.remove_vlan_from_trunk_int('1/1', 200)
+        txn.add_vlan_to_trunk_int('1/2', 100)
+        self.assertEqual(txn.to_xml(),
+                         self._xml(snipp.CMD_VLAN_INT_REMOVE_SNIPPET %
+                                   ('1/1', '200'),
+                                   snipp.CMD_VLAN_INT_ADD_SNIPPET %
+                                   ('1/1', '100-101,300'),
+                                   snipp.CMD_VLAN_INT_ADD_SNIPPET %
+                                   ('1/2', '100')))
+
+    def test_replace_absorbs_later_changes(self):
+        txn = driver.NexusConfigTransaction()
+        txn.replace_trunk_int_vlans('1/1', [100, 101])
+        txn.add_vlan_to_trunk_int('1/1', 102)
+        txn.remove_vlan_from_trunk_int('1/1', 100)
+        self.assertEqual(txn.to_xml(),
+                         self._xml(snipp.CMD_VLAN_INT_SNIPPET %
+                                   ('1/1', '101-102')))
+
+    def test_replace_keeps_earlier_changes_of_the_batch(self):
+        """A replace merged after other transactions keeps their changes"""
+        batch = driver.NexusConfigTransaction()
+        added = driver.NexusConfigTransaction()
+        added.add_vlan_to_trunk_int('1/1', 300)
+        removed = driver.NexusConfigTransaction()
+        removed.remove_vlan_from_trunk_int('1/1', 101)
+        replaced = driver.NexusConfigTransaction()
+        replaced.replace_trunk_int_vlans('1/1', [100, 101])
+        for txn in (added, removed, replaced):
+            batch.merge(txn)
+        self.assertEqual(batch.to_xml(),
+                         self._xml(snipp.CMD_VLAN_INT_SNIPPET %
+                                   ('1/1', '100,300')))
+
+    def test_empty_replace(self):
+        txn = driver.NexusConfigTransaction()
+        txn.replace_trunk_int_vlans('1/1', [])
+        self.assertEqual(txn.to_xml(),
+                         self._xml(snipp.CMD_VLAN_INT_SNIPPET %
+                                   ('1/1', 'none')))
+
+
+class FakeBatcher(object):
+
+    def __init__(self):
+        self.txns = []
+        self.error = None
+
+    def apply(self, txn, host, port, user, password):
+        self.txns.append(txn)
+        if self.error:
+            raise self.error
+
+
+class TestNexusDriverTrunks(unittest.TestCase):
+
+    def setUp(self):
+        self.used = set()
+        self.now = 1000.0
+        self.batcher = FakeBatcher()
+        patches = [
+            mock.patch.object(nc_batch, 'get_batcher',
+                              lambda: self.batcher),
+            mock.patch.object(cdb, 'get_all_vlanids_used',
+                              lambda: [{'vlan_id': str(v)}
+                                       for v in self.used]),
+            mock.patch.object(conf, 'NEXUS_TRUNK_RECONCILE_INTERVAL', '60'),
+            mock.patch.object(driver.time, 'time', lambda: self.now)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.driver = driver.CiscoNEXUSDriver()
+
+    def _create(self, vlan_id):
+        self.used.add(vlan_id)
+        self.driver.create_vlan('net%d' % vlan_id, vlan_id, HOST, 'admin',
+                                'pw', INTERFACES[0], INTERFACES[1], 22)
+
+    def _delete(self, vlan_id):
+        self.used.discard(vlan_id)
+        self.driver.delete_vlan(vlan_id, HOST, 'admin', 'pw',
+                                INTERFACES[0], INTERFACES[1], 22)
+
+    def _trunk_ops(self):
+        return [op for op in self.batcher.txns[-1].operations
+                if op[0].startswith('trunk')]
+
+    def _known(self):
+        return [self.driver._trunk_vlans[(HOST, i)] for i in INTERFACES]
+
+    def test_first_change_reconciles(self):
+        self.used.add(100)
+        self._create(200)
+        self.assertEqual(self._trunk_ops(),
+                         [('trunk', '1/1', set([100, 200])),
+                          ('trunk', '1/2', set([100, 200]))])
+        self.assertEqual(self._known(), [set([100, 200])] * 2)
+
+    def test_changes_within_interval_are_incremental(self):
+        self._create(100)
+        self.now += 30
+        self._create(200)
+        self.assertEqual(self._trunk_ops(),
+                         [('trunk_add', '1/1', 200),
+                          ('trunk_add', '1/2', 200)])
+        self._delete(100)
+        self.assertEqual(self._trunk_ops(),
+                         [('trunk_remove', '1/1', 100),
+                          ('trunk_remove', '1/2', 100)])
+        self.assertEqual(self._known(), [set([200])] * 2)
+
+    def test_known_vlans_are_not_sent_again(self):
+        self._create(100)
+        self._create(100)
+        self.assertEqual(self._trunk_ops(), [])
+        self._delete(200)
+        self.assertEqual(self._trunk_ops(), [])
+
+    def test_reconcile_after_interval(self):
+        self._create(100)
+        # Allowed on the switch meanwhile by another server
+        self.used.add(150)
+        self.now += 60
+        self._create(200)
+        self.assertEqual(self._trunk_ops(),
+                         [('trunk', '1/1', set([100, 150, 200])),
+                          ('trunk', '1/2', set([100, 150, 200]))])
+        self.assertEqual(self._known(), [set([100, 150, 200])] * 2)
+
+    def test_failure_forces_reconcile(self):
+        self._create(100)
+        self.batcher.error = ValueError()
+        self.assertRaises(ValueError, self._create, 200)
+        self.assertEqual(self._known(), [set([100])] * 2)
+        self.batcher.error = None
+        self._create(300)
+        self.assertEqual(self._trunk_ops()[0],
+                         ('trunk', '1/1', set([100, 200, 300])))
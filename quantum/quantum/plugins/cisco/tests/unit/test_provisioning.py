@@ -0,0 +1,268 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import time
+import unittest
+
+import eventlet
+import mock
+import sqlalchemy as sql
+from sqlalchemy import orm
+
+from quantum import context
+from quantum.db import api as db
+from quantum.db import models_v2
+from quantum.plugins.cisco.common import cisco_provisioning as prov
+from quantum.plugins.cisco.db import api as cisco_db
+from quantum.plugins.cisco.db import l2network_db as cdb
+from quantum.plugins.cisco.db import l2network_models_v2
+from quantum.plugins.cisco import l2network_plugin_v2
+from quantum import wsgi
+
+
+LOG = logging.getLogger('quantum.tests.test_provisioning')
+
+DeviceJob = l2network_models_v2.DeviceJob
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        engine = sql.create_engine('sqlite:///:memory:')
+        DeviceJob.__table__.create(engine)
+        maker = orm.sessionmaker(bind=engine, autocommit=True,
+                                 expire_on_commit=False)
+        self.queue = prov.JobQueue(DeviceJob, maker)
+        self.calls = []
+        self.failures = []
+
+    def _worker(self, handler=None, **kwargs):
+        def record(operation):
+            def call(resource_id, payload):
+                self.calls.append((operation, resource_id, payload))
+                if handler:
+                    handler(operation, resource_id, payload)
+            return call
+
+        def on_failure(operation, resource_id, payload, error):
+            self.failures.append((operation, resource_id, str(error)))
+
+        handlers = dict((op, record(op))
+                        for op in ('create_network', 'delete_network'))
+        return prov.ProvisioningWorker(self.queue, handlers,
+                                       on_failure=on_failure, **kwargs)
+
+    def _run(self, worker):
+        worker.run_once()
+        worker.wait()
+
+    def test_delete_cancels_pending_create(self):
+        self.queue.enqueue('net1', 'create_network', {'vlan_id': 100})
+        self.assertEqual(self.queue.enqueue('net1', 'delete_network', {},
+                                            cancels=('create_network',)),
+                         None)
+        self.assertEqual(self.queue.get_jobs('net1'), [])
+
+    def test_same_operation_is_merged(self):
+        self.queue.enqueue('net1', 'create_network', {'vlan_id': 100})
+        self.queue.enqueue('net1', 'create_network', {'vlan_id': 101})
+        jobs = self.queue.get_jobs('net1')
+        self.assertEqual(len(jobs), 1)
+        self._run(self._worker())
+        self.assertEqual(self.calls,
+                         [('create_network', 'net1', {'vlan_id': 101})])
+
+    def test_jobs_of_a_resource_run_in_order(self):
+        self.queue.enqueue('net1', 'create_network', {})
+        self.queue.enqueue('net2', 'create_network', {})
+        worker = self._worker()
+        self._run(worker)
+        self.queue.enqueue('net1', 'delete_network', {})
+        self.queue.enqueue('net1', 'create_network', {})
+        self._run(worker)
+        self._run(worker)
+        self.assertEqual(self.calls, [('create_network', 'net1', {}),
+                                      ('create_network', 'net2', {}),
+                                      ('delete_network', 'net1', {}),
+                                      ('create_network', 'net1', {})])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        def handler(operation, resource_id, payload):
+            raise ValueError('device unreachable')
+
+        self.queue.enqueue('net1', 'create_network', {})
+        worker = self._worker(handler, max_attempts=2, retry_interval=0.05)
+        self._run(worker)
+        job = self.queue.get_jobs('net1')[0]
+        self.assertEqual((job.status, job.attempts), (prov.PENDING, 1))
+        self.assertEqual(job.last_error, 'device unreachable')
+        self._run(worker)
+        self.assertEqual(len(self.calls), 1)
+        time.sleep(0.1)
+        self._run(worker)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.queue.get_jobs('net1')[0].status, prov.FAILED)
+        self.assertEqual(self.failures,
+                         [('create_network', 'net1', 'device unreachable')])
+
+    def test_stale_running_job_is_claimed_again(self):
+        self.queue.enqueue('net1', 'create_network', {})
+        self.assertEqual(len(self.queue.claim(10)), 1)
+        self.assertEqual(self.queue.claim(10), [])
+        time.sleep(0.1)
+        self.assertEqual(len(self.queue.claim(10, job_timeout=0.05)), 1)
+
+    def test_slow_running_job_is_not_claimed_again(self):
+        """The worker's heartbeat keeps a slow job from running twice"""
+        def handler(operation, resource_id, payload):
+            eventlet.sleep(0.2)
+
+        self.queue.enqueue('net1', 'create_network', {})
+        worker = self._worker(handler, job_timeout=0.05)
+        worker.run_once()
+        eventlet.sleep(0.1)
+        worker.run_once()
+        self.assertEqual(self.queue.claim(10, job_timeout=0.05), [])
+        worker.wait()
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.queue.get_jobs('net1'), [])
+
+
+class FakeModel(object):
+    """Records the device calls of the plugin"""
+
+    def __init__(self):
+        self.calls = []
+
+    def create_network(self, args):
+        context, network, vlan_name, vlan_id = args
+        self.calls.append(('create_network', network['id'], vlan_id))
+
+    def delete_network(self, args):
+        context, network_id = args
+        self.calls.append(('delete_network', network_id))
+
+    def get_ports(self, args):
+        pass
+
+
+class FakeVlanManager(object):
+
+    def __init__(self):
+        self.reserved = []
+
+    def reserve_segmentation_id(self, tenant_id, net_name):
+        self.reserved.append(100)
+        return 100
+
+    def release_segmentation_id(self, tenant_id, net_id):
+        self.reserved.remove(100)
+
+
+class TestAsyncProvisioning(unittest.TestCase):
+
+    def setUp(self):
+        options = {'sql_connection': 'sqlite:///:memory:',
+                   'base': models_v2.model_base.BASEV2}
+        for api in (db, cisco_db):
+            api._ENGINE = None
+            api._MAKER = None
+            api.configure_db(options)
+        patches = [mock.patch.object(cdb, 'add_vlan_binding'),
+                   mock.patch.object(cdb, 'remove_vlan_binding'),
+                   mock.patch.object(wsgi, 'call_when_serving')]
+        self.add_vlan_binding, self.remove_vlan_binding, serving = [
+            patch.start() for patch in patches]
+        for patch in patches:
+            self.addCleanup(patch.stop)
+        # Without the device plugins and the credentials of the real one
+        self.plugin = l2network_plugin_v2.L2NetworkV2.__new__(
+            l2network_plugin_v2.L2NetworkV2)
+        self.plugin._model = FakeModel()
+        self.plugin._vlan_mgr = FakeVlanManager()
+        self.plugin._start_provisioning()
+        serving.assert_called_once_with(self.plugin._provisioner.start)
+
+    def tearDown(self):
+        for api in (db, cisco_db):
+            api._ENGINE = None
+            api._MAKER = None
+
+    def _create_network(self):
+        return self.plugin.create_network(
+            context.get_admin_context(),
+            {'network': {'name': 'net1', 'admin_state_up': True,
+                         'tenant_id': 't1'}})
+
+    def _status(self, network_id):
+        return self.plugin._get_network(context.get_admin_context(),
+                                        network_id).status
+
+    def _provision(self):
+        self.plugin._provisioner.run_once()
+        self.plugin._provisioner.wait()
+
+    def test_create_network(self):
+        net = self._create_network()
+        self.assertEqual(net['status'], 'BUILD')
+        self.assertEqual(self._status(net['id']), 'BUILD')
+        self.assertEqual(self.plugin._model.calls, [])
+        self._provision()
+        self.assertEqual(self.plugin._model.calls,
+                         [('create_network', net['id'], 100)])
+        self.assertEqual(self._status(net['id']), 'ACTIVE')
+        self.assertEqual(self.add_vlan_binding.call_count, 1)
+
+    def test_delete_network(self):
+        net = self._create_network()
+        self._provision()
+        self.plugin.delete_network(context.get_admin_context(), net['id'])
+        self.assertRaises(Exception, self._status, net['id'])
+        self.assertEqual(self.plugin._vlan_mgr.reserved, [100])
+        self._provision()
+        self.assertEqual(self.plugin._model.calls,
+                         [('create_network', net['id'], 100),
+                          ('delete_network', net['id'])])
+        self.assertEqual(self.plugin._vlan_mgr.reserved, [])
+        self.remove_vlan_binding.assert_called_once_with(net['id'])
+
+    def test_delete_network_before_provisioning(self):
+        net = self._create_network()
+        self.plugin.delete_network(context.get_admin_context(), net['id'])
+        self.assertEqual(self.plugin._vlan_mgr.reserved, [])
+        self.remove_vlan_binding.assert_called_once_with(net['id'])
+        self._provision()
+        self.assertEqual(self.plugin._model.calls, [])
+
+    def test_create_network_is_undone_if_the_job_is_not_queued(self):
+        with mock.patch.object(self.plugin._jobs, 'enqueue',
+                               side_effect=ValueError()):
+            self.assertRaises(ValueError, self._create_network)
+        session = context.get_admin_context().session
+        self.assertEqual(session.query(models_v2.Network).count(), 0)
+        self.assertEqual(self.plugin._vlan_mgr.reserved, [])
+        self.assertEqual(self.remove_vlan_binding.call_count, 1)
+
+    def test_delete_network_is_undone_if_the_job_is_not_queued(self):
+        net = self._create_network()
+        self._provision()
+        with mock.patch.object(self.plugin._jobs, 'enqueue',
+                               side_effect=ValueError()):
+            self.assertRaises(ValueError, self.plugin.delete_network,
+                              context.get_admin_context(), net['id'])
+        self.assertEqual(self._status(net['id']), 'ACTIVE')
+        self.assertEqual(self.plugin._vlan_mgr.reserved, [100])
@@ -0,0 +1,200 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import socket
+import unittest
+from xml.etree import ElementTree as et
+
+import eventlet
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.ucs import cisco_ucs_client as ucs_client
+from quantum.plugins.cisco.ucs import cisco_ucs_network_driver as driver
+
+
+LOG = logging.getLogger('quantum.tests.test_ucs_client')
+
+
+class FakeResponse(object):
+
+    def __init__(self, body):
+        self.body = body
+
+    def read(self):
+        return self.body
+
+
+class FakeUCSM(object):
+    """Answers XML API requests the way UCSM does"""
+
+    def __init__(self):
+        self.requests = []
+        self.cookies = 0
+        self.valid = set()
+
+    def handle(self, data):
+        self.requests.append(data)
+        tree = et.XML(data)
+        if tree.tag in ('aaaLogin', 'aaaRefresh'):
+            self.cookies += 1
+            cookie = 'cookie-%d' % self.cookies
+            self.valid.add(cookie)
+            return ('<%s outCookie="%s" outRefreshPeriod="600" />' %
+                    (tree.tag, cookie))
+        if tree.tag == 'aaaLogout':
+            self.valid.discard(tree.get('inCookie'))
+            return '<aaaLogout outStatus="success" />'
+        if tree.get('cookie') not in self.valid:
+            return ('<%s errorCode="552" errorDescr="Authorization required"'
+                    ' />' % tree.tag)
+        return '<%s response="yes"><outConfigs /></%s>' % (tree.tag, tree.tag)
+
+
+class FakeConnection(object):
+
+    def __init__(self, ucsm):
+        self.ucsm = ucsm
+        self.dropped = False
+        self.closed = False
+        self.response = None
+
+    def request(self, method, url, data, headers):
+        if self.dropped:
+            raise socket.error('connection reset')
+        self.response = FakeResponse(self.ucsm.handle(data))
+
+    def getresponse(self):
+        return self.response
+
+    def close(self):
+        self.closed = True
+
+
+class TestUCSMClient(unittest.TestCase):
+
+    def setUp(self):
+        self.ucsm = FakeUCSM()
+        self.connections = []
+        self.client = ucs_client.UCSMClient(connect=self._connect)
+
+    def _connect(self, ucsm_ip):
+        conn = FakeConnection(self.ucsm)
+        self.connections.append(conn)
+        return conn
+
+    def _post(self, data='<configConfMos cookie="%s" />' %
+              ucs_client.COOKIE_VALUE):
+        return self.client.post('1.1.1.1', 'admin', 'pw', data)
+
+    def test_session_and_connection_are_reused(self):
+        """Requests share one login and one keep-alive connection"""
+        for i in range(3):
+            self._post()
+        self.assertEqual([et.XML(r).tag for r in self.ucsm.requests],
+                         ['aaaLogin'] + ['configConfMos'] * 3)
+        stats = self.client.get_stats()
+        self.assertEqual(stats['logins'], 1)
+        self.assertEqual(stats['opens'], 1)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_cookie_is_refreshed_before_it_expires(self):
+        self._post()
+        session = self.client._sessions[('1.1.1.1', 'admin')]
+        session.expires -= 590
+        self._post()
+        refresh = et.XML(self.ucsm.requests[2])
+        self.assertEqual(refresh.tag, 'aaaRefresh')
+        self.assertEqual(refresh.get('inCookie'), 'cookie-1')
+        self.assertEqual(et.XML(self.ucsm.requests[3]).get('cookie'),
+                         'cookie-2')
+
+    def test_rejected_cookie_logs_in_again(self):
+        self._post()
+        self.ucsm.valid.clear()
+        response = self._post()
+        self.assertFalse(et.XML(response).get('errorCode'))
+        self.assertEqual(self.client.get_stats()['logins'], 2)
+
+    def test_closed_connection_is_replaced(self):
+        self._post()
+        self.connections[0].dropped = True
+        self._post()
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.client.get_stats()['reconnects'], 1)
+
+    def test_failed_login(self):
+        self.ucsm.handle = lambda data: ('<aaaLogin errorCode="551" '
+                                         'errorDescr="bad password" />')
+        self.assertRaises(cexc.UCSMLoginFailed, self._post)
+
+    def test_close_all_logs_out(self):
+        self._post()
+        self.client.close_all()
+        self.assertEqual(et.XML(self.ucsm.requests[-1]).tag, 'aaaLogout')
+        self.assertFalse(self.ucsm.valid)
+        self.assertTrue(self.connections[0].closed)
+
+
+class TestUCSMConfigBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.ucsm = FakeUCSM()
+        self.client = ucs_client.UCSMClient(
+            connect=lambda ucsm_ip: FakeConnection(self.ucsm))
+        self.batcher = ucs_client.UCSMConfigBatcher(self.client, window=0)
+        self.ucs_driver = driver.CiscoUCSMDriver()
+
+    def _apply(self, *documents):
+        txn = ucs_client.ConfMosTransaction()
+        for document in documents:
+            txn.add_document(document)
+        self.batcher.apply(txn, '1.1.1.1', ucs_client.HTTPS_PORT, 'admin',
+                           'pw')
+
+    def _pair_keys(self, request):
+        return [pair.get('key') for pair in
+                et.XML(request).find('inConfigs').findall('pair')]
+
+    def test_merge_conf_mos(self):
+        profile = self.ucs_driver._create_profile_post_data('q-1', 'vlan1')
+        pclient = self.ucs_driver._create_pclient_post_data('q-1', 'q-1')
+        merged = ucs_client.merge_conf_mos([profile, pclient])
+        self.assertEqual(self._pair_keys(merged),
+                         ['fabric/lan/profiles/vnic-q-1',
+                          'fabric/lan/profiles/vnic-q-1/cl-q-1'])
+
+    def test_concurrent_changes_share_a_request(self):
+        pool = eventlet.GreenPool()
+        for i in range(3):
+            pool.spawn(self._apply,
+                       self.ucs_driver._create_vlan_post_data('v%d' % i,
+                                                              str(i)))
+        pool.waitall()
+        requests = self.ucsm.requests[1:]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(self._pair_keys(requests[0]),
+                         ['fabric/lan/net-v0', 'fabric/lan/net-v1',
+                          'fabric/lan/net-v2'])
+
+    def test_rejected_change_raises(self):
+        self.ucsm.handle = lambda data: ('<aaaLogin outCookie="c" />'
+                                         if 'aaaLogin' in data else
+                                         '<configConfMos errorCode="103" '
+                                         'errorDescr="no such vlan" />')
+        self.assertRaises(cexc.UCSMRequestFailed, self._apply,
+                          self.ucs_driver._delete_vlan_post_data('v1'))
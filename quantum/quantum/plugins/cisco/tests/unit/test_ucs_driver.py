@@ -79,7 +79,7 @@ ASSOC_PROFILE_OUTPUT = ('<configConfMos cookie="cookie_placeholder" '
                         '"fabric/lan/profiles/vnic-New Profile/cl-New '
                         'Profile Client"> <vmVnicProfCl dcName=".*" '
                         'descr="" dn="fabric/lan/profiles/vnic-'
-                        'New Profile/cl-New Profile Client"name="New '
+                        'New Profile/cl-New Profile Client" name="New '
                         'Profile Client" orgPath=".*" status="created" '
                         'swName="default$"> </vmVnicProfCl>'
                         '</pair> </inConfigs> </configConfMos>')
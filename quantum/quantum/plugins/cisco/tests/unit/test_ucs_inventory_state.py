@@ -0,0 +1,113 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import unittest
+
+from quantum.plugins.cisco.common import cisco_constants as const
+from quantum.plugins.cisco.ucs import cisco_ucs_inventory_state as state
+
+
+LOG = logging.getLogger('quantum.tests.test_ucs_inventory_state')
+
+VIF_ID = '12345678-1234-1234-1234-123456789012'
+
+
+def _blade_data(blade, reserved=(), intf_count=4):
+    intfs = {}
+    for i in range(intf_count):
+        dn = 'sys/chassis-1/blade-%s/adaptor-1/host-eth-%d' % (blade, i)
+        intfs[dn] = {const.BLADE_INTF_DN: dn,
+                     const.BLADE_INTF_RESERVATION: const.BLADE_INTF_UNRESERVED,
+                     const.TENANTID: None,
+                     const.PORTID: None,
+                     const.INSTANCE_ID: None,
+                     const.VIF_ID: None}
+        if i in reserved:
+            intfs[dn].update({const.BLADE_INTF_RESERVATION:
+                              const.BLADE_INTF_RESERVED,
+                              const.TENANTID: 't1',
+                              const.PORTID: 'port-%s-%d' % (blade, i)})
+    return {const.BLADE_INTF_DATA: intfs,
+            const.BLADE_UNRESERVED_INTF_COUNT: intf_count - len(reserved)}
+
+
+class TestInventoryState(unittest.TestCase):
+
+    def setUp(self):
+        self.state = state.InventoryState()
+        self.state.set_blade(('10.0.0.1', '1', '1'), _blade_data('1', (0, 1)))
+        self.state.set_blade(('10.0.0.1', '1', '2'), _blade_data('2', (0,)))
+        self.dn = 'sys/chassis-1/blade-2/adaptor-1/host-eth-0'
+
+    def test_find_by_port(self):
+        self.assertEqual(self.state.find_by_port('t1', 'port-2-0'), self.dn)
+        self.assertEqual(self.state.find_by_port('t2', 'port-2-0'), None)
+        self.assertEqual(self.state.get_blade_key(self.dn),
+                         ('10.0.0.1', '1', '2'))
+
+    def test_instance_and_vif_indexes_follow_updates(self):
+        self.assertEqual(len(self.state.find_by_instance('t1', None)), 3)
+        self.state.update_intf(self.dn, {const.INSTANCE_ID: 'vm1',
+                                         const.VIF_ID: VIF_ID + '-unplugged'})
+        self.assertEqual(self.state.find_by_instance('t1', 'vm1'), [self.dn])
+        self.assertEqual(len(self.state.find_by_instance('t1', None)), 2)
+        self.assertEqual(self.state.find_by_vif(VIF_ID), self.dn)
+        self.state.update_intf(self.dn, {const.INSTANCE_ID: None,
+                                         const.VIF_ID: None})
+        self.assertEqual(self.state.find_by_vif(VIF_ID), None)
+        self.assertEqual(self.state.find_by_instance('t1', 'vm1'), [])
+
+    def test_most_unreserved_blade_follows_reservations(self):
+        self.assertEqual(self.state.most_unreserved_blade(),
+                         ('10.0.0.1', '1', '2'))
+        for i in (1, 2):
+            self.state.update_intf(
+                'sys/chassis-1/blade-2/adaptor-1/host-eth-%d' % i,
+                {const.BLADE_INTF_RESERVATION: const.BLADE_INTF_RESERVED,
+                 const.TENANTID: 't1', const.PORTID: 'p%d' % i})
+        blade_key = self.state.most_unreserved_blade()
+        self.assertEqual(blade_key, ('10.0.0.1', '1', '1'))
+        self.assertEqual(self.state.get_blade(blade_key)
+                         [const.BLADE_UNRESERVED_INTF_COUNT], 2)
+        self.state.update_intf(self.dn, {const.BLADE_INTF_RESERVATION:
+                                         const.BLADE_INTF_UNRESERVED,
+                                         const.TENANTID: None,
+                                         const.PORTID: None})
+        self.assertEqual(self.state.find_by_port('t1', 'port-2-0'), None)
+        self.assertEqual(self.state.get_blade(('10.0.0.1', '1', '2'))
+                         [const.BLADE_UNRESERVED_INTF_COUNT], 2)
+
+    def test_set_blade_intf_data_reindexes(self):
+        blade_key = ('10.0.0.1', '1', '2')
+        blade_data = self.state.get_blade(blade_key)
+        fresh = _blade_data('2', (3,))[const.BLADE_INTF_DATA]
+        self.state.set_blade_intf_data(blade_key, fresh)
+        self.assertTrue(self.state.get_blade(blade_key) is blade_data)
+        self.assertEqual(self.state.find_by_port('t1', 'port-2-0'), None)
+        self.assertEqual(self.state.find_by_port('t1', 'port-2-3'),
+                         'sys/chassis-1/blade-2/adaptor-1/host-eth-3')
+
+    def test_heap_stays_bounded(self):
+        for i in range(500):
+            reservation = (i % 2 and const.BLADE_INTF_RESERVED or
+                           const.BLADE_INTF_UNRESERVED)
+            self.state.update_intf(
+                'sys/chassis-1/blade-1/adaptor-1/host-eth-3',
+                {const.BLADE_INTF_RESERVATION: reservation})
+        self.assertTrue(len(self.state._heap) <= 2 * len(self.state) + 65)
+        self.assertEqual(self.state.most_unreserved_blade(),
+                         ('10.0.0.1', '1', '2'))
@@ -0,0 +1,263 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+UCSM XML API client keeping one authenticated session and a pool of
+keep-alive HTTPS connections per UCSM
+"""
+
+import httplib
+import logging
+import socket
+import time
+from xml.etree import ElementTree as et
+
+from eventlet import semaphore
+
+from quantum.plugins.cisco.common import cisco_exceptions as cexc
+from quantum.plugins.cisco.common import cisco_netconf_batch as nc_batch
+from quantum.plugins.cisco.ucs import cisco_ucs_configuration as conf
+
+
+LOG = logging.getLogger(__name__)
+
+COOKIE_VALUE = "cookie_placeholder"
+HEADERS = {"Content-Type": "text/xml"}
+METHOD = "POST"
+URL = "/nuova"
+HTTPS_PORT = 443
+
+# errorCode returned by UCSM for an expired or unknown cookie
+ERROR_INVALID_COOKIE = "552"
+
+_CLIENT = None
+_BATCHER = None
+
+
+def merge_conf_mos(documents):
+    """
+    Merges configConfMos documents into one, which holds the pairs of all
+    of them in order. The attributes of the first document are kept; they
+    only affect what UCSM sends back.
+    """
+    merged = None
+    for document in documents:
+        tree = et.XML(document)
+        if merged is None:
+            merged = tree
+            in_configs = merged.find("inConfigs")
+        else:
+            in_configs.extend(tree.find("inConfigs").findall("pair"))
+    return et.tostring(merged)
+
+
+def check_response(ucsm_ip, response):
+    """Raises UCSMRequestFailed if UCSM rejected a request"""
+    tree = et.XML(response)
+    if tree.get("errorCode"):
+        raise cexc.UCSMRequestFailed(ucsm_ip=ucsm_ip,
+                                     error=tree.get("errorDescr"))
+    return tree
+
+
+class _UCSMSession(object):
+    """The cookie of a logged in UCSM user and when it must be refreshed"""
+
+    def __init__(self):
+        self.cookie = None
+        self.expires = 0
+        self.lock = semaphore.Semaphore()
+
+
+class UCSMClient(object):
+    """
+    Sends XML API requests to UCSMs. Each UCSM user logs in once; the
+    session cookie is renewed with aaaRefresh refresh_margin seconds before
+    its refresh period ends, and the user logs in again if UCSM no longer
+    accepts it. Up to max_connections keep-alive connections per UCSM are
+    reused between requests, and a request that fails because UCSM closed
+    an idle connection is resent on a new one.
+    """
+
+    def __init__(self, max_connections=4, refresh_margin=60, connect=None):
+        self.max_connections = max_connections
+        self.refresh_margin = refresh_margin
+        self._connect = connect or httplib.HTTPSConnection
+        self._sessions = {}
+        self._slots = {}
+        self._idle = {}
+        self._stats = {'requests': 0, 'logins': 0, 'refreshes': 0,
+                       'opens': 0, 'reconnects': 0}
+
+    def post(self, ucsm_ip, ucsm_username, ucsm_password, data):
+        """
+        Sends a request to UCSM with the session cookie in place of
+        COOKIE_VALUE and returns the response document
+        """
+        key = (ucsm_ip, ucsm_username)
+        session = self._sessions.setdefault(key, _UCSMSession())
+        cookie = self._get_cookie(key, session, ucsm_password)
+        response = self._request(ucsm_ip, data.replace(COOKIE_VALUE, cookie))
+        if et.XML(response).get("errorCode") == ERROR_INVALID_COOKIE:
+            LOG.debug("UCSM %s rejected the session cookie, logging in "
+                      "again" % ucsm_ip)
+            with session.lock:
+                if session.cookie == cookie:
+                    self._login(key, session, ucsm_password)
+                cookie = session.cookie
+            response = self._request(ucsm_ip,
+                                     data.replace(COOKIE_VALUE, cookie))
+        return response
+
+    def get_stats(self):
+        """Returns a snapshot of the client counters"""
+        stats = dict(self._stats)
+        stats['sessions'] = len([s for s in self._sessions.values()
+                                 if s.cookie])
+        stats['idle'] = sum(len(c) for c in self._idle.values())
+        return stats
+
+    def close_all(self):
+        """Logs out of every UCSM and closes the idle connections"""
+        for (ucsm_ip, ucsm_username), session in self._sessions.items():
+            if not session.cookie:
+                continue
+            try:
+                self._request(ucsm_ip, '<aaaLogout inCookie="%s" />' %
+                              session.cookie)
+            except Exception:
+                LOG.debug("Ignoring error while logging out of UCSM %s" %
+                          ucsm_ip, exc_info=True)
+        self._sessions = {}
+        for connections in self._idle.values():
+            for conn in connections:
+                conn.close()
+        self._idle = {}
+
+    def _get_cookie(self, key, session, ucsm_password):
+        with session.lock:
+            if not session.cookie:
+                self._login(key, session, ucsm_password)
+            elif time.time() >= session.expires - self.refresh_margin:
+                self._refresh(key, session, ucsm_password)
+            return session.cookie
+
+    def _login(self, key, session, ucsm_password):
+        ucsm_ip, ucsm_username = key
+        LOG.debug("Logging in to UCSM %s as %s" % key)
+        self._stats['logins'] += 1
+        data = ('<aaaLogin inName="%s" inPassword="%s" />' %
+                (ucsm_username, ucsm_password))
+        self._set_cookie(ucsm_ip, session, self._request(ucsm_ip, data))
+
+    def _refresh(self, key, session, ucsm_password):
+        ucsm_ip, ucsm_username = key
+        LOG.debug("Refreshing the session cookie for UCSM %s" % ucsm_ip)
+        self._stats['refreshes'] += 1
+        data = ('<aaaRefresh inName="%s" inPassword="%s" inCookie="%s" />' %
+                (ucsm_username, ucsm_password, session.cookie))
+        try:
+            self._set_cookie(ucsm_ip, session, self._request(ucsm_ip, data))
+        except cexc.UCSMLoginFailed:
+            self._login(key, session, ucsm_password)
+
+    def _set_cookie(self, ucsm_ip, session, response):
+        tree = et.XML(response)
+        if tree.get("errorCode") or not tree.get("outCookie"):
+            session.cookie = None
+            raise cexc.UCSMLoginFailed(ucsm_ip=ucsm_ip,
+                                       error=tree.get("errorDescr"))
+        session.cookie = tree.get("outCookie")
+        session.expires = time.time() + int(tree.get("outRefreshPeriod",
+                                                     600))
+
+    def _request(self, ucsm_ip, data):
+        """Posts a document on a pooled connection and returns the reply"""
+        self._stats['requests'] += 1
+        slots = self._slots.setdefault(
+            ucsm_ip, semaphore.Semaphore(self.max_connections))
+        with slots:
+            idle = self._idle.setdefault(ucsm_ip, [])
+            if idle:
+                conn = idle.pop()
+                try:
+                    response = self._roundtrip(conn, data)
+                except (socket.error, httplib.HTTPException):
+                    LOG.debug("Connection to UCSM %s was closed, "
+                              "reconnecting" % ucsm_ip)
+                    conn.close()
+                    self._stats['reconnects'] += 1
+                    conn = self._open(ucsm_ip)
+                    response = self._roundtrip(conn, data)
+            else:
+                conn = self._open(ucsm_ip)
+                response = self._roundtrip(conn, data)
+            idle.append(conn)
+        return response
+
+    def _open(self, ucsm_ip):
+        self._stats['opens'] += 1
+        return self._connect(ucsm_ip)
+
+    def _roundtrip(self, conn, data):
+        conn.request(METHOD, URL, data, HEADERS)
+        response = conn.getresponse()
+        return response.read()
+
+
+class ConfMosTransaction(nc_batch.ConfigTransaction):
+    """configConfMos documents for a single UCSM, sent as one request"""
+
+    def add_document(self, document):
+        self.add('conf_mos', document)
+
+    def to_xml(self):
+        return merge_conf_mos(op[1] for op in self.operations)
+
+
+class UCSMConfigBatcher(nc_batch.ConfigBatcher):
+    """
+    Coalesces the configConfMos transactions submitted for the same UCSM
+    within window seconds into a single request
+    """
+
+    def _send(self, key, password, txn):
+        self._stats['rpcs'] += 1
+        ucsm_ip, port, ucsm_username = key
+        response = self.pool.post(ucsm_ip, ucsm_username, password,
+                                  txn.to_xml())
+        check_response(ucsm_ip, response)
+
+
+def get_client():
+    """Returns the UCSM client shared by the UCS drivers"""
+    global _CLIENT
+    if not _CLIENT:
+        _CLIENT = UCSMClient(
+            max_connections=int(conf.UCSM_MAX_CONNECTIONS),
+            refresh_margin=int(conf.UCSM_REFRESH_MARGIN))
+    return _CLIENT
+
+
+def get_batcher():
+    """Returns the configuration batcher shared by the UCS drivers"""
+    global _BATCHER
+    if not _BATCHER:
+        _BATCHER = UCSMConfigBatcher(get_client(),
+                                     window=float(conf.UCSM_BATCH_WINDOW),
+                                     timeout=float(conf.UCSM_BATCH_TIMEOUT))
+    return _BATCHER
@@ -30,6 +30,10 @@ DEFAULT_VLAN_NAME = SECTION['default_vlan_name']
 DEFAULT_VLAN_ID = SECTION['default_vlan_id']
 MAX_UCSM_PORT_PROFILES = SECTION['max_ucsm_port_profiles']
 PROFILE_NAME_PREFIX = SECTION['profile_name_prefix']
+UCSM_MAX_CONNECTIONS = SECTION.get('max_connections', 4)
+UCSM_REFRESH_MARGIN = SECTION.get('refresh_margin', 60)
+UCSM_BATCH_WINDOW = SECTION.get('batch_window', 0.05)
+UCSM_BATCH_TIMEOUT = SECTION.get('batch_timeout', 120)
 
 SECTION = CP['DRIVER']
 UCSM_DRIVER = SECTION['name']
@@ -24,15 +24,13 @@ The _inventory data strcuture contains a nested disctioary:
     }
 """
 """
-_inventory_state data structure is organized as below:
-{ucsm_ip:
-    {chassis_id:
-        {blade_id:
-            {'blade-data':
-                {blade-dn-1: {blade-intf-data},
-                 blade-dn-2: {blade-intf-data}
-                }
-            }
+_inventory_state is an InventoryState holding the 'blade-data' of every
+blade, keyed by (ucsm_ip, chassis_id, blade_id), and indexes of the
+reserved blade interfaces by port, tenant and instance, and VIF-ID:
+{(ucsm_ip, chassis_id, blade_id):
+    {'blade-data':
+        {blade-dn-1: {blade-intf-data},
+         blade-dn-2: {blade-intf-data}
         }
     }
 }
@@ -75,6 +73,7 @@ from quantum.plugins.cisco.l2device_inventory_base import (
 from quantum.plugins.cisco.ucs import (
     cisco_ucs_inventory_configuration as conf,
 )
+from quantum.plugins.cisco.ucs import cisco_ucs_inventory_state as state
 from quantum.plugins.cisco.ucs import cisco_ucs_network_driver
 
 
@@ -89,7 +88,7 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
 
     _inventory = {}
     _host_names = {}
-    _inventory_state = {}
+    _inventory_state = state.InventoryState()
 
     def __init__(self):
         self._client = cisco_ucs_network_driver.CiscoUCSMDriver()
@@ -125,24 +124,21 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
     def _build_inventory_state(self):
         """Populate the state of all the blades"""
         for ucsm_ip in self._inventory.keys():
-            self._inventory_state[ucsm_ip] = {ucsm_ip: {}}
             ucsm_username = cred.Store.getUsername(ucsm_ip)
             ucsm_password = cred.Store.getPassword(ucsm_ip)
-            chasses_state = {}
-            self._inventory_state[ucsm_ip] = chasses_state
             ucsm = self._inventory[ucsm_ip]
             for chassis_id in ucsm.keys():
-                blades_dict = {}
-                chasses_state[chassis_id] = blades_dict
                 for blade_id in ucsm[chassis_id]:
                     blade_data = self._get_initial_blade_state(chassis_id,
                                                                blade_id,
                                                                ucsm_ip,
                                                                ucsm_username,
                                                                ucsm_password)
-                    blades_dict[blade_id] = blade_data
+                    self._inventory_state.set_blade(
+                        (ucsm_ip, chassis_id, blade_id), blade_data)
 
-        LOG.debug("UCS Inventory state is: %s\n" % self._inventory_state)
+        LOG.debug("UCS Inventory state has %s blades\n" %
+                  len(self._inventory_state))
         return True
 
     def _get_host_name(self, ucsm_ip, chassis_id, blade_id):
@@ -264,28 +260,17 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
         Return the hostname of the blade with a reserved instance
         for this tenant
         """
-        for ucsm_ip in self._inventory_state.keys():
-            ucsm = self._inventory_state[ucsm_ip]
-            for chassis_id in ucsm.keys():
-                for blade_id in ucsm[chassis_id]:
-                    blade_data = ucsm[chassis_id][blade_id]
-                    blade_intf_data = blade_data[const.BLADE_INTF_DATA]
-                    for blade_intf in blade_intf_data.keys():
-                        tmp = deepcopy(blade_intf_data[blade_intf])
-                        intf_data = blade_intf_data[blade_intf]
-                        if (intf_data[const.BLADE_INTF_RESERVATION] ==
-                                const.BLADE_INTF_RESERVED and
-                                intf_data[const.TENANTID] == tenant_id and
-                                intf_data[const.INSTANCE_ID] is None):
-                            intf_data[const.INSTANCE_ID] = instance_id
-                            host_name = self._get_host_name(ucsm_ip,
-                                                            chassis_id,
-                                                            blade_id)
-                            port_binding = udb.get_portbinding_dn(blade_intf)
-                            port_id = port_binding[const.PORTID]
-                            udb.update_portbinding(port_id,
-                                                   instance_id=instance_id)
-                            return host_name
+        for blade_intf in self._inventory_state.find_by_instance(tenant_id,
+                                                                 None):
+            self._inventory_state.update_intf(
+                blade_intf, {const.INSTANCE_ID: instance_id})
+            ucsm_ip, chassis_id, blade_id = (
+                self._inventory_state.get_blade_key(blade_intf))
+            host_name = self._get_host_name(ucsm_ip, chassis_id, blade_id)
+            port_binding = udb.get_portbinding_dn(blade_intf)
+            port_id = port_binding[const.PORTID]
+            udb.update_portbinding(port_id, instance_id=instance_id)
+            return host_name
         LOG.warn("Could not find a reserved dynamic nic for tenant: %s" %
                  tenant_id)
         return None
@@ -294,35 +279,23 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
         """
         Return the device name for a reserved interface
         """
-        found_blade_intf_data = None
-        for ucsm_ip in self._inventory_state.keys():
-            ucsm = self._inventory_state[ucsm_ip]
-            for chassis_id in ucsm.keys():
-                for blade_id in ucsm[chassis_id]:
-                    blade_data = ucsm[chassis_id][blade_id]
-                    blade_intf_data = blade_data[const.BLADE_INTF_DATA]
-                    for blade_intf in blade_intf_data.keys():
-                        intf_data = blade_intf_data[blade_intf]
-                        if (intf_data[const.BLADE_INTF_RESERVATION] ==
-                                const.BLADE_INTF_RESERVED and
-                                intf_data[const.TENANTID] == tenant_id and
-                                intf_data[const.INSTANCE_ID] == instance_id):
-                            found_blade_intf_data = blade_intf_data
-                            LOG.debug(("Found blade %s associated with this"
-                                       " instance: %s") % (blade_id,
-                                                           instance_id))
-                            break
-
-        if found_blade_intf_data:
-            blade_intf_data = found_blade_intf_data
-            for blade_intf in blade_intf_data.keys():
+        instance_intfs = self._inventory_state.find_by_instance(tenant_id,
+                                                                instance_id)
+        if instance_intfs:
+            blade_key = self._inventory_state.get_blade_key(instance_intfs[0])
+            LOG.debug(("Found blade %s associated with this instance: %s") %
+                      (blade_key[2], instance_id))
+            blade_data = self._inventory_state.get_blade(blade_key)
+            blade_intf_data = blade_data[const.BLADE_INTF_DATA]
+            for blade_intf in sorted(blade_intf_data.keys()):
                 intf_data = blade_intf_data[blade_intf]
                 if (intf_data[const.BLADE_INTF_RESERVATION] ==
                         const.BLADE_INTF_RESERVED and
                         intf_data[const.TENANTID] == tenant_id and
                         (not intf_data[const.VIF_ID])):
-                    intf_data[const.VIF_ID] = vif_id
-                    intf_data[const.INSTANCE_ID] = instance_id
+                    self._inventory_state.update_intf(
+                        blade_intf, {const.VIF_ID: vif_id,
+                                     const.INSTANCE_ID: instance_id})
                     port_binding = udb.get_portbinding_dn(blade_intf)
                     port_id = port_binding[const.PORTID]
                     udb.update_portbinding(port_id, instance_id=instance_id,
@@ -351,36 +324,28 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
         Disassociate a VIF-ID from a port, this happens when a
         VM is destroyed
         """
-        for ucsm_ip in self._inventory_state.keys():
-            ucsm = self._inventory_state[ucsm_ip]
-            for chassis_id in ucsm.keys():
-                for blade_id in ucsm[chassis_id]:
-                    blade_data = ucsm[chassis_id][blade_id]
-                    blade_intf_data = blade_data[const.BLADE_INTF_DATA]
-                    for blade_intf in blade_intf_data.keys():
-                        intf_data = blade_intf_data[blade_intf]
-                        if (intf_data[const.BLADE_INTF_RESERVATION] ==
-                                const.BLADE_INTF_RESERVED and
-                                intf_data[const.TENANTID] == tenant_id and
-                                blade_intf_data[blade_intf][const.INSTANCE_ID]
-                                == instance_id and
-                                intf_data[const.VIF_ID][:const.UUID_LENGTH] ==
-                                vif_id):
-                            intf_data[const.VIF_ID] = None
-                            intf_data[const.INSTANCE_ID] = None
-                            port_binding = udb.get_portbinding_dn(blade_intf)
-                            port_id = port_binding[const.PORTID]
-                            udb.update_portbinding(port_id, instance_id=None,
-                                                   vif_id=None)
-                            db.port_unset_attachment_by_id(port_id)
-                            LOG.debug(
-                                ("Disassociated VIF-ID: %s "
-                                 "from port: %s"
-                                 "in UCS inventory state for blade: %s") %
-                                (vif_id, port_id, intf_data))
-                            device_params = {const.DEVICE_IP: [ucsm_ip],
-                                             const.PORTID: port_id}
-                            return device_params
+        blade_intf = self._inventory_state.find_by_vif(vif_id)
+        if blade_intf:
+            intf_data = self._inventory_state.get_intf(blade_intf)
+            if (intf_data[const.TENANTID] == tenant_id and
+                    intf_data[const.INSTANCE_ID] == instance_id):
+                self._inventory_state.update_intf(
+                    blade_intf, {const.VIF_ID: None,
+                                 const.INSTANCE_ID: None})
+                port_binding = udb.get_portbinding_dn(blade_intf)
+                port_id = port_binding[const.PORTID]
+                udb.update_portbinding(port_id, instance_id=None,
+                                       vif_id=None)
+                db.port_unset_attachment_by_id(port_id)
+                LOG.debug(
+                    ("Disassociated VIF-ID: %s "
+                     "from port: %s"
+                     "in UCS inventory state for blade: %s") %
+                    (vif_id, port_id, intf_data))
+                ucsm_ip = self._inventory_state.get_blade_key(blade_intf)[0]
+                device_params = {const.DEVICE_IP: [ucsm_ip],
+                                 const.PORTID: port_id}
+                return device_params
         LOG.warn(("Disassociating VIF-ID in UCS inventory failed. "
                   "Could not find a reserved dynamic nic for tenant: %s") %
                  tenant_id)
@@ -391,28 +356,15 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
         Lookup a reserved blade interface based on tenant_id and port_id
         and return the blade interface info
         """
-        for ucsm_ip in self._inventory_state.keys():
-            ucsm = self._inventory_state[ucsm_ip]
-            for chassis_id in ucsm.keys():
-                for blade_id in ucsm[chassis_id]:
-                    blade_data = ucsm[chassis_id][blade_id]
-                    blade_intf_data = blade_data[const.BLADE_INTF_DATA]
-                    for blade_intf in blade_intf_data.keys():
-                        if ((not blade_intf_data[blade_intf][const.PORTID] or
-                             not blade_intf_data[blade_intf][const.TENANTID])):
-                            continue
-                        intf_data = blade_intf_data[blade_intf]
-                        if (intf_data[const.BLADE_INTF_RESERVATION] ==
-                                const.BLADE_INTF_RESERVED and
-                                intf_data[const.TENANTID] == tenant_id and
-                                intf_data[const.PORTID] == port_id):
-                            interface_dn = intf_data[const.BLADE_INTF_DN]
-                            blade_intf_info = {const.UCSM_IP: ucsm_ip,
-                                               const.CHASSIS_ID: chassis_id,
-                                               const.BLADE_ID: blade_id,
-                                               const.BLADE_INTF_DN:
-                                               interface_dn}
-                            return blade_intf_info
+        blade_intf = self._inventory_state.find_by_port(tenant_id, port_id)
+        if blade_intf:
+            ucsm_ip, chassis_id, blade_id = (
+                self._inventory_state.get_blade_key(blade_intf))
+            blade_intf_info = {const.UCSM_IP: ucsm_ip,
+                               const.CHASSIS_ID: chassis_id,
+                               const.BLADE_ID: blade_id,
+                               const.BLADE_INTF_DN: blade_intf}
+            return blade_intf_info
         LOG.warn("Could not find a reserved nic for tenant: %s port: %s" %
                  (tenant_id, port_id))
         return None
@@ -420,36 +372,24 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
     def _get_least_reserved_blade(self, intf_count=1):
         """Return the blade with least number of dynamic nics reserved"""
         unreserved_interface_count = 0
-        least_reserved_blade_ucsm = None
-        least_reserved_blade_chassis = None
-        least_reserved_blade_id = None
-        least_reserved_blade_data = None
-
-        for ucsm_ip in self._inventory_state.keys():
-            ucsm = self._inventory_state[ucsm_ip]
-            for chassis_id in ucsm.keys():
-                for blade_id in ucsm[chassis_id]:
-                    blade_data = ucsm[chassis_id][blade_id]
-                    if ((blade_data[const.BLADE_UNRESERVED_INTF_COUNT] >
-                         unreserved_interface_count)):
-                        unreserved_interface_count = (
-                            blade_data[const.BLADE_UNRESERVED_INTF_COUNT])
-                        least_reserved_blade_ucsm = ucsm_ip
-                        least_reserved_blade_chassis = chassis_id
-                        least_reserved_blade_id = blade_id
-                        least_reserved_blade_data = blade_data
-
-        if unreserved_interface_count < intf_count:
+        blade_key = self._inventory_state.most_unreserved_blade()
+        if blade_key:
+            blade_data = self._inventory_state.get_blade(blade_key)
+            unreserved_interface_count = (
+                blade_data[const.BLADE_UNRESERVED_INTF_COUNT])
+
+        if ((not unreserved_interface_count or
+             unreserved_interface_count < intf_count)):
             LOG.warn(("Not enough dynamic nics available on a single host."
                       " Requested: %s, Maximum available: %s") %
                      (intf_count, unreserved_interface_count))
             return False
 
         least_reserved_blade_dict = {
-            const.LEAST_RSVD_BLADE_UCSM: least_reserved_blade_ucsm,
-            const.LEAST_RSVD_BLADE_CHASSIS: least_reserved_blade_chassis,
-            const.LEAST_RSVD_BLADE_ID: least_reserved_blade_id,
-            const.LEAST_RSVD_BLADE_DATA: least_reserved_blade_data,
+            const.LEAST_RSVD_BLADE_UCSM: blade_key[0],
+            const.LEAST_RSVD_BLADE_CHASSIS: blade_key[1],
+            const.LEAST_RSVD_BLADE_ID: blade_key[2],
+            const.LEAST_RSVD_BLADE_DATA: blade_data,
         }
         LOG.debug("Found dynamic nic %s available for reservation",
                   least_reserved_blade_dict)
@@ -472,8 +412,9 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
         blade_data = self._get_blade_state(chassis_id, blade_id, ucsm_ip,
                                            ucsm_username, ucsm_password)
         blade_intf_data = blade_data[const.BLADE_INTF_DATA]
-        chassis_data = self._inventory_state[ucsm_ip][chassis_id]
-        old_blade_intf_data = chassis_data[blade_id][const.BLADE_INTF_DATA]
+        blade_key = (ucsm_ip, chassis_id, blade_id)
+        old_blade_data = self._inventory_state.get_blade(blade_key)
+        old_blade_intf_data = old_blade_data[const.BLADE_INTF_DATA]
 
         """
         We will now copy the older non-UCSM-specific blade
@@ -494,8 +435,6 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
             blade_intf_data[blade_intf][const.VIF_ID] = (
                 old_intf_data[const.VIF_ID])
 
-        blade_data[const.BLADE_UNRESERVED_INTF_COUNT] = (
-            chassis_data[blade_id][const.BLADE_UNRESERVED_INTF_COUNT])
         """
         Now we will reserve an interface if its available
         """
@@ -503,17 +442,18 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
             intf_data = blade_intf_data[blade_intf]
             if (intf_data[const.BLADE_INTF_RESERVATION] ==
                     const.BLADE_INTF_UNRESERVED):
-                intf_data[const.BLADE_INTF_RESERVATION] = (
-                    const.BLADE_INTF_RESERVED)
-                intf_data[const.TENANTID] = tenant_id
-                intf_data[const.PORTID] = port_id
-                intf_data[const.INSTANCE_ID] = None
-                dev_eth_name = intf_data[const.BLADE_INTF_RHEL_DEVICE_NAME]
                 """
                 We are replacing the older blade interface state with new
                 """
-                chassis_data[blade_id][const.BLADE_INTF_DATA] = blade_intf_data
-                chassis_data[blade_id][const.BLADE_UNRESERVED_INTF_COUNT] -= 1
+                self._inventory_state.set_blade_intf_data(blade_key,
+                                                          blade_intf_data)
+                self._inventory_state.update_intf(
+                    blade_intf, {const.BLADE_INTF_RESERVATION:
+                                 const.BLADE_INTF_RESERVED,
+                                 const.TENANTID: tenant_id,
+                                 const.PORTID: port_id,
+                                 const.INSTANCE_ID: None})
+                dev_eth_name = intf_data[const.BLADE_INTF_RHEL_DEVICE_NAME]
                 host_name = self._get_host_name(ucsm_ip, chassis_id, blade_id)
                 reserved_nic_dict = {
                     const.RESERVED_NIC_HOSTNAME: host_name,
@@ -536,16 +476,14 @@ class UCSInventory(L2NetworkDeviceInventoryBase):
         """Unreserve a previously reserved interface on a blade"""
         ucsm_username = cred.Store.getUsername(ucsm_ip)
         ucsm_password = cred.Store.getPassword(ucsm_ip)
-        blade_data = self._inventory_state[ucsm_ip][chassis_id][blade_id]
-
-        blade_data[const.BLADE_UNRESERVED_INTF_COUNT] += 1
-        blade_intf = blade_data[const.BLADE_INTF_DATA][interface_dn]
-        blade_intf[const.BLADE_INTF_RESERVATION] = const.BLADE_INTF_UNRESERVED
-        blade_intf[const.TENANTID] = None
-        blade_intf[const.PORTID] = None
-        blade_intf[const.PROFILE_ID] = None
-        blade_intf[const.INSTANCE_ID] = None
-        blade_intf[const.VIF_ID] = None
+        self._inventory_state.update_intf(
+            interface_dn, {const.BLADE_INTF_RESERVATION:
+                           const.BLADE_INTF_UNRESERVED,
+                           const.TENANTID: None,
+                           const.PORTID: None,
+                           const.PROFILE_ID: None,
+                           const.INSTANCE_ID: None,
+                           const.VIF_ID: None})
         LOG.debug("Unreserved blade interface %s\n" % interface_dn)
 
     def add_blade(self, ucsm_ip, chassis_id, blade_id):
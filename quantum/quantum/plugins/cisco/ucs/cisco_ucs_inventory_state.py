@@ -0,0 +1,206 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2012 Cisco Systems, Inc.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""
+Indexed state of the blades and dynamic nics in the UCS inventory
+"""
+
+import heapq
+import logging
+
+from quantum.plugins.cisco.common import cisco_constants as const
+
+
+LOG = logging.getLogger(__name__)
+
+
+class InventoryState(object):
+    """
+    Holds the blade data dictionaries of the UCS inventory, keyed by
+    (ucsm_ip, chassis_id, blade_id), together with indexes of the reserved
+    dynamic nics by port, by tenant and instance and by VIF-ID, and a heap
+    of the blades ordered by their number of unreserved nics.
+
+    Reserved nics that are not yet used by an instance are indexed under
+    the instance None of their tenant. The interface data of an indexed
+    nic must only be changed through update_intf, so that the indexes and
+    the unreserved counts stay in step with it.
+    """
+
+    def __init__(self):
+        self._blades = {}
+        self._intf_blades = {}
+        self._by_port = {}
+        self._by_instance = {}
+        self._by_vif = {}
+        self._heap = []
+        self._heap_seqs = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._blades)
+
+    def __contains__(self, blade_key):
+        return blade_key in self._blades
+
+    def blades(self):
+        """Returns the keys of all the blades"""
+        return self._blades.keys()
+
+    def get_blade(self, blade_key):
+        """Returns the blade data dictionary of a blade"""
+        return self._blades[blade_key]
+
+    def get_blade_key(self, intf_dn):
+        """Returns the key of the blade that a dynamic nic belongs to"""
+        return self._intf_blades[intf_dn]
+
+    def get_intf(self, intf_dn):
+        """Returns the interface data of a dynamic nic"""
+        blade_data = self._blades[self._intf_blades[intf_dn]]
+        return blade_data[const.BLADE_INTF_DATA][intf_dn]
+
+    def set_blade(self, blade_key, blade_data):
+        """Adds a blade, or replaces its data, and indexes its nics"""
+        if blade_key in self._blades:
+            self._unindex_blade(blade_key)
+        self._blades[blade_key] = blade_data
+        self._index_blade(blade_key)
+
+    def set_blade_intf_data(self, blade_key, blade_intf_data):
+        """
+        Replaces the interface data of a blade, e.g. with fresh state from
+        UCSM, in the blade data dictionary that callers may hold on to
+        """
+        self._unindex_blade(blade_key)
+        self._blades[blade_key][const.BLADE_INTF_DATA] = blade_intf_data
+        self._index_blade(blade_key)
+
+    def update_intf(self, intf_dn, changes):
+        """
+        Applies changes to the interface data of a dynamic nic, adjusting
+        the unreserved count of its blade if its reservation changes
+        """
+        intf_data = self.get_intf(intf_dn)
+        self._unindex(intf_dn)
+        reservation = intf_data.get(const.BLADE_INTF_RESERVATION)
+        intf_data.update(changes)
+        self._index(intf_dn)
+        new_reservation = intf_data.get(const.BLADE_INTF_RESERVATION)
+        if new_reservation == reservation:
+            return intf_data
+        blade_key = self._intf_blades[intf_dn]
+        blade_data = self._blades[blade_key]
+        if new_reservation == const.BLADE_INTF_UNRESERVED:
+            blade_data[const.BLADE_UNRESERVED_INTF_COUNT] += 1
+        elif reservation == const.BLADE_INTF_UNRESERVED:
+            blade_data[const.BLADE_UNRESERVED_INTF_COUNT] -= 1
+        self._push(blade_key)
+        return intf_data
+
+    def find_by_port(self, tenant_id, port_id):
+        """Returns the dn of the nic reserved for a port, or None"""
+        intf_dn = self._by_port.get(port_id)
+        if intf_dn and self.get_intf(intf_dn)[const.TENANTID] == tenant_id:
+            return intf_dn
+        return None
+
+    def find_by_instance(self, tenant_id, instance_id):
+        """
+        Returns the dns of the nics reserved for a tenant and used by an
+        instance, or of those not used by any instance yet if instance_id
+        is None
+        """
+        return sorted(self._by_instance.get((tenant_id, instance_id), ()))
+
+    def find_by_vif(self, vif_id):
+        """Returns the dn of the nic a VIF is attached to, or None"""
+        return self._by_vif.get(vif_id[:const.UUID_LENGTH])
+
+    def most_unreserved_blade(self):
+        """
+        Returns the key of the blade with the most unreserved nics, or
+        None if there are no blades
+        """
+        heap = self._heap
+        while heap:
+            count, seq, blade_key = heap[0]
+            if seq == self._heap_seqs.get(blade_key):
+                return blade_key
+            heapq.heappop(heap)
+        return None
+
+    def _push(self, blade_key):
+        """
+        Pushes the current unreserved count of a blade on the heap. Older
+        entries of the blade are skipped, and dropped, when they surface.
+        """
+        blade_data = self._blades[blade_key]
+        self._seq += 1
+        self._heap_seqs[blade_key] = self._seq
+        heapq.heappush(self._heap,
+                       (-blade_data[const.BLADE_UNRESERVED_INTF_COUNT],
+                        self._seq, blade_key))
+        if len(self._heap) > 2 * len(self._blades) + 64:
+            self._heap = [entry for entry in self._heap
+                          if entry[1] == self._heap_seqs.get(entry[2])]
+            heapq.heapify(self._heap)
+
+    def _index(self, intf_dn):
+        intf_data = self.get_intf(intf_dn)
+        if ((intf_data.get(const.BLADE_INTF_RESERVATION) !=
+             const.BLADE_INTF_RESERVED)):
+            return
+        tenant_id = intf_data.get(const.TENANTID)
+        if not tenant_id:
+            return
+        if intf_data.get(const.PORTID):
+            self._by_port[intf_data[const.PORTID]] = intf_dn
+        key = (tenant_id, intf_data.get(const.INSTANCE_ID))
+        self._by_instance.setdefault(key, set()).add(intf_dn)
+        if intf_data.get(const.VIF_ID):
+            vif_id = intf_data[const.VIF_ID][:const.UUID_LENGTH]
+            self._by_vif[vif_id] = intf_dn
+
+    def _unindex(self, intf_dn):
+        intf_data = self.get_intf(intf_dn)
+        port_id = intf_data.get(const.PORTID)
+        if port_id and self._by_port.get(port_id) == intf_dn:
+            del self._by_port[port_id]
+        key = (intf_data.get(const.TENANTID),
+               intf_data.get(const.INSTANCE_ID))
+        dns = self._by_instance.get(key)
+        if dns is not None:
+            dns.discard(intf_dn)
+            if not dns:
+                del self._by_instance[key]
+        if intf_data.get(const.VIF_ID):
+            vif_id = intf_data[const.VIF_ID][:const.UUID_LENGTH]
+            if self._by_vif.get(vif_id) == intf_dn:
+                del self._by_vif[vif_id]
+
+    def _index_blade(self, blade_key):
+        for intf_dn in self._blades[blade_key][const.BLADE_INTF_DATA]:
+            self._intf_blades[intf_dn] = blade_key
+            self._index(intf_dn)
+        self._push(blade_key)
+
+    def _unindex_blade(self, blade_key):
+        for intf_dn in self._blades[blade_key][const.BLADE_INTF_DATA]:
+            if self._intf_blades.get(intf_dn) == blade_key:
+                self._unindex(intf_dn)
+                del self._intf_blades[intf_dn]
@@ -21,17 +21,17 @@
 Implements a UCSM XML API Client
 """
 
-import httplib
 import logging
 from xml.etree import ElementTree as et
 
 from quantum.plugins.cisco.common import cisco_constants as const
+from quantum.plugins.cisco.ucs import cisco_ucs_client as ucs_client
 
 
 LOG = logging.getLogger(__name__)
 
 
-COOKIE_VALUE = "cookie_placeholder"
+COOKIE_VALUE = ucs_client.COOKIE_VALUE
 PROFILE_NAME = "profilename_placeholder"
 PROFILE_CLIENT = "profileclient_placeholder"
 VLAN_NAME = "vlanname_placeholder"
@@ -44,13 +44,10 @@ DYNAMIC_NIC_PREFIX = "eth"
 
 # The following are standard strings, messages used to communicate with UCSM,
 #only place holder values change for each message
-HEADERS = {"Content-Type": "text/xml"}
-METHOD = "POST"
-URL = "/nuova"
 
 CREATE_VLAN = ('<configConfMos cookie="' + COOKIE_VALUE +
                '" inHierarchical="true"> <inConfigs>'
-               '<pair key="fabric/lan/net-"' + VLAN_NAME +
+               '<pair key="fabric/lan/net-' + VLAN_NAME +
                '"> <fabricVlan defaultNet="no" '
                'dn="fabric/lan/net-' + VLAN_NAME +
                '" id="' + VLAN_ID + '" name="' +
@@ -62,54 +59,54 @@ CREATE_PROFILE = ('<configConfMos cookie="' + COOKIE_VALUE +
                   '<pair key="fabric/lan/profiles/vnic-' + PROFILE_NAME +
                   '"> <vnicProfile descr="Profile created by '
                   'Cisco OpenStack Quantum Plugin" '
-                  'dn="fabric/lan/profiles/vnic' + PROFILE_NAME +
+                  'dn="fabric/lan/profiles/vnic-' + PROFILE_NAME +
                   '" maxPorts="64" name="' + PROFILE_NAME +
                   '" nwCtrlPolicyName="" pinToGroupName="" '
                   'qosPolicyName="" status="created"> '
                   '<vnicEtherIf defaultNet="yes" name="' + VLAN_NAME +
-                  '" rn="if' + VLAN_NAME + '" > </vnicEtherIf> '
+                  '" rn="if-' + VLAN_NAME + '" > </vnicEtherIf> '
                   '</vnicProfile> </pair> </inConfigs> </configConfMos>')
 
 ASSOCIATE_PROFILE = ('<configConfMos cookie="' + COOKIE_VALUE +
                      '" inHierarchical="true"> <inConfigs> <pair '
-                     'key="fabric/lan/profiles/vnic' + PROFILE_NAME +
-                     '/cl' + PROFILE_CLIENT + '"> <vmVnicProfCl dcName=".*" '
-                     'descr="" dn="fabric/lan/profiles/vnic' +
-                     PROFILE_NAME + '/cl' + PROFILE_CLIENT +
-                     '"name="' + PROFILE_CLIENT + '" orgPath=".*" '
+                     'key="fabric/lan/profiles/vnic-' + PROFILE_NAME +
+                     '/cl-' + PROFILE_CLIENT + '"> <vmVnicProfCl dcName=".*" '
+                     'descr="" dn="fabric/lan/profiles/vnic-' +
+                     PROFILE_NAME + '/cl-' + PROFILE_CLIENT +
+                     '" name="' + PROFILE_CLIENT + '" orgPath=".*" '
                      'status="created" swName="default$"> </vmVnicProfCl>'
                      '</pair> </inConfigs> </configConfMos>')
 
 CHANGE_VLAN_IN_PROFILE = ('<configConfMos cookie="' + COOKIE_VALUE +
-                          '" inHierarchical="true"> <inConfigs'
-                          '<pair key="fabric/lan/profiles/vnic' +
-                          PROFILE_NAME + '"> <vnicProfile descr="Profile'
-                          'created by Cisco OpenStack Quantum Plugin"'
-                          'dn="fabric/lan/profiles/vnic' +
+                          '" inHierarchical="true"> <inConfigs>'
+                          '<pair key="fabric/lan/profiles/vnic-' +
+                          PROFILE_NAME + '"> <vnicProfile descr="Profile '
+                          'created by Cisco OpenStack Quantum Plugin" '
+                          'dn="fabric/lan/profiles/vnic-' +
                           PROFILE_NAME + '" maxPorts="64" name="' +
-                          PROFILE_NAME + '" nwCtrlPolicyName=""'
-                          'pinToGroupName="" qosPolicyName=""'
-                          'status="created,modified"'
-                          '<vnicEtherIf rn="if' + OLD_VLAN_NAME +
-                          '" status="deleted"> </vnicEtherIf> <vnicEtherIf'
+                          PROFILE_NAME + '" nwCtrlPolicyName="" '
+                          'pinToGroupName="" qosPolicyName="" '
+                          'status="created,modified">'
+                          '<vnicEtherIf rn="if-' + OLD_VLAN_NAME +
+                          '" status="deleted"> </vnicEtherIf> <vnicEtherIf '
                           'defaultNet="yes" name="' +
-                          VLAN_NAME + '" rn="if' + VLAN_NAME +
-                          '" > </vnicEtherIf> </vnicProfile> </pair'
+                          VLAN_NAME + '" rn="if-' + VLAN_NAME +
+                          '" > </vnicEtherIf> </vnicProfile> </pair>'
                           '</inConfigs> </configConfMos>')
 
 DELETE_VLAN = ('<configConfMos cookie="' + COOKIE_VALUE +
-               '" inHierarchical="true"> <inConfigs'
-               '<pair key="fabric/lan/net' + VLAN_NAME +
-               '"> <fabricVlan dn="fabric/lan/net' + VLAN_NAME +
-               '" status="deleted"> </fabricVlan> </pair> </inConfigs'
-               '</configConfMos')
+               '" inHierarchical="true"> <inConfigs>'
+               '<pair key="fabric/lan/net-' + VLAN_NAME +
+               '"> <fabricVlan dn="fabric/lan/net-' + VLAN_NAME +
+               '" status="deleted"> </fabricVlan> </pair> </inConfigs>'
+               '</configConfMos>')
 
 DELETE_PROFILE = ('<configConfMos cookie="' + COOKIE_VALUE +
-                  '" inHierarchical="false"> <inConfigs'
-                  '<pair key="fabric/lan/profiles/vnic' + PROFILE_NAME +
-                  '"> <vnicProfile dn="fabric/lan/profiles/vnic' +
-                  PROFILE_NAME + '" status="deleted"> </vnicProfile'
-                  '</pair> </inConfigs> </configConfMos')
+                  '" inHierarchical="false"> <inConfigs>'
+                  '<pair key="fabric/lan/profiles/vnic-' + PROFILE_NAME +
+                  '"> <vnicProfile dn="fabric/lan/profiles/vnic-' +
+                  PROFILE_NAME + '" status="deleted"> </vnicProfile>'
+                  '</pair> </inConfigs> </configConfMos>')
 
 GET_BLADE_INTERFACE_STATE = ('<configScope cookie="' + COOKIE_VALUE +
                              '" dn="' + BLADE_DN_VALUE + '" inClass="dcxVIf"' +
@@ -141,28 +138,20 @@ class CiscoUCSMDriver():
         pass
 
     def _post_data(self, ucsm_ip, ucsm_username, ucsm_password, data):
-        """Send command to UCSM in http request"""
-        conn = httplib.HTTPSConnection(ucsm_ip)
-        login_data = ("<aaaLogin inName=\"" + ucsm_username +
-                      "\" inPassword=\"" + ucsm_password + "\" />")
-        conn.request(METHOD, URL, login_data, HEADERS)
-        response = conn.getresponse()
-        response_data = response.read()
-        # TODO (Sumit): If login is not successful, throw exception
-        xml_tree = et.XML(response_data)
-        cookie = xml_tree.attrib["outCookie"]
-
-        data = data.replace(COOKIE_VALUE, cookie)
-        conn.request(METHOD, URL, data, HEADERS)
-        response = conn.getresponse()
-        response_data = response.read()
-        post_data_response = response_data
-
-        logout_data = "<aaaLogout inCookie=\"" + cookie + "\" />"
-        conn.request(METHOD, URL, logout_data, HEADERS)
-        response = conn.getresponse()
-        response_data = response.read()
-        return post_data_response
+        """Send command to UCSM over the shared session"""
+        return ucs_client.get_client().post(ucsm_ip, ucsm_username,
+                                            ucsm_password, data)
+
+    def _post_config(self, ucsm_ip, ucsm_username, ucsm_password, *data):
+        """
+        Send configConfMos commands to UCSM, together with any other
+        changes to the same UCSM, in one request
+        """
+        txn = ucs_client.ConfMosTransaction()
+        for document in data:
+            txn.add_document(document)
+        ucs_client.get_batcher().apply(txn, ucsm_ip, ucs_client.HTTPS_PORT,
+                                       ucsm_username, ucsm_password)
 
     def _create_vlan_post_data(self, vlan_name, vlan_id):
         """Create command"""
@@ -262,15 +251,16 @@ class CiscoUCSMDriver():
                     ucsm_password):
         """Create request for UCSM"""
         data = self._create_vlan_post_data(vlan_name, vlan_id)
-        self._post_data(ucsm_ip, ucsm_username, ucsm_password, data)
+        self._post_config(ucsm_ip, ucsm_username, ucsm_password, data)
 
     def create_profile(self, profile_name, vlan_name, ucsm_ip, ucsm_username,
                        ucsm_password):
         """Create request for UCSM"""
-        data = self._create_profile_post_data(profile_name, vlan_name)
-        self._post_data(ucsm_ip, ucsm_username, ucsm_password, data)
-        data = self._create_pclient_post_data(profile_name, profile_name[-16:])
-        self._post_data(ucsm_ip, ucsm_username, ucsm_password, data)
+        profile = self._create_profile_post_data(profile_name, vlan_name)
+        pclient = self._create_pclient_post_data(profile_name,
+                                                 profile_name[-16:])
+        self._post_config(ucsm_ip, ucsm_username, ucsm_password, profile,
+                          pclient)
 
     def change_vlan_in_profile(self, profile_name, old_vlan_name,
                                new_vlan_name, ucsm_ip, ucsm_username,
@@ -279,7 +269,7 @@ class CiscoUCSMDriver():
         data = self._change_vlaninprof_post_data(profile_name,
                                                  old_vlan_name,
                                                  new_vlan_name)
-        self._post_data(ucsm_ip, ucsm_username, ucsm_password, data)
+        self._post_config(ucsm_ip, ucsm_username, ucsm_password, data)
 
     def get_blade_data(self, chassis_number, blade_number, ucsm_ip,
                        ucsm_username, ucsm_password):
@@ -304,10 +294,10 @@ class CiscoUCSMDriver():
     def delete_vlan(self, vlan_name, ucsm_ip, ucsm_username, ucsm_password):
         """Create request for UCSM"""
         data = self._delete_vlan_post_data(vlan_name)
-        self._post_data(ucsm_ip, ucsm_username, ucsm_password, data)
+        self._post_config(ucsm_ip, ucsm_username, ucsm_password, data)
 
     def delete_profile(self, profile_name, ucsm_ip, ucsm_username,
                        ucsm_password):
         """Create request for UCSM"""
         data = self._delete_profile_post_data(profile_name)
-        self._post_data(ucsm_ip, ucsm_username, ucsm_password, data)
+        self._post_config(ucsm_ip, ucsm_username, ucsm_password, data)
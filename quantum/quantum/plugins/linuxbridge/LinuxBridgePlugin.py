@@ -65,7 +65,9 @@ class LinuxBridgePlugin(QuantumPluginBase):
         the specified tenant.
         """
         LOG.debug("LinuxBridgePlugin.get_all_networks() called")
-        networks_list = db.network_list(tenant_id)
+        networks_list = db.network_list(tenant_id,
+                                        kwargs.get('filter_opts'),
+                                        active_op_status=True)
         new_networks_list = []
         for network in networks_list:
             new_network_dict = cutil.make_net_dict(network[const.UUID],
@@ -73,7 +75,6 @@ class LinuxBridgePlugin(QuantumPluginBase):
                                                    [], network[const.OPSTATUS])
             new_networks_list.append(new_network_dict)
 
-        # This plugin does not perform filtering at the moment
         return new_networks_list
 
     def get_network_details(self, tenant_id, net_id):
@@ -167,15 +168,24 @@ class LinuxBridgePlugin(QuantumPluginBase):
         """
         LOG.debug("LinuxBridgePlugin.get_all_ports() called")
         db.validate_network_ownership(tenant_id, net_id)
-        ports_list = db.port_list(net_id)
+        ports_list = db.port_list(net_id, kwargs.get('filter_opts'),
+                                  active_op_status=True)
         ports_on_net = []
         for port in ports_list:
             new_port = cutil.make_port_dict(port)
             ports_on_net.append(new_port)
 
-        # This plugin does not perform filtering at the moment
         return ports_on_net
 
+    def get_all_ports_details(self, tenant_id, net_id):
+        """
+        Retrieves the details of all the ports of the specified Virtual
+        Network.
+        """
+        LOG.debug("LinuxBridgePlugin.get_all_ports_details() called")
+        db.validate_network_ownership(tenant_id, net_id)
+        return [cutil.make_port_dict(port) for port in db.port_list(net_id)]
+
     def get_port_details(self, tenant_id, net_id, port_id):
         """
         This method allows the user to retrieve a remote interface
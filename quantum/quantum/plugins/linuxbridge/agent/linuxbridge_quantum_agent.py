@@ -35,6 +35,7 @@ from sqlalchemy.ext.sqlsoup import SqlSoup
 
 from quantum.plugins.linuxbridge.common import config
 
+from quantum.agent import db_sync
 from quantum.agent.linux import utils
 
 logging.basicConfig()
@@ -56,6 +57,8 @@ OP_STATUS_DOWN = "DOWN"
 # Default inteval values
 DEFAULT_POLLING_INTERVAL = 2
 DEFAULT_RECONNECT_INTERVAL = 2
+# The quantum tables the agent follows, with their key column
+DB_TABLES = {'ports': 'uuid', 'vlan_bindings': 'vlan_id'}
 
 
 class LinuxBridge:
@@ -311,6 +314,7 @@ class LinuxBridgeQuantumAgent:
         self.root_helper = root_helper
         self.setup_linux_bridge(br_name_prefix, physical_interface)
         self.db_connected = False
+        self.db_sync = db_sync.DbSync(DB_TABLES)
 
     def setup_linux_bridge(self, br_name_prefix, physical_interface):
         self.linux_br = LinuxBridge(br_name_prefix, physical_interface,
@@ -374,37 +378,29 @@ class LinuxBridgeQuantumAgent:
                                 old_port_bindings):
         vlan_bindings = {}
         try:
-            vlan_binds = db.vlan_bindings.all()
+            self.db_sync.update(db)
         except Exception as e:
-            LOG.info("Unable to get vlan bindings! Exception: %s" % e)
+            LOG.info("Unable to get bindings! Exception: %s" % e)
+            self.db_sync.request_resync()
             self.db_connected = False
             return {VLAN_BINDINGS: {},
                     PORT_BINDINGS: []}
 
         vlans_string = ""
-        for bind in vlan_binds:
+        for bind in self.db_sync.rows['vlan_bindings'].itervalues():
             entry = {'network_id': bind.network_id, 'vlan_id': bind.vlan_id}
             vlan_bindings[bind.network_id] = entry
             vlans_string = "%s %s" % (vlans_string, entry)
 
         port_bindings = []
-        try:
-            port_binds = db.ports.all()
-        except Exception as e:
-            LOG.info("Unable to get port bindings! Exception: %s" % e)
-            self.db_connected = False
-            return {VLAN_BINDINGS: {},
-                    PORT_BINDINGS: []}
-
-        all_bindings = {}
-        for bind in port_binds:
-            all_bindings[bind.uuid] = bind
+        for bind in self.db_sync.rows['ports'].itervalues():
             entry = {'network_id': bind.network_id, 'state': bind.state,
                      'op_status': bind.op_status, 'uuid': bind.uuid,
                      'interface_id': bind.interface_id}
             if bind.state == 'ACTIVE':
                 port_bindings.append(entry)
 
+        op_statuses = {}
         plugged_interfaces = []
         ports_string = ""
         for pb in port_bindings:
@@ -415,7 +411,7 @@ class LinuxBridgeQuantumAgent:
                                              pb['network_id'],
                                              pb['interface_id'],
                                              vlan_id):
-                    all_bindings[pb['uuid']].op_status = OP_STATUS_UP
+                    op_statuses[pb['uuid']] = OP_STATUS_UP
                 plugged_interfaces.append(pb['interface_id'])
 
         if old_port_bindings != port_bindings:
@@ -429,10 +425,12 @@ class LinuxBridgeQuantumAgent:
         self.process_deleted_networks(vlan_bindings)
 
         try:
+            self.db_sync.update_column(db, 'ports', 'op_status', op_statuses)
             db.commit()
         except Exception as e:
             LOG.info("Unable to update database! Exception: %s" % e)
             db.rollback()
+            self.db_sync.request_resync()
             vlan_bindings = {}
             port_bindings = []
 
@@ -484,6 +482,7 @@ def main():
     polling_interval = conf.AGENT.polling_interval
     reconnect_interval = conf.DATABASE.reconnect_interval
     root_helper = conf.AGENT.root_helper
+    utils.set_root_helper_daemon(conf.AGENT.root_helper_daemon)
     'Establish database connection and load models'
     db_connection_url = conf.DATABASE.sql_connection
     LOG.info("Connecting to %s" % (db_connection_url))
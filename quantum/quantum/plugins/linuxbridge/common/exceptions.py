@@ -50,9 +50,3 @@ class VlanIDNotFound(exceptions.QuantumException):
 class VlanIDNotAvailable(exceptions.QuantumException):
     """No VLAN ID available"""
     message = _("No Vlan ID available")
-
-
-class UnableToChangeVlanRange(exceptions.QuantumException):
-    """No VLAN ID available"""
-    message = _("Current VLAN ID range %(range_start)s to %(range_end)s "
-                "cannot be changed. Please check plugin conf file.")
@@ -17,12 +17,12 @@
 
 import logging
 
-from sqlalchemy import func
 from sqlalchemy.orm import exc
 
 from quantum.common import exceptions as q_exc
 from quantum.common.utils import find_config_file
 import quantum.db.api as db
+from quantum.db import vlan_allocator
 from quantum.plugins.linuxbridge.common import config
 from quantum.plugins.linuxbridge.common import exceptions as c_exc
 from quantum.plugins.linuxbridge.db import l2network_models
@@ -32,6 +32,8 @@ CONF_FILE = find_config_file({'plugin': 'linuxbridge'},
                              "linuxbridge_conf.ini")
 CONF = config.parse(CONF_FILE)
 
+_VLAN_ALLOCATOR = None
+
 
 def initialize():
     options = {"sql_connection": "%s" % CONF.DATABASE.sql_connection}
@@ -41,40 +43,28 @@ def initialize():
 
 
 def create_vlanids():
-    """Prepopulates the vlan_bindings table"""
+    """Prepopulates the vlan_ids table"""
     LOG.debug("create_vlanids() called")
     session = db.get_session()
-    start = CONF.VLANS.vlan_start
-    end = CONF.VLANS.vlan_end
-    try:
-        vlanid = session.query(l2network_models.VlanID).one()
-    except exc.MultipleResultsFound:
-        """
-        TODO (Sumit): Salvatore rightly points out that this will not handle
-        change in VLAN ID range across server reboots. This is currently not
-        a supported feature. This logic will need to change if this feature
-        has to be supported.
-        Per Dan's suggestion we just throw a server exception for now.
-        """
-        current_start = (
-            int(session.query(func.min(l2network_models.VlanID.vlan_id)).
-                one()[0]))
-        current_end = (
-            int(session.query(func.max(l2network_models.VlanID.vlan_id)).
-                one()[0]))
-        if current_start != start or current_end != end:
-            LOG.debug("Old VLAN range %s-%s" % (current_start, current_end))
-            LOG.debug("New VLAN range %s-%s" % (start, end))
-            raise c_exc.UnableToChangeVlanRange(range_start=current_start,
-                                                range_end=current_end)
-    except exc.NoResultFound:
-        LOG.debug("Setting VLAN range to %s-%s" % (start, end))
-        while start <= end:
-            vlanid = l2network_models.VlanID(start)
-            session.add(vlanid)
-            start += 1
-        session.flush()
-    return
+    inserted, deleted = vlan_allocator.sync_vlan_ids(
+        session, l2network_models.VlanID,
+        CONF.VLANS.vlan_start, CONF.VLANS.vlan_end)
+    if inserted or deleted:
+        _reset_vlan_allocator()
+
+
+def _get_vlan_allocator():
+    global _VLAN_ALLOCATOR
+    if not _VLAN_ALLOCATOR:
+        _VLAN_ALLOCATOR = vlan_allocator.DbVlanAllocator(
+            l2network_models.VlanID, CONF.VLANS.vlan_start,
+            CONF.VLANS.vlan_end)
+    return _VLAN_ALLOCATOR
+
+
+def _reset_vlan_allocator():
+    global _VLAN_ALLOCATOR
+    _VLAN_ALLOCATOR = None
 
 
 def get_all_vlanids():
@@ -106,17 +96,9 @@ def release_vlanid(vlan_id):
     """Sets the vlanid state to be unused"""
     LOG.debug("release_vlanid() called")
     session = db.get_session()
-    try:
-        vlanid = (session.query(l2network_models.VlanID).
-                  filter_by(vlan_id=vlan_id).
-                  one())
-        vlanid["vlan_used"] = False
-        session.merge(vlanid)
-        session.flush()
-        return vlanid["vlan_used"]
-    except exc.NoResultFound:
+    if not _get_vlan_allocator().release(session, vlan_id):
         raise c_exc.VlanIDNotFound(vlan_id=vlan_id)
-    return
+    return False
 
 
 def delete_vlanid(vlan_id):
@@ -129,6 +111,7 @@ def delete_vlanid(vlan_id):
                   one())
         session.delete(vlanid)
         session.flush()
+        _get_vlan_allocator().mark_used(vlan_id)
         return vlanid
     except exc.NoResultFound:
         raise c_exc.VlanIDNotFound(vlan_id=vlan_id)
@@ -138,27 +121,15 @@ def reserve_vlanid():
     """Reserves the first unused vlanid"""
     LOG.debug("reserve_vlanid() called")
     session = db.get_session()
-    try:
-        rvlan = (session.query(l2network_models.VlanID).
-                 first())
-        if not rvlan:
-            create_vlanids()
-
-        rvlan = (session.query(l2network_models.VlanID).
-                 filter_by(vlan_used=False).
-                 first())
-        if not rvlan:
-            raise c_exc.VlanIDNotAvailable()
-
-        rvlanid = (session.query(l2network_models.VlanID).
-                   filter_by(vlan_id=rvlan["vlan_id"]).
-                   one())
-        rvlanid["vlan_used"] = True
-        session.merge(rvlanid)
-        session.flush()
-        return rvlan["vlan_id"]
-    except exc.NoResultFound:
+    rvlan = (session.query(l2network_models.VlanID).
+             first())
+    if not rvlan:
+        create_vlanids()
+
+    vlan_id = _get_vlan_allocator().reserve(session)
+    if vlan_id is None:
         raise c_exc.VlanIDNotAvailable()
+    return vlan_id
 
 
 def get_all_vlanids_used():
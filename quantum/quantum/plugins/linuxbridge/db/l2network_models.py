@@ -17,7 +17,7 @@
 
 from sqlalchemy import Column, Integer, String, Boolean
 
-from quantum.db.models import BASE
+from quantum.db.models import BASE, track_changes
 
 
 class VlanID(BASE):
@@ -48,3 +48,6 @@ class VlanBinding(BASE):
 
     def __repr__(self):
         return "<VlanBinding(%d,%s)>" % (self.vlan_id, self.network_id)
+
+
+track_changes(VlanBinding, 'vlan_id')
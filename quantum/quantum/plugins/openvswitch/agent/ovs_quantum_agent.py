@@ -26,7 +26,10 @@ import time
 
 from sqlalchemy.ext import sqlsoup
 
+from quantum.agent import db_sync
 from quantum.agent.linux import ovs_lib
+from quantum.agent.linux import ovsdb_monitor
+from quantum.agent.linux import utils
 from quantum.plugins.openvswitch.common import config
 
 logging.basicConfig()
@@ -42,6 +45,10 @@ DEAD_VLAN_TAG = "4095"
 # Default interval values
 DEFAULT_POLLING_INTERVAL = 2
 DEFAULT_RECONNECT_INTERVAL = 2
+DEFAULT_RESYNC_INTERVAL = 60
+
+# The quantum tables the agents follow, with their key column
+DB_TABLES = {'ports': 'uuid', 'vlan_bindings': 'vlan_id'}
 
 
 # A class to represent a VIF (i.e., a port that has 'iface-id' and 'vif-mac'
@@ -88,14 +95,65 @@ class Port(object):
         return hash(self.uuid)
 
 
+def get_changed_bindings(sync, watcher, full, ports, gone_ports, changed):
+    '''Get the bindings needed to process the changes reported by a
+    VifPortWatcher and a DbSync.
+
+    After a listing of all the VIF ports, or a read of all the bindings,
+    all the VIF ports are processed. Otherwise only the changed ports, and
+    those whose quantum port changed.
+
+    :returns: the ports to process, by interface id Port objects, and by
+        network id the vlan (or ls) ids.'''
+    if full:
+        ports = watcher.vif_ports.values()
+    else:
+        ports = list(ports)
+        vif_ids = set(p.vif_id for p in ports)
+        for rows in changed.get('ports', {}).itervalues():
+            for row in rows:
+                vif_id = row and row.interface_id
+                if vif_id in watcher.vif_ports and vif_id not in vif_ids:
+                    vif_ids.add(vif_id)
+                    ports.append(watcher.vif_ports[vif_id])
+    if not ports and not gone_ports:
+        return ports, {}, {}
+    vif_ids = set(p.vif_id for p in ports + gone_ports)
+    all_bindings = dict((row.interface_id, Port(row))
+                        for row in sync.rows['ports'].itervalues()
+                        if row.interface_id in vif_ids)
+    return ports, all_bindings, dict(
+        (bind.network_id, bind.vlan_id)
+        for bind in sync.rows['vlan_bindings'].itervalues())
+
+
+def get_op_statuses(all_bindings):
+    '''Get the op_status of Port objects by port uuid.'''
+    return dict((p.uuid, p.op_status) for p in all_bindings.itervalues())
+
+
 class OVSQuantumAgent(object):
 
     def __init__(self, integ_br, root_helper,
-                 polling_interval, reconnect_interval):
+                 polling_interval, reconnect_interval,
+                 ovsdb_monitor=False,
+                 resync_interval=DEFAULT_RESYNC_INTERVAL):
         self.root_helper = root_helper
         self.setup_integration_br(integ_br)
         self.polling_interval = polling_interval
         self.reconnect_interval = reconnect_interval
+        self.ovsdb_monitor = ovsdb_monitor
+        self.resync_interval = resync_interval
+        self.local_bindings = {}
+        self.dead_vif_ids = set()
+
+    def get_port_watcher(self):
+        monitor = None
+        if self.ovsdb_monitor:
+            monitor = ovsdb_monitor.OvsdbMonitor(self.root_helper)
+        return ovsdb_monitor.VifPortWatcher(self.int_br, monitor,
+                                            self.polling_interval,
+                                            self.resync_interval)
 
     def port_bound(self, port, vlan_id):
         self.int_br.set_db_attribute("Port", port.port_name,
@@ -108,9 +166,60 @@ class OVSQuantumAgent(object):
 
     def setup_integration_br(self, integ_br):
         self.int_br = ovs_lib.OVSBridge(integ_br, self.root_helper)
-        self.int_br.remove_all_flows()
-        # switch all traffic using L2 learning
-        self.int_br.add_flow(priority=1, actions="normal")
+        with self.int_br.deferred_flows():
+            self.int_br.remove_all_flows()
+            # switch all traffic using L2 learning
+            self.int_br.add_flow(priority=1, actions="normal")
+
+    def update_ports(self, ports, gone_ports, all_bindings, vlan_bindings):
+        '''Wire VIF ports according to their quantum bindings.
+
+        :param ports: the ovs_lib.VifPort objects that appeared or changed.
+        :param gone_ports: the ovs_lib.VifPort objects that disappeared.
+        :param all_bindings: quantum ports by interface id, covering at
+            least the given ports.
+        :param vlan_bindings: vlan ids by network id.'''
+        for p in gone_ports:
+            LOG.info("Port Disappeared: %s" % p.vif_id)
+            self.dead_vif_ids.discard(p.vif_id)
+            if self.local_bindings.pop(p.vif_id, None) is not None:
+                self.port_unbound(p, False)
+            if p.vif_id in all_bindings:
+                all_bindings[p.vif_id].op_status = OP_STATUS_DOWN
+
+        for p in ports:
+            old_b = self.local_bindings.get(p.vif_id, None)
+            if p.vif_id in all_bindings:
+                new_b = all_bindings[p.vif_id].network_id
+                self.local_bindings[p.vif_id] = new_b
+                self.dead_vif_ids.discard(p.vif_id)
+            else:
+                new_b = None
+                self.local_bindings.pop(p.vif_id, None)
+                self.dead_vif_ids.add(p.vif_id)
+                # no binding, put him on the 'dead vlan'
+                self.int_br.set_db_attribute("Port", p.port_name, "tag",
+                                             DEAD_VLAN_TAG)
+                self.int_br.add_flow(priority=2,
+                                     in_port=p.ofport,
+                                     actions="drop")
+
+            if old_b != new_b:
+                if old_b is not None:
+                    LOG.info("Removing binding to net-id = %s for %s"
+                             % (old_b, str(p)))
+                    self.port_unbound(p, True)
+                    if p.vif_id in all_bindings:
+                        all_bindings[p.vif_id].op_status = OP_STATUS_DOWN
+                if new_b is not None:
+                    # If we don't have a binding we have to stick it on
+                    # the dead vlan
+                    vlan_id = vlan_bindings.get(new_b, DEAD_VLAN_TAG)
+                    self.port_bound(p, vlan_id)
+                    all_bindings[p.vif_id].op_status = OP_STATUS_UP
+                    LOG.info(("Adding binding to net-id = %s "
+                              "for %s on vlan %s") %
+                             (new_b, str(p), vlan_id))
 
     def daemon_loop(self, db_connection_url):
         '''Main processing loop for Non-Tunneling Agent.
@@ -118,8 +227,10 @@ class OVSQuantumAgent(object):
         :param options: database information - in the event need to reconnect
         '''
         self.local_vlan_map = {}
-        old_local_bindings = {}
-        old_vif_ports = {}
+        self.local_bindings = {}
+        self.dead_vif_ids = set()
+        watcher = self.get_port_watcher()
+        sync = db_sync.DbSync(DB_TABLES, self.resync_interval)
         db_connected = False
 
         while True:
@@ -130,86 +241,36 @@ class OVSQuantumAgent(object):
                 LOG.info("Connecting to database \"%s\" on %s" %
                          (db.engine.url.database, db.engine.url.host))
 
-            all_bindings = {}
+            full, ports, gone_ports = watcher.get_changes()
             try:
-                ports = db.ports.all()
+                reloaded, changed = sync.update(db)
+                ports, all_bindings, vlan_bindings = get_changed_bindings(
+                    sync, watcher, full or reloaded, ports, gone_ports,
+                    changed)
             except Exception, e:
                 LOG.info("Unable to get port bindings! Exception: %s" % e)
+                watcher.request_resync()
+                sync.request_resync()
                 db_connected = False
                 continue
 
-            for port in ports:
-                all_bindings[port.interface_id] = port
-
-            vlan_bindings = {}
-            try:
-                vlan_binds = db.vlan_bindings.all()
-            except Exception, e:
-                LOG.info("Unable to get vlan bindings! Exception: %s" % e)
-                db_connected = False
-                continue
-
-            for bind in vlan_binds:
-                vlan_bindings[bind.network_id] = bind.vlan_id
-
-            new_vif_ports = {}
-            new_local_bindings = {}
-            vif_ports = self.int_br.get_vif_ports()
-            for p in vif_ports:
-                new_vif_ports[p.vif_id] = p
-                if p.vif_id in all_bindings:
-                    net_id = all_bindings[p.vif_id].network_id
-                    new_local_bindings[p.vif_id] = net_id
-                else:
-                    # no binding, put him on the 'dead vlan'
-                    self.int_br.set_db_attribute("Port", p.port_name, "tag",
-                                                 DEAD_VLAN_TAG)
-                    self.int_br.add_flow(priority=2,
-                                         in_port=p.ofport,
-                                         actions="drop")
-
-                old_b = old_local_bindings.get(p.vif_id, None)
-                new_b = new_local_bindings.get(p.vif_id, None)
-
-                if old_b != new_b:
-                    if old_b is not None:
-                        LOG.info("Removing binding to net-id = %s for %s"
-                                 % (old_b, str(p)))
-                        self.port_unbound(p, True)
-                        if p.vif_id in all_bindings:
-                            all_bindings[p.vif_id].op_status = OP_STATUS_DOWN
-                    if new_b is not None:
-                        # If we don't have a binding we have to stick it on
-                        # the dead vlan
-                        net_id = all_bindings[p.vif_id].network_id
-                        vlan_id = vlan_bindings.get(net_id, DEAD_VLAN_TAG)
-                        self.port_bound(p, vlan_id)
-                        if p.vif_id in all_bindings:
-                            all_bindings[p.vif_id].op_status = OP_STATUS_UP
-                        LOG.info(("Adding binding to net-id = %s "
-                                  "for %s on vlan %s") %
-                                 (new_b, str(p), vlan_id))
-
-            for vif_id in old_vif_ports:
-                if vif_id not in new_vif_ports:
-                    LOG.info("Port Disappeared: %s" % vif_id)
-                    if vif_id in old_local_bindings:
-                        old_b = old_local_bindings[vif_id]
-                        self.port_unbound(old_vif_ports[vif_id], False)
-                    if vif_id in all_bindings:
-                        all_bindings[vif_id].op_status = OP_STATUS_DOWN
-
-            old_vif_ports = new_vif_ports
-            old_local_bindings = new_local_bindings
+            # one ovs-ofctl call per kind of flow change for the whole pass
+            with self.int_br.deferred_flows():
+                self.update_ports(ports, gone_ports, all_bindings,
+                                  vlan_bindings)
             try:
+                sync.update_column(db, 'ports', 'op_status',
+                                   get_op_statuses(all_bindings))
                 db.commit()
             except Exception, e:
                 LOG.info("Unable to commit to database! Exception: %s" % e)
                 db.rollback()
-                old_local_bindings = {}
-                old_vif_ports = {}
+                self.local_bindings = {}
+                watcher.request_resync()
+                sync.request_resync()
 
-            time.sleep(self.polling_interval)
+            if not watcher.monitor:
+                time.sleep(self.polling_interval)
 
 
 class OVSQuantumTunnelAgent(object):
@@ -237,7 +298,9 @@ class OVSQuantumTunnelAgent(object):
     MAX_VLAN_TAG = 4094
 
     def __init__(self, integ_br, tun_br, local_ip, root_helper,
-                 polling_interval, reconnect_interval):
+                 polling_interval, reconnect_interval,
+                 ovsdb_monitor=False,
+                 resync_interval=DEFAULT_RESYNC_INTERVAL):
         '''Constructor.
 
         :param integ_br: name of the integration bridge.
@@ -245,7 +308,11 @@ class OVSQuantumTunnelAgent(object):
         :param local_ip: local IP address of this hypervisor.
         :param root_helper: utility to use when running shell cmds.
         :param polling_interval: interval (secs) to poll DB.
-        :param reconnect_internal: retry interval (secs) on DB error.'''
+        :param reconnect_internal: retry interval (secs) on DB error.
+        :param ovsdb_monitor: whether to follow port changes through
+            ovsdb-client monitor rather than by polling.
+        :param resync_interval: interval (secs) between full resyncs when
+            following port changes through ovsdb-client monitor.'''
         self.root_helper = root_helper
         self.available_local_vlans = set(
             xrange(OVSQuantumTunnelAgent.MIN_VLAN_TAG,
@@ -255,6 +322,10 @@ class OVSQuantumTunnelAgent(object):
 
         self.polling_interval = polling_interval
         self.reconnect_interval = reconnect_interval
+        self.ovsdb_monitor = ovsdb_monitor
+        self.resync_interval = resync_interval
+        self.local_bindings = {}
+        self.dead_vif_ids = set()
 
         self.local_ip = local_ip
         self.tunnel_count = 0
@@ -271,15 +342,16 @@ class OVSQuantumTunnelAgent(object):
         LOG.info("Assigning %s as local vlan for net-id=%s" % (lvid, net_uuid))
         self.local_vlan_map[net_uuid] = LocalVLANMapping(lvid, lsw_id)
 
-        # outbound
-        self.tun_br.add_flow(priority=4, in_port=self.patch_int_ofport,
-                             dl_vlan=lvid,
-                             actions="strip_vlan,set_tunnel:%s,normal" %
-                             (lsw_id))
-        # inbound
-        self.tun_br.add_flow(priority=3, tun_id=lsw_id,
-                             actions="mod_vlan_vid:%s,output:%s" %
-                             (lvid, self.patch_int_ofport))
+        with self.tun_br.deferred_flows():
+            # outbound
+            self.tun_br.add_flow(priority=4, in_port=self.patch_int_ofport,
+                                 dl_vlan=lvid,
+                                 actions="strip_vlan,set_tunnel:%s,normal" %
+                                 (lsw_id))
+            # inbound
+            self.tun_br.add_flow(priority=3, tun_id=lsw_id,
+                                 actions="mod_vlan_vid:%s,output:%s" %
+                                 (lvid, self.patch_int_ofport))
 
     def reclaim_local_vlan(self, net_uuid, lvm):
         '''Reclaim a local VLAN.
@@ -288,8 +360,9 @@ class OVSQuantumTunnelAgent(object):
         :param lvm: a LocalVLANMapping object that tracks (vlan, lsw_id,
             vif_ids) mapping.'''
         LOG.info("reclaming vlan = %s from net-id = %s" % (lvm.vlan, net_uuid))
-        self.tun_br.delete_flows(tun_id=lvm.lsw_id)
-        self.tun_br.delete_flows(dl_vlan=lvm.vlan)
+        with self.tun_br.deferred_flows():
+            self.tun_br.delete_flows(tun_id=lvm.lsw_id)
+            self.tun_br.delete_flows(dl_vlan=lvm.vlan)
         del self.local_vlan_map[net_uuid]
         self.available_local_vlans.add(lvm.vlan)
 
@@ -349,9 +422,10 @@ class OVSQuantumTunnelAgent(object):
         self.int_br.delete_port("patch-tun")
         self.patch_tun_ofport = self.int_br.add_patch_port("patch-tun",
                                                            "patch-int")
-        self.int_br.remove_all_flows()
-        # switch all traffic using L2 learning
-        self.int_br.add_flow(priority=1, actions="normal")
+        with self.int_br.deferred_flows():
+            self.int_br.remove_all_flows()
+            # switch all traffic using L2 learning
+            self.int_br.add_flow(priority=1, actions="normal")
 
     def setup_tunnel_br(self, tun_br):
         '''Setup the tunnel bridge.
@@ -364,8 +438,9 @@ class OVSQuantumTunnelAgent(object):
         self.tun_br.reset_bridge()
         self.patch_int_ofport = self.tun_br.add_patch_port("patch-int",
                                                            "patch-tun")
-        self.tun_br.remove_all_flows()
-        self.tun_br.add_flow(priority=1, actions="drop")
+        with self.tun_br.deferred_flows():
+            self.tun_br.remove_all_flows()
+            self.tun_br.add_flow(priority=1, actions="drop")
 
     def manage_tunnels(self, tunnel_ips, old_tunnel_ips, db):
         if self.local_ip in tunnel_ips:
@@ -381,6 +456,14 @@ class OVSQuantumTunnelAgent(object):
                 self.tun_br.add_tunnel_port(tun_name, ip)
                 self.tunnel_count += 1
 
+    def get_port_watcher(self):
+        monitor = None
+        if self.ovsdb_monitor:
+            monitor = ovsdb_monitor.OvsdbMonitor(self.root_helper)
+        return ovsdb_monitor.VifPortWatcher(self.int_br, monitor,
+                                            self.polling_interval,
+                                            self.resync_interval)
+
     def rollback_until_success(self, db):
         while True:
             time.sleep(self.reconnect_interval)
@@ -390,14 +473,72 @@ class OVSQuantumTunnelAgent(object):
             except:
                 LOG.exception("Problem connecting to database")
 
+    def update_ports(self, ports, gone_ports, all_bindings, lsw_id_bindings):
+        '''Wire VIF ports according to their quantum bindings.
+
+        :param ports: the ovs_lib.VifPort objects that appeared or changed.
+        :param gone_ports: the ovs_lib.VifPort objects that disappeared.
+        :param all_bindings: Port objects by interface id, covering at least
+            the given ports.
+        :param lsw_id_bindings: ls ids by network id.'''
+        for p in gone_ports:
+            LOG.info("Port Disappeared: " + p.vif_id)
+            self.dead_vif_ids.discard(p.vif_id)
+            if p.vif_id in all_bindings:
+                all_bindings[p.vif_id].op_status = OP_STATUS_DOWN
+            old_port = self.local_bindings.pop(p.vif_id, None)
+            if old_port:
+                self.port_unbound(p, old_port.network_id)
+
+        for p in ports:
+            old_port = self.local_bindings.get(p.vif_id)
+            new_port = all_bindings.get(p.vif_id)
+            self.local_bindings[p.vif_id] = new_port
+            if not new_port:
+                LOG.info("No quantum binding for port " + str(p)
+                         + "putting on dead vlan")
+                self.dead_vif_ids.add(p.vif_id)
+                self.port_dead(p)
+            else:
+                self.dead_vif_ids.discard(p.vif_id)
+
+            if new_port == old_port:
+                continue
+            if old_port:
+                old_net_uuid = old_port.network_id
+                LOG.info("Removing binding to net-id = " +
+                         old_net_uuid + " for " + str(p)
+                         + " added to dead vlan")
+                self.port_unbound(p, old_net_uuid)
+                if new_port:
+                    new_port.op_status = OP_STATUS_DOWN
+                else:
+                    self.port_dead(p)
+
+            if new_port:
+                new_net_uuid = new_port.network_id
+                if new_net_uuid not in lsw_id_bindings:
+                    LOG.warn("No ls-id binding found for net-id '%s'" %
+                             new_net_uuid)
+                    continue
+
+                lsw_id = lsw_id_bindings[new_net_uuid]
+                self.port_bound(p, new_net_uuid, lsw_id)
+                new_port.op_status = OP_STATUS_UP
+                LOG.info("Port %s on net-id = %s bound to %s " % (
+                         str(p), new_net_uuid,
+                         str(self.local_vlan_map[new_net_uuid])))
+
     def daemon_loop(self, db_connection_url):
         '''Main processing loop for Tunneling Agent.
 
         :param options: database information - in the event need to reconnect
         '''
-        old_local_bindings = {}
-        old_vif_ports = {}
+        self.local_bindings = {}
+        self.dead_vif_ids = set()
         old_tunnel_ips = set()
+        watcher = self.get_port_watcher()
+        sync = db_sync.DbSync(DB_TABLES, self.resync_interval)
 
         db = sqlsoup.SqlSoup(db_connection_url)
         LOG.info("Connecting to database \"%s\" on %s" %
@@ -405,100 +546,43 @@ class OVSQuantumTunnelAgent(object):
 
         while True:
             try:
-                all_bindings = dict((p.interface_id, Port(p))
-                                    for p in db.ports.all())
-                all_bindings_vif_port_ids = set(all_bindings)
-                lsw_id_bindings = dict((bind.network_id, bind.vlan_id)
-                                       for bind in db.vlan_bindings.all())
-
-                tunnel_ips = set(x.ip_address for x in db.tunnel_ips.all())
-                self.manage_tunnels(tunnel_ips, old_tunnel_ips, db)
-
-                # Get bindings from OVS bridge.
-                vif_ports = self.int_br.get_vif_ports()
-                new_vif_ports = dict([(p.vif_id, p) for p in vif_ports])
-                new_vif_ports_ids = set(new_vif_ports.keys())
-
-                old_vif_ports_ids = set(old_vif_ports.keys())
-                dead_vif_ports_ids = (new_vif_ports_ids -
-                                      all_bindings_vif_port_ids)
-                dead_vif_ports = [new_vif_ports[p] for p in dead_vif_ports_ids]
-                disappeared_vif_ports_ids = (old_vif_ports_ids -
-                                             new_vif_ports_ids)
-                new_local_bindings_ids = (all_bindings_vif_port_ids.
-                                          intersection(new_vif_ports_ids))
-                new_local_bindings = dict([(p, all_bindings.get(p))
-                                           for p in new_vif_ports_ids])
-                new_bindings = set(
-                    (p, old_local_bindings.get(p),
-                     new_local_bindings.get(p)) for p in new_vif_ports_ids)
-                changed_bindings = set([b for b in new_bindings
-                                        if b[2] != b[1]])
+                full, ports, gone_ports = watcher.get_changes()
+                reloaded, changed = sync.update(db)
+                full = full or reloaded
+                ports, all_bindings, lsw_id_bindings = get_changed_bindings(
+                    sync, watcher, full, ports, gone_ports, changed)
+
+                if full:
+                    tunnel_ips = set(x.ip_address
+                                     for x in db.tunnel_ips.all())
+                    self.manage_tunnels(tunnel_ips, old_tunnel_ips, db)
+                    old_tunnel_ips = tunnel_ips
 
                 LOG.debug('all_bindings: %s', all_bindings)
                 LOG.debug('lsw_id_bindings: %s', lsw_id_bindings)
-                LOG.debug('new_vif_ports_ids: %s', new_vif_ports_ids)
-                LOG.debug('dead_vif_ports_ids: %s', dead_vif_ports_ids)
-                LOG.debug('old_vif_ports_ids: %s', old_vif_ports_ids)
-                LOG.debug('new_local_bindings_ids: %s',
-                          new_local_bindings_ids)
-                LOG.debug('new_local_bindings: %s', new_local_bindings)
-                LOG.debug('new_bindings: %s', new_bindings)
-                LOG.debug('changed_bindings: %s', changed_bindings)
-
-                # Take action.
-                for p in dead_vif_ports:
-                    LOG.info("No quantum binding for port " + str(p)
-                             + "putting on dead vlan")
-                    self.port_dead(p)
+                LOG.debug('ports: %s', [p.vif_id for p in ports])
+                LOG.debug('gone_ports: %s', [p.vif_id for p in gone_ports])
 
-                for b in changed_bindings:
-                    port_id, old_port, new_port = b
-                    p = new_vif_ports[port_id]
-                    if old_port:
-                        old_net_uuid = old_port.network_id
-                        LOG.info("Removing binding to net-id = " +
-                                 old_net_uuid + " for " + str(p)
-                                 + " added to dead vlan")
-                        self.port_unbound(p, old_net_uuid)
-                        all_bindings[p.vif_id].op_status = OP_STATUS_DOWN
-                        if not new_port:
-                            self.port_dead(p)
-
-                    if new_port:
-                        new_net_uuid = new_port.network_id
-                        if new_net_uuid not in lsw_id_bindings:
-                            LOG.warn("No ls-id binding found for net-id '%s'" %
-                                     new_net_uuid)
-                            continue
-
-                        lsw_id = lsw_id_bindings[new_net_uuid]
-                        self.port_bound(p, new_net_uuid, lsw_id)
-                        all_bindings[p.vif_id].op_status = OP_STATUS_UP
-                        LOG.info("Port %s on net-id = %s bound to %s " % (
-                                 str(p), new_net_uuid,
-                                 str(self.local_vlan_map[new_net_uuid])))
-
-                for vif_id in disappeared_vif_ports_ids:
-                    LOG.info("Port Disappeared: " + vif_id)
-                    if vif_id in all_bindings:
-                        all_bindings[vif_id].op_status = OP_STATUS_DOWN
-                    old_port = old_local_bindings.get(vif_id)
-                    if old_port:
-                        self.port_unbound(old_vif_ports[vif_id],
-                                          old_port.network_id)
-                # commit any DB changes and expire
+                # Take action, with one ovs-ofctl call per kind of flow
+                # change and bridge for the whole pass.
+                with self.int_br.deferred_flows():
+                    with self.tun_br.deferred_flows():
+                        self.update_ports(ports, gone_ports, all_bindings,
+                                          lsw_id_bindings)
+
+                # write the op_status changes back, and expire
                 # data loaded from the database
+                sync.update_column(db, 'ports', 'op_status',
+                                   get_op_statuses(all_bindings))
                 db.commit()
 
-                # sleep and re-initialize state for next pass
-                time.sleep(self.polling_interval)
-                old_tunnel_ips = tunnel_ips
-                old_vif_ports = new_vif_ports
-                old_local_bindings = new_local_bindings
+                if not watcher.monitor:
+                    time.sleep(self.polling_interval)
 
             except:
                 LOG.exception("Main-loop Exception:")
+                watcher.request_resync()
+                sync.request_resync()
                 self.rollback_until_success(db)
 
 
@@ -539,6 +623,9 @@ def main():
     polling_interval = conf.AGENT.polling_interval
     reconnect_interval = conf.DATABASE.reconnect_interval
     root_helper = conf.AGENT.root_helper
+    utils.set_root_helper_daemon(conf.AGENT.root_helper_daemon)
+    use_ovsdb_monitor = conf.AGENT.ovsdb_monitor
+    resync_interval = conf.AGENT.resync_interval
 
     if enable_tunneling:
         # Get parameters for OVSQuantumTunnelAgent
@@ -546,11 +633,13 @@ def main():
         # Mandatory parameter.
         local_ip = conf.OVS.local_ip
         plugin = OVSQuantumTunnelAgent(integ_br, tun_br, local_ip, root_helper,
-                                       polling_interval, reconnect_interval)
+                                       polling_interval, reconnect_interval,
+                                       use_ovsdb_monitor, resync_interval)
     else:
         # Get parameters for OVSQuantumAgent.
         plugin = OVSQuantumAgent(integ_br, root_helper,
-                                 polling_interval, reconnect_interval)
+                                 polling_interval, reconnect_interval,
+                                 use_ovsdb_monitor, resync_interval)
 
     # Start everything.
     plugin.daemon_loop(db_connection_url)
@@ -33,7 +33,10 @@ ovs_opts = [
 
 agent_opts = [
     cfg.IntOpt('polling_interval', default=2),
+    cfg.BoolOpt('ovsdb_monitor', default=False),
+    cfg.IntOpt('resync_interval', default=60),
     cfg.StrOpt('root_helper', default='sudo'),
+    cfg.StrOpt('root_helper_daemon', default=None),
     cfg.StrOpt('log_file', default=None),
 ]
 
@@ -19,7 +19,7 @@
 
 from sqlalchemy import Column, Integer, String
 
-from quantum.db.models import BASE
+from quantum.db.models import BASE, track_changes
 
 
 class VlanBinding(BASE):
@@ -37,6 +37,9 @@ class VlanBinding(BASE):
         return "<VlanBinding(%s,%s)>" % (self.vlan_id, self.network_id)
 
 
+track_changes(VlanBinding, 'vlan_id')
+
+
 class TunnelIP(BASE):
     """Represents a remote IP in tunnel mode"""
     __tablename__ = 'tunnel_ips'
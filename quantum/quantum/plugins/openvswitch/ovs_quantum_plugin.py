@@ -21,10 +21,13 @@
 import logging
 import os
 
+from sqlalchemy import exc as sql_exc
+
 from quantum.api.api_common import OperationalStatus
 from quantum.common import exceptions as q_exc
 from quantum.common.utils import find_config_file
 import quantum.db.api as db
+from quantum.db import vlan_allocator
 from quantum.plugins.openvswitch.common import config
 from quantum.plugins.openvswitch import ovs_db
 from quantum.quantum_plugin_base import QuantumPluginBase
@@ -44,17 +47,17 @@ class NoFreeVLANException(Exception):
 class VlanMap(object):
     vlans = {}
     net_ids = {}
-    free_vlans = set()
 
     def __init__(self, vlan_min=1, vlan_max=4094):
         self.vlan_min = vlan_min
         self.vlan_max = vlan_max
         self.vlans.clear()
         self.net_ids.clear()
-        self.free_vlans = set(xrange(self.vlan_min, self.vlan_max + 1))
+        self.free_vlans = vlan_allocator.VlanAllocator(self.vlan_min,
+                                                       self.vlan_max)
 
     def already_used(self, vlan_id, network_id):
-        self.free_vlans.remove(vlan_id)
+        self.free_vlans.mark_used(vlan_id)
         self.set_vlan(vlan_id, network_id)
 
     def set_vlan(self, vlan_id, network_id):
@@ -62,8 +65,8 @@ class VlanMap(object):
         self.net_ids[network_id] = vlan_id
 
     def acquire(self, network_id):
-        if len(self.free_vlans):
-            vlan = self.free_vlans.pop()
+        vlan = self.free_vlans.allocate()
+        if vlan is not None:
             self.set_vlan(vlan, network_id)
             LOG.debug("Allocated VLAN %s for network %s" % (vlan, network_id))
             return vlan
@@ -74,7 +77,7 @@ class VlanMap(object):
     def release(self, network_id):
         vlan = self.net_ids.get(network_id, None)
         if vlan is not None:
-            self.free_vlans.add(vlan)
+            self.free_vlans.mark_free(vlan)
             del self.vlans[vlan]
             del self.net_ids[network_id]
             LOG.debug("Deallocated VLAN %s (used by network %s)" %
@@ -114,6 +117,9 @@ class OVSQuantumPlugin(QuantumPluginBase):
         self.vmap = VlanMap(vlan_min, vlan_max)
         # Populate the map with anything that is already present in the
         # database
+        self._load_vlans()
+
+    def _load_vlans(self):
         vlans = ovs_db.get_vlans()
         for x in vlans:
             vlan_id, network_id = x
@@ -121,9 +127,27 @@ class OVSQuantumPlugin(QuantumPluginBase):
                       (vlan_id, network_id))
             self.vmap.already_used(vlan_id, network_id)
 
+    def _bind_vlan(self, network_id):
+        """
+        Binds a free VLAN to the network. The vlan_id primary key of the
+        binding table makes sure that servers sharing the database never
+        bind the same VLAN; on a conflict the bindings are read again.
+        """
+        while True:
+            vlan_id = self.vmap.acquire(network_id)
+            try:
+                ovs_db.add_vlan_binding(vlan_id, network_id)
+                return vlan_id
+            except sql_exc.IntegrityError:
+                LOG.debug("VLAN %s was bound by another server" % vlan_id)
+                self.vmap.release(network_id)
+                self.vmap.free_vlans.mark_used(vlan_id)
+                self._load_vlans()
+
     def get_all_networks(self, tenant_id, **kwargs):
         nets = []
-        for x in db.network_list(tenant_id):
+        for x in db.network_list(tenant_id, kwargs.get('filter_opts'),
+                                 active_op_status=True):
             LOG.debug("Adding network: %s" % x.uuid)
             nets.append(self._make_net_dict(str(x.uuid), x.name,
                                             None, x.op_status))
@@ -143,8 +167,7 @@ class OVSQuantumPlugin(QuantumPluginBase):
         net = db.network_create(tenant_id, net_name,
                                 op_status=OperationalStatus.UP)
         LOG.debug("Created network: %s" % net)
-        vlan_id = self.vmap.acquire(str(net.uuid))
-        ovs_db.add_vlan_binding(vlan_id, str(net.uuid))
+        self._bind_vlan(str(net.uuid))
         return self._make_net_dict(str(net.uuid), net.name, [], net.op_status)
 
     def delete_network(self, tenant_id, net_id):
@@ -190,10 +213,14 @@ class OVSQuantumPlugin(QuantumPluginBase):
     def get_all_ports(self, tenant_id, net_id, **kwargs):
         ids = []
         db.validate_network_ownership(tenant_id, net_id)
-        ports = db.port_list(net_id)
-        # This plugin does not perform filtering at the moment
+        ports = db.port_list(net_id, kwargs.get('filter_opts'),
+                             active_op_status=True)
         return [{'port-id': str(p.uuid)} for p in ports]
 
+    def get_all_ports_details(self, tenant_id, net_id):
+        db.validate_network_ownership(tenant_id, net_id)
+        return [self._make_port_dict(port) for port in db.port_list(net_id)]
+
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
         LOG.debug("Creating port with network_id: %s" % net_id)
         db.validate_network_ownership(tenant_id, net_id)
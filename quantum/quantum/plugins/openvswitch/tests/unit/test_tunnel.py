@@ -36,8 +36,25 @@ VIF_PORT = ovs_lib.VifPort('port', 'ofport',
 
 
 class DummyPort:
-    def __init__(self, interface_id):
+    def __init__(self, interface_id, network_id=None):
+        self.uuid = interface_id
         self.interface_id = interface_id
+        self.network_id = network_id
+        self.state = 'ACTIVE'
+        self.op_status = None
+
+
+class DummySwitch:
+    def __init__(self, br_name):
+        self.br_name = br_name
+
+
+class DummyDeferredFlows:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
 
 
 class DummyVlanBinding:
@@ -61,6 +78,7 @@ class TunnelTest(unittest.TestCase):
         self.mock_int_bridge.delete_port('patch-tun')
         self.mock_int_bridge.add_patch_port(
             'patch-tun', 'patch-int').AndReturn(self.TUN_OFPORT)
+        self.mock_int_bridge.deferred_flows().AndReturn(DummyDeferredFlows())
         self.mock_int_bridge.remove_all_flows()
         self.mock_int_bridge.add_flow(priority=1, actions='normal')
 
@@ -68,6 +86,7 @@ class TunnelTest(unittest.TestCase):
         self.mock_tun_bridge.reset_bridge()
         self.mock_tun_bridge.add_patch_port(
             'patch-int', 'patch-tun').AndReturn(self.INT_OFPORT)
+        self.mock_tun_bridge.deferred_flows().AndReturn(DummyDeferredFlows())
         self.mock_tun_bridge.remove_all_flows()
         self.mock_tun_bridge.add_flow(priority=1, actions='drop')
 
@@ -84,6 +103,7 @@ class TunnelTest(unittest.TestCase):
         self.mox.VerifyAll()
 
     def testProvisionLocalVlan(self):
+        self.mock_tun_bridge.deferred_flows().AndReturn(DummyDeferredFlows())
         action_string = 'strip_vlan,set_tunnel:%s,normal' % LS_ID
         self.mock_tun_bridge.add_flow(priority=4, in_port=self.INT_OFPORT,
                                       dl_vlan=LV_ID, actions=action_string)
@@ -103,6 +123,7 @@ class TunnelTest(unittest.TestCase):
         self.mox.VerifyAll()
 
     def testReclaimLocalVlan(self):
+        self.mock_tun_bridge.deferred_flows().AndReturn(DummyDeferredFlows())
         self.mock_tun_bridge.delete_flows(tun_id=LVM.lsw_id)
 
         self.mock_tun_bridge.delete_flows(dl_vlan=LVM.vlan)
@@ -159,3 +180,35 @@ class TunnelTest(unittest.TestCase):
         a.local_vlan_map[NET_UUID] = LVM
         a.port_dead(VIF_PORT)
         self.mox.VerifyAll()
+
+    def testUpdatePorts(self):
+        port = ovs_quantum_agent.Port(DummyPort(VIF_ID, NET_UUID))
+        vif_port = ovs_lib.VifPort('port', 'ofport', VIF_ID, VIF_MAC,
+                                   DummySwitch(self.INT_BRIDGE))
+
+        self.mock_int_bridge.set_db_attribute('Port', vif_port.port_name,
+                                              'tag', str(LV_ID))
+        self.mock_int_bridge.delete_flows(in_port=vif_port.ofport)
+        self.mox.ReplayAll()
+
+        a = ovs_quantum_agent.OVSQuantumTunnelAgent(self.INT_BRIDGE,
+                                                    self.TUN_BRIDGE,
+                                                    '10.0.0.1',
+                                                    'sudo', 2, 2)
+        a.local_vlan_map[NET_UUID] = ovs_quantum_agent.LocalVLANMapping(
+            LV_ID, LS_ID)
+        a.update_ports([vif_port], [], {VIF_ID: port}, {NET_UUID: LS_ID})
+        self.assertEqual(port.op_status, ovs_quantum_agent.OP_STATUS_UP)
+        # An unchanged binding is not rewired
+        a.update_ports([vif_port], [], {VIF_ID: port}, {NET_UUID: LS_ID})
+        # The last port of a network going away reclaims its local vlan
+        self.mox.VerifyAll()
+        self.mox.ResetAll()
+        self.mock_tun_bridge.deferred_flows().AndReturn(DummyDeferredFlows())
+        self.mock_tun_bridge.delete_flows(tun_id=LS_ID)
+        self.mock_tun_bridge.delete_flows(dl_vlan=LV_ID)
+        self.mox.ReplayAll()
+        a.update_ports([], [vif_port], {VIF_ID: port}, {})
+        self.assertEqual(port.op_status, ovs_quantum_agent.OP_STATUS_DOWN)
+        self.assertFalse(NET_UUID in a.local_vlan_map)
+        self.mox.VerifyAll()
@@ -32,6 +32,8 @@ from ryu.app import rest_nw_id
 from ryu.app.client import OFPClient
 from sqlalchemy.ext.sqlsoup import SqlSoup
 
+from quantum.agent import db_sync
+from quantum.agent.linux import ovs_lib
 from quantum.agent.linux import utils
 from quantum.plugins.ryu.common import config
 
@@ -60,10 +62,9 @@ class VifPort:
                                       self.switch.br_name))
 
 
-class OVSBridge:
+class OVSBridge(ovs_lib.OVSBridge):
     def __init__(self, br_name, root_helper):
-        self.br_name = br_name
-        self.root_helper = root_helper
+        ovs_lib.OVSBridge.__init__(self, br_name, root_helper)
         self.datapath_id = None
 
     def find_datapath_id(self):
@@ -74,10 +75,6 @@ class OVSBridge:
         dp_id = res.strip().strip('"')
         self.datapath_id = dp_id
 
-    def run_vsctl(self, args):
-        full_args = ["ovs-vsctl", "--timeout=2"] + args
-        return utils.execute(full_args, root_helper=self.root_helper)
-
     def set_controller(self, target):
         methods = ("ssl", "tcp", "unix", "pssl", "ptcp", "punix")
         args = target.split(":")
@@ -85,59 +82,23 @@ class OVSBridge:
             target = "tcp:" + target
         self.run_vsctl(["set-controller", self.br_name, target])
 
-    def db_get_map(self, table, record, column):
-        str_ = self.run_vsctl(["get", table, record, column]).rstrip("\n\r")
-        return self.db_str_to_map(str_)
-
-    def db_get_val(self, table, record, column):
-        return self.run_vsctl(["get", table, record, column]).rstrip("\n\r")
-
-    @staticmethod
-    def db_str_to_map(full_str):
-        list = full_str.strip("{}").split(", ")
-        ret = {}
-        for elem in list:
-            if elem.find("=") == -1:
-                continue
-            arr = elem.split("=")
-            ret[arr[0]] = arr[1].strip("\"")
-        return ret
-
-    def get_port_name_list(self):
-        res = self.run_vsctl(["list-ports", self.br_name])
-        return res.split("\n")[:-1]
-
-    def get_xapi_iface_id(self, xs_vif_uuid):
-        return utils.execute(["xe", "vif-param-get",
-                              "param-name=other-config",
-                              "param-key=nicira-iface-id",
-                              "uuid=%s" % xs_vif_uuid],
-                             root_helper=self.root_helper).strip()
-
-    def _vifport(self, name, external_ids):
-        ofport = self.db_get_val("Interface", name, "ofport")
-        return VifPort(name, ofport, external_ids["iface-id"],
-                       external_ids["attached-mac"], self)
-
     def _get_ports(self, get_port):
         ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            port = get_port(name)
+        for name, ofport, external_ids in self.get_port_interfaces():
+            port = get_port(name, ofport, external_ids)
             if port:
                 ports.append(port)
 
         return ports
 
-    def _get_vif_port(self, name):
-        external_ids = self.db_get_map("Interface", name, "external_ids")
+    def _get_vif_port(self, name, ofport, external_ids):
         if "iface-id" in external_ids and "attached-mac" in external_ids:
-            return self._vifport(name, external_ids)
+            return VifPort(name, ofport, external_ids["iface-id"],
+                           external_ids["attached-mac"], self)
         elif ("xs-vif-uuid" in external_ids and
               "attached-mac" in external_ids):
             # if this is a xenserver and iface-id is not automatically
             # synced to OVS from XAPI, we grab it from XAPI directly
-            ofport = self.db_get_val("Interface", name, "ofport")
             iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
             return VifPort(name, ofport, iface_id,
                            external_ids["attached-mac"], self)
@@ -146,12 +107,10 @@ class OVSBridge:
         "returns a VIF object for each VIF port"
         return self._get_ports(self._get_vif_port)
 
-    def _get_external_port(self, name):
-        external_ids = self.db_get_map("Interface", name, "external_ids")
+    def _get_external_port(self, name, ofport, external_ids):
         if external_ids:
             return
 
-        ofport = self.db_get_val("Interface", name, "ofport")
         return VifPort(name, ofport, None, None, self)
 
     def get_external_ports(self):
@@ -188,6 +147,7 @@ def check_ofp_mode(db):
 class OVSQuantumOFPRyuAgent:
     def __init__(self, integ_br, db, root_helper):
         self.root_helper = root_helper
+        self.db_sync = db_sync.DbSync({'ports': 'uuid'})
         (ofp_controller_addr, ofp_rest_api_addr) = check_ofp_mode(db)
 
         self.nw_id_external = rest_nw_id.NW_ID_EXTERNAL
@@ -206,11 +166,18 @@ class OVSQuantumOFPRyuAgent:
 
     def _all_bindings(self, db):
         """return interface id -> port which include network id bindings"""
-        return dict((port.interface_id, port) for port in db.ports.all())
+        self.db_sync.update(db)
+        return dict((port.interface_id, port)
+                    for port in self.db_sync.rows['ports'].itervalues())
+
+    def _update_op_statuses(self, db, op_statuses):
+        self.db_sync.update_column(db, 'ports', 'op_status', op_statuses)
+        db.commit()
 
     def daemon_loop(self, db):
         # on startup, register all existing ports
         all_bindings = self._all_bindings(db)
+        op_statuses = {}
 
         local_bindings = {}
         vif_ports = {}
@@ -220,16 +187,17 @@ class OVSQuantumOFPRyuAgent:
                 net_id = all_bindings[port.vif_id].network_id
                 local_bindings[port.vif_id] = net_id
                 self._port_update(net_id, port)
-                all_bindings[port.vif_id].op_status = OP_STATUS_UP
+                op_statuses[all_bindings[port.vif_id].uuid] = OP_STATUS_UP
                 LOG.info("Updating binding to net-id = %s for %s",
                          net_id, str(port))
-        db.commit()
+        self._update_op_statuses(db, op_statuses)
 
         old_vif_ports = vif_ports
         old_local_bindings = local_bindings
 
         while True:
             all_bindings = self._all_bindings(db)
+            op_statuses = {}
 
             new_vif_ports = {}
             new_local_bindings = {}
@@ -248,10 +216,12 @@ class OVSQuantumOFPRyuAgent:
                     LOG.info("Removing binding to net-id = %s for %s",
                              old_b, str(port))
                     if port.vif_id in all_bindings:
-                        all_bindings[port.vif_id].op_status = OP_STATUS_DOWN
+                        op_statuses[all_bindings[port.vif_id].uuid] = (
+                            OP_STATUS_DOWN)
                 if not new_b:
                     if port.vif_id in all_bindings:
-                        all_bindings[port.vif_id].op_status = OP_STATUS_UP
+                        op_statuses[all_bindings[port.vif_id].uuid] = (
+                            OP_STATUS_UP)
                     LOG.info("Adding binding to net-id = %s for %s",
                              new_b, str(port))
 
@@ -259,11 +229,12 @@ class OVSQuantumOFPRyuAgent:
                 if vif_id not in new_vif_ports:
                     LOG.info("Port Disappeared: %s", vif_id)
                     if vif_id in all_bindings:
-                        all_bindings[vif_id].op_status = OP_STATUS_DOWN
+                        op_statuses[all_bindings[vif_id].uuid] = (
+                            OP_STATUS_DOWN)
 
             old_vif_ports = new_vif_ports
             old_local_bindings = new_local_bindings
-            db.commit()
+            self._update_op_statuses(db, op_statuses)
             time.sleep(2)
 
 
@@ -289,6 +260,7 @@ def main():
     conf = config.parse(config_file)
     integ_br = conf.OVS.integration_bridge
     root_helper = conf.AGENT.root_helper
+    utils.set_root_helper_daemon(conf.AGENT.root_helper_daemon)
     options = {"sql_connection": conf.DATABASE.sql_connection}
     db = SqlSoup(options["sql_connection"])
 
@@ -31,6 +31,7 @@ ovs_opts = [
 agent_opts = [
     cfg.IntOpt('polling_interval', default=2),
     cfg.StrOpt('root_helper', default='sudo'),
+    cfg.StrOpt('root_helper_daemon', default=None),
 ]
 
 
@@ -76,7 +76,8 @@ class OVSQuantumPluginBase(QuantumPluginBase):
 
     def get_all_networks(self, tenant_id, **kwargs):
         nets = []
-        for net in db.network_list(tenant_id):
+        for net in db.network_list(tenant_id, kwargs.get('filter_opts'),
+                                   active_op_status=True):
             LOG.debug("Adding network: %s", net.uuid)
             nets.append(self._make_net_dict(str(net.uuid), net.name,
                                             None, net.op_status))
@@ -136,10 +137,14 @@ class OVSQuantumPluginBase(QuantumPluginBase):
 
     def get_all_ports(self, tenant_id, net_id, **kwargs):
         db.validate_network_ownership(tenant_id, net_id)
-        ports = db.port_list(net_id)
-        # This plugin does not perform filtering at the moment
+        ports = db.port_list(net_id, kwargs.get('filter_opts'),
+                             active_op_status=True)
         return [{'port-id': str(port.uuid)} for port in ports]
 
+    def get_all_ports_details(self, tenant_id, net_id):
+        db.validate_network_ownership(tenant_id, net_id)
+        return [self._make_port_dict(port) for port in db.port_list(net_id)]
+
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
         LOG.debug("Creating port with network_id: %s", net_id)
         port = db.port_create(net_id, port_state,
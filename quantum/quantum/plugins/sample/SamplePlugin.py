@@ -177,12 +177,8 @@ class FakePlugin(object):
         the specified tenant.
         """
         LOG.debug("FakePlugin.get_all_networks() called")
-        filter_opts = kwargs.get('filter_opts', None)
-        if not filter_opts is None and len(filter_opts) > 0:
-            LOG.debug("filtering options were passed to the plugin"
-                      "but the Fake plugin does not support them")
         nets = []
-        for net in db.network_list(tenant_id):
+        for net in db.network_list(tenant_id, kwargs.get('filter_opts')):
             net_item = {'net-id': str(net.uuid),
                         'net-name': net.name,
                         'net-op-status': net.op_status}
@@ -248,12 +244,8 @@ class FakePlugin(object):
         """
         LOG.debug("FakePlugin.get_all_ports() called")
         db.validate_network_ownership(tenant_id, net_id)
-        filter_opts = kwargs.get('filter_opts')
-        if filter_opts:
-            LOG.debug("filtering options were passed to the plugin"
-                      "but the Fake plugin does not support them")
         port_ids = []
-        ports = db.port_list(net_id)
+        ports = db.port_list(net_id, kwargs.get('filter_opts'))
         for x in ports:
             d = {'port-id': str(x.uuid)}
             port_ids.append(d)
@@ -271,6 +263,19 @@ class FakePlugin(object):
                 'port-state': port.state,
                 'port-op-status': port.op_status}
 
+    def get_all_ports_details(self, tenant_id, net_id):
+        """
+        Retrieves the details of all the ports belonging to the
+        specified Virtual Network.
+        """
+        LOG.debug("FakePlugin.get_all_ports_details() called")
+        db.validate_network_ownership(tenant_id, net_id)
+        return [{'port-id': str(port.uuid),
+                 'attachment': port.interface_id,
+                 'port-state': port.state,
+                 'port-op-status': port.op_status}
+                for port in db.port_list(net_id)]
+
     def create_port(self, tenant_id, net_id, port_state=None, **kwargs):
         """
         Creates a port on the specified Virtual Network.
@@ -19,35 +19,252 @@
 Policy engine for quantum.  Largely copied from nova.
 """
 
-import os.path
+import json
+import logging
+import os
+import urllib
+import urllib2
 
 from quantum.common import exceptions
 from quantum.common.utils import find_config_file
 from quantum.openstack.common import policy
 
 
+LOG = logging.getLogger(__name__)
+
 _POLICY_PATH = None
+_POLICY_MTIME = None
+_RULES = None
 
 
 def reset():
     global _POLICY_PATH
+    global _POLICY_MTIME
+    global _RULES
     _POLICY_PATH = None
+    _POLICY_MTIME = None
+    _RULES = None
     policy.reset()
 
 
 def init():
+    """Loads policy.json, unless it is unchanged since it was last loaded"""
     global _POLICY_PATH
+    global _POLICY_MTIME
     if not _POLICY_PATH:
         _POLICY_PATH = find_config_file({}, 'policy.json')
         if not _POLICY_PATH:
-            raise exceptions.PolicyNotFound(path=FLAGS.policy_file)
-    with open(_POLICY_PATH) as f:
-        _set_brain(f.read())
+            raise exceptions.PolicyNotFound(path='policy.json')
+    mtime = os.path.getmtime(_POLICY_PATH)
+    if mtime != _POLICY_MTIME or _RULES is None:
+        LOG.debug(_("Loading policy from %s") % _POLICY_PATH)
+        with open(_POLICY_PATH) as f:
+            _set_brain(f.read())
+        _POLICY_MTIME = mtime
 
 
 def _set_brain(data):
+    global _RULES
     default_rule = 'default'
     policy.set_brain(policy.HttpBrain.load_json(data, default_rule))
+    _RULES = _Rules(json.loads(data), default_rule)
+
+
+class _Check(object):
+    """A compiled policy rule, or part of one.
+
+    Calling a check with a target and credentials dict evaluates it like
+    policy.Brain.check() would. bind() evaluates whatever only depends on
+    the credentials, and returns True or False if that settles the check,
+    or else a callable that only takes the target.
+
+    """
+
+    def __call__(self, target, creds):
+        raise NotImplementedError()
+
+    def bind(self, creds):
+        return lambda target: self(target, creds)
+
+
+class _ConstCheck(_Check):
+
+    def __init__(self, result):
+        self.result = result
+
+    def __call__(self, target, creds):
+        return self.result
+
+    def bind(self, creds):
+        return self.result
+
+
+class _AndCheck(_Check):
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def __call__(self, target, creds):
+        for check in self.checks:
+            if not check(target, creds):
+                return False
+        return True
+
+    def bind(self, creds):
+        bound = []
+        for check in self.checks:
+            result = check.bind(creds)
+            if result is False:
+                return False
+            if result is not True:
+                bound.append(result)
+        if not bound:
+            return True
+        return lambda target: all(check(target) for check in bound)
+
+
+class _OrCheck(_Check):
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def __call__(self, target, creds):
+        for check in self.checks:
+            if check(target, creds):
+                return True
+        return False
+
+    def bind(self, creds):
+        bound = []
+        for check in self.checks:
+            result = check.bind(creds)
+            if result is True:
+                return True
+            if result is not False:
+                bound.append(result)
+        if not bound:
+            return False
+        return lambda target: any(check(target) for check in bound)
+
+
+class _RoleCheck(_Check):
+
+    def __init__(self, role):
+        self.role = role.lower()
+
+    def __call__(self, target, creds):
+        return self.role in [x.lower() for x in creds['roles']]
+
+    def bind(self, creds):
+        return self(None, creds)
+
+
+class _GenericCheck(_Check):
+    """Matches a credential against a value, possibly from the target"""
+
+    def __init__(self, match):
+        self.match = match
+        key = match.split(':', 1)[0]
+        # Matches without a substitution in their key can tell from the
+        # credentials alone when they cannot succeed
+        self.key = '%' not in key and key or None
+
+    def __call__(self, target, creds):
+        key, value = (self.match % target).split(':', 1)
+        if key in creds:
+            return value == creds[key]
+        return False
+
+    def bind(self, creds):
+        if self.key is not None and self.key not in creds:
+            return False
+        if '%' not in self.match:
+            # Formatting with an empty target leaves the match as it is
+            return self({}, creds)
+        return super(_GenericCheck, self).bind(creds)
+
+
+class _HttpCheck(_Check):
+    """Asks a remote server, like policy.HttpBrain does"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def __call__(self, target, creds):
+        url = self.url % target
+        data = {'target': json.dumps(target),
+                'credentials': json.dumps(creds)}
+        f = urllib2.urlopen(url, urllib.urlencode(data))
+        return f.read() == "True"
+
+
+class _RuleCheck(_Check):
+    """Refers to a named rule, resolved when it is first evaluated"""
+
+    def __init__(self, rules, name):
+        self.rules = rules
+        self.name = name
+
+    def __call__(self, target, creds):
+        return self.rules.get(self.name)(target, creds)
+
+    def bind(self, creds):
+        return self.rules.get(self.name).bind(creds)
+
+
+class _Rules(object):
+    """The rules of policy.json, each compiled into a tree of checks"""
+
+    def __init__(self, rules, default_rule=None):
+        self.rules = rules
+        self.default_rule = default_rule
+        self._compiled = {}
+
+    def get(self, name):
+        """Returns the compiled check for the named rule"""
+        try:
+            return self._compiled[name]
+        except KeyError:
+            pass
+        if name in self.rules:
+            check = self._compile(self.rules[name])
+        elif self.default_rule and name != self.default_rule:
+            check = _RuleCheck(self, self.default_rule)
+        else:
+            check = _ConstCheck(False)
+        self._compiled[name] = check
+        return check
+
+    def _compile(self, match_list):
+        if not match_list:
+            return _ConstCheck(True)
+        or_checks = []
+        for and_list in match_list:
+            if isinstance(and_list, basestring):
+                and_list = (and_list,)
+            and_checks = [self._compile_match(match) for match in and_list]
+            if len(and_checks) == 1:
+                or_checks.append(and_checks[0])
+            else:
+                or_checks.append(_AndCheck(and_checks))
+        if len(or_checks) == 1:
+            return or_checks[0]
+        return _OrCheck(or_checks)
+
+    def _compile_match(self, match):
+        try:
+            kind, value = match.split(':', 1)
+        except Exception:
+            LOG.exception(_("Failed to understand rule %(match)r") % locals())
+            # If the rule is invalid, fail closed
+            return _ConstCheck(False)
+        if kind == 'rule':
+            return _RuleCheck(self, value)
+        if kind == 'role':
+            return _RoleCheck(value)
+        if kind == 'http':
+            return _HttpCheck(value)
+        return _GenericCheck(match)
 
 
 def check(context, action, target):
@@ -65,10 +282,9 @@ def check(context, action, target):
 
     init()
 
-    match_list = ('rule:%s' % action,)
     credentials = context.to_dict()
 
-    return policy.enforce(match_list, target, credentials)
+    return _RULES.get(action)(target, credentials)
 
 
 def enforce(context, action, target):
@@ -84,10 +300,28 @@ def enforce(context, action, target):
     :raises quantum.exceptions.PolicyNotAllowed: if verification fails.
     """
 
-    init()
+    if not check(context, action, target):
+        raise exceptions.PolicyNotAuthorized(action=action)
 
-    match_list = ('rule:%s' % action,)
-    credentials = context.to_dict()
 
-    policy.enforce(match_list, target, credentials,
-                   exceptions.PolicyNotAuthorized, action=action)
+def filter(context, action, objects):
+    """Returns the objects on which the action is valid in this context.
+
+    The parts of the policy that only depend on the context are evaluated
+    once, rather than once per object.
+
+    :param context: quantum context
+    :param action: string representing the action to be checked
+    :param objects: list of dictionaries representing the objects
+
+    :return: Returns the list of objects for which access is permitted.
+    """
+
+    init()
+
+    bound = _RULES.get(action).bind(context.to_dict())
+    if bound is True:
+        return list(objects)
+    if bound is False:
+        return []
+    return [obj for obj in objects if bound(obj)]
@@ -40,7 +40,9 @@ class QuantumPluginBase(object):
             are being retrieved by this method
         :param **kwargs: options to be passed to the plugin. The following
             keywork based-options can be specified:
-            filter_opts - options for filtering network list
+            filter_opts - options for filtering network list. The plugin
+                removes from filter_opts the filters it applied, the
+                API applies the others.
         :returns: a list of mapping sequences with the following signature:
                      [ {'net-id': uuid that uniquely identifies
                                       the particular quantum network,
@@ -134,7 +136,9 @@ class QuantumPluginBase(object):
             about to be retrieved
         :param **kwargs: options to be passed to the plugin. The following
             keywork based-options can be specified:
-            filter_opts - options for filtering network list
+            filter_opts - options for filtering port list. The plugin
+                removes from filter_opts the filters it applied, the
+                API applies the others.
         :returns: a list of mapping sequences with the following signature:
                      [ {'port-id': uuid representing a particular port
                                     on the specified quantum network
@@ -215,6 +219,20 @@ class QuantumPluginBase(object):
         """
         pass
 
+    def get_all_ports_details(self, tenant_id, net_id):
+        """
+        Retrieves the details of all the ports of the specified Virtual
+        Network, as get_port_details would return them. Plugins should
+        override this default, which calls get_port_details for every
+        port.
+
+        :returns: a list of mapping sequences with the signature of the
+            value returned by get_port_details
+        :raises: exception.NetworkNotFound
+        """
+        return [self.get_port_details(tenant_id, net_id, port['port-id'])
+                for port in self.get_all_ports(tenant_id, net_id)]
+
     @abstractmethod
     def plug_interface(self, tenant_id, net_id, port_id, remote_interface_id):
         """
@@ -19,6 +19,12 @@ v2 Quantum Plug-in API specification.
 
 QuantumPluginBase provides the definition of minimum set of
 methods that needs to be implemented by a v2 Quantum Plug-in.
+
+A plug-in class that sorts and pages collections itself sets its
+__native_pagination_support attribute to True. Its get_networks,
+get_subnets and get_ports methods then also receive sorts, a list of
+(key, ascending) tuples ending with the id, and limit, marker and
+page_reverse. The API sorts and pages the collections of other plug-ins.
 """
 
 from abc import ABCMeta, abstractmethod
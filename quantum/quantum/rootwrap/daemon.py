@@ -0,0 +1,175 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-lived rootwrap.
+
+quantum-rootwrap-daemon is started once, through sudo, by an agent whose
+root_helper_daemon option is set. It loads the rootwrap filters once, and
+runs the commands the agent sends it over a UNIX socket if they match one
+of the filters. The socket is created in a directory of the daemon's own,
+whose path is written to stdout as "ready <socket path>". Requests and
+replies are JSON documents, one per line:
+
+  {"cmd": [...], "process_input": "..."}
+  {"returncode": 0, "stdout": "...", "stderr": "..."}
+
+Output is passed as latin-1 so that any bytes make it through JSON.
+"""
+
+import json
+import os
+import shutil
+import SocketServer
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+from quantum.rootwrap import wrapper
+
+
+# Same exit codes as nova-rootwrap
+RC_UNAUTHORIZED = 99
+RC_NOEXECFOUND = 96
+
+# Python 2 does not define it, but Linux has used that value since 2.2
+SO_PEERCRED = getattr(socket, "SO_PEERCRED",
+                      sys.platform.startswith("linux") and 17 or None)
+
+
+def run_command(filters, cmd, process_input=None):
+    """Runs a command if it matches one of the filters.
+
+    Returns its exit code, stdout and stderr.
+    """
+    filtermatch = wrapper.match_filter(filters, cmd)
+    if not filtermatch:
+        return RC_UNAUTHORIZED, "", "Unauthorized command: %s" % " ".join(cmd)
+    command = filtermatch.get_command(cmd)
+    try:
+        obj = subprocess.Popen(command, shell=False, close_fds=True,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               env=filtermatch.get_environment(cmd))
+    except OSError:
+        return RC_NOEXECFOUND, "", "Executable not found: %s" % command[0]
+    stdout, stderr = obj.communicate(process_input)
+    return obj.returncode, stdout, stderr
+
+
+class _RequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        if not self.server.allowed_peer(self.request):
+            return
+        for line in iter(self.rfile.readline, ""):
+            request = json.loads(line)
+            process_input = request.get("process_input")
+            if process_input is not None:
+                process_input = process_input.encode("latin-1")
+            returncode, stdout, stderr = run_command(
+                self.server.filters, [str(arg) for arg in request["cmd"]],
+                process_input)
+            self.wfile.write(json.dumps({
+                "returncode": returncode,
+                "stdout": stdout.decode("latin-1"),
+                "stderr": stderr.decode("latin-1")}) + "\n")
+            self.wfile.flush()
+
+
+class RootwrapServer(SocketServer.ThreadingUnixStreamServer):
+    """Serves the requests of the processes of one user.
+
+    The socket is only accessible to that user, and connections from
+    other users, or whose credentials cannot be checked, are dropped.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, filters, owner_uid):
+        self.filters = wrapper.FilterIndex(filters)
+        self.owner_uid = owner_uid
+        SocketServer.ThreadingUnixStreamServer.__init__(self, socket_path,
+                                                        _RequestHandler)
+
+    def server_bind(self):
+        # The socket is created with its final mode instead of being
+        # chmod'ed by path afterwards
+        old_umask = os.umask(0177)
+        try:
+            SocketServer.ThreadingUnixStreamServer.server_bind(self)
+        finally:
+            os.umask(old_umask)
+        if os.getuid() != self.owner_uid:
+            # Giving the socket away by path is only safe if nobody else
+            # can replace it in the meantime
+            dir_stat = os.lstat(os.path.dirname(self.server_address))
+            if (dir_stat.st_uid != os.getuid() or
+                    dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+                raise RuntimeError("%s must be in a directory only writable "
+                                   "by uid %d" % (self.server_address,
+                                                  os.getuid()))
+            os.lchown(self.server_address, self.owner_uid, -1)
+
+    def allowed_peer(self, sock):
+        if SO_PEERCRED is None:
+            return False
+        try:
+            # struct ucred {pid_t pid; uid_t uid; gid_t gid;}
+            creds = sock.getsockopt(socket.SOL_SOCKET, SO_PEERCRED,
+                                    struct.calcsize("3i"))
+        except socket.error:
+            return False
+        uid = struct.unpack("3i", creds)[1]
+        return uid in (self.owner_uid, 0)
+
+
+def main():
+    """quantum-rootwrap-daemon
+
+    Serves until its stdin is closed, i.e. until the agent that started
+    it exits.
+    """
+    if len(sys.argv) != 1:
+        print "usage: %s" % os.path.basename(sys.argv[0])
+        sys.exit(1)
+    owner_uid = int(os.environ.get("SUDO_UID", os.getuid()))
+
+    socket_dir = tempfile.mkdtemp(prefix="quantum-rootwrap-")
+    try:
+        # The owner only needs to reach the socket in there
+        os.chmod(socket_dir, 0711)
+        socket_path = os.path.join(socket_dir, "rootwrap.sock")
+        server = RootwrapServer(socket_path, wrapper.load_filters(),
+                                owner_uid)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        sys.stdout.write("ready %s\n" % socket_path)
+        sys.stdout.flush()
+        try:
+            sys.stdin.read()
+        finally:
+            server.shutdown()
+            server.server_close()
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
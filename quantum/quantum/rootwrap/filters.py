@@ -28,6 +28,10 @@ class CommandFilter(object):
         self.run_as = run_as
         self.args = args
 
+    def get_exec_name(self):
+        """Returns the command a match requires, None if it may vary"""
+        return os.path.basename(self.exec_path)
+
     def match(self, userargs):
         """Only check that the first argument (command) matches exec_path"""
         return os.path.basename(self.exec_path) == userargs[0]
@@ -47,30 +51,39 @@ class CommandFilter(object):
 class RegExpFilter(CommandFilter):
     """Command filter doing regexp matching for every argument"""
 
+    def __init__(self, exec_path, run_as, *args):
+        super(RegExpFilter, self).__init__(exec_path, run_as, *args)
+        # Compile each pattern once, anchoring it explicitly at end of string
+        try:
+            self.regexps = [re.compile(pattern + '$') for pattern in args]
+        except re.error:
+            # Badly-formed filter, never matches
+            self.regexps = None
+
+    def get_exec_name(self):
+        if self.args and not set(self.args[0]) & set('.^$*+?{}[]\\|()'):
+            return self.args[0]
+        return None
+
     def match(self, userargs):
         # Early skip if command or number of args don't match
-        if (len(self.args) != len(userargs)):
-            # DENY: argument numbers don't match
+        if self.regexps is None or len(self.regexps) != len(userargs):
+            # DENY: argument numbers don't match, or badly-formed filter
             return False
-        # Compare each arg (anchoring pattern explicitly at end of string)
-        for (pattern, arg) in zip(self.args, userargs):
-            try:
-                if not re.match(pattern + '$', arg):
-                    break
-            except re.error:
-                # DENY: Badly-formed filter
+        for (regexp, arg) in zip(self.regexps, userargs):
+            if not regexp.match(arg):
+                # DENY: Some arguments did not match
                 return False
-        else:
-            # ALLOW: All arguments matched
-            return True
-
-        # DENY: Some arguments did not match
-        return False
+        # ALLOW: All arguments matched
+        return True
 
 
 class DnsmasqFilter(CommandFilter):
     """Specific filter for the dnsmasq call (which includes env)"""
 
+    def get_exec_name(self):
+        return None
+
     def match(self, userargs):
         if ((userargs[0].startswith("FLAGFILE=") and
              userargs[1].startswith("NETWORK_ID=") and
@@ -97,6 +110,9 @@ class KillFilter(CommandFilter):
        executable, so it will only work on procfs-capable systems (not OSX).
     """
 
+    def get_exec_name(self):
+        return "kill"
+
     def match(self, userargs):
         if userargs[0] != "kill":
             return False
@@ -130,6 +146,9 @@ class ReadFileFilter(CommandFilter):
         self.file_path = file_path
         super(ReadFileFilter, self).__init__("/bin/cat", "root", *args)
 
+    def get_exec_name(self):
+        return "cat"
+
     def match(self, userargs):
         if userargs[0] != 'cat':
             return False
@@ -29,6 +29,11 @@ filterlist = [
     filters.CommandFilter("/usr/bin/ovs-ofctl", "root"),
     filters.CommandFilter("/bin/ovs-ofctl", "root"),
 
+    # quantum/agent/linux/ovsdb_monitor.py:
+    #   "ovsdb-client", "monitor", table, columns, "--format=json"
+    filters.CommandFilter("/usr/bin/ovsdb-client", "root"),
+    filters.CommandFilter("/bin/ovsdb-client", "root"),
+
     # quantum/plugins/openvswitch/agent/ovs_quantum_agent.py:
     #   "xe", "vif-param-get", ...
     filters.CommandFilter("/usr/bin/xe", "root"),
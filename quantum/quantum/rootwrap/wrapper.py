@@ -41,18 +41,57 @@ def load_filters():
     return filters
 
 
+class FilterIndex(object):
+    """Filters indexed by the command they match.
+
+    Matching a command only tries the filters for that command, and those
+    that may match any command, in the order they were loaded. The
+    executables found are remembered.
+    """
+
+    def __init__(self, filters):
+        self.filters = list(filters)
+        self._any_command = [f for f in self.filters
+                             if f.get_exec_name() is None]
+        self._by_command = {}
+        for f in self.filters:
+            name = f.get_exec_name()
+            if name is not None and name not in self._by_command:
+                self._by_command[name] = [
+                    g for g in self.filters
+                    if g.get_exec_name() in (name, None)]
+        self._executables = set()
+
+    def candidates(self, userargs):
+        if not userargs:
+            return []
+        return self._by_command.get(userargs[0], self._any_command)
+
+    def is_executable(self, exec_path):
+        if exec_path in self._executables:
+            return True
+        if os.access(exec_path, os.X_OK):
+            self._executables.add(exec_path)
+            return True
+        return False
+
+
 def match_filter(filters, userargs):
     """
     Checks user command and arguments through command filters and
     returns the first matching filter, or None is none matched.
+    filters is a FilterIndex, or a list of filters.
     """
 
+    if not isinstance(filters, FilterIndex):
+        filters = FilterIndex(filters)
+
     found_filter = None
 
-    for f in filters:
+    for f in filters.candidates(userargs):
         if f.match(userargs):
             # Try other filters if executable is absent
-            if not os.access(f.exec_path, os.X_OK):
+            if not filters.is_executable(f.exec_path):
                 if not found_filter:
                     found_filter = f
                 continue
@@ -18,6 +18,8 @@
 import logging
 
 from quantum.common import config
+from quantum.db import api as db
+from quantum import manager
 from quantum.openstack.common import cfg
 from quantum import wsgi
 
@@ -90,6 +92,28 @@ def _run_wsgi(app_name):
     if not app:
         LOG.error(_('No known API applications configured.'))
         return
+    if cfg.CONF.api_workers:
+        # The workers must open their own database connections, the ones
+        # opened while loading the plugin would be shared between them.
+        # This process does not use the database afterwards, so the
+        # workers it respawns later do not share any either.
+        db.dispose_engines()
     server = wsgi.Server("Quantum")
-    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host)
+    server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host,
+                 workers=cfg.CONF.api_workers,
+                 loader=lambda: _reload_wsgi_app(app_name))
     return server
+
+
+def _reload_wsgi_app(app_name):
+    """
+    Reads the configuration again and loads the application and its plugin
+    with it, for the workers to be restarted with. The options the server
+    listens with, e.g. bind_port, and the logging options keep the values
+    it started with.
+    """
+    config.reload_config()
+    manager.QuantumManager._instance = None
+    app = config.load_paste_app(app_name)
+    db.dispose_engines()
+    return app
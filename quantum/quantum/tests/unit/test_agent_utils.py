@@ -15,9 +15,18 @@
 #    under the License.
 # @author: Dan Wendlandt, Nicira, Inc.
 
+import os
+import shutil
+import socket
+import stat
+import struct
+import tempfile
+import threading
 import unittest
 
 from quantum.agent.linux import utils
+from quantum.rootwrap import daemon
+from quantum.rootwrap import filters
 
 
 class AgentUtilsExecuteTest(unittest.TestCase):
@@ -52,3 +61,142 @@ class AgentUtilsExecuteTest(unittest.TestCase):
         result = utils.execute(["cat"], process_input="%s\n" %
                                self.test_file[:-1])
         self.assertEqual(result, "%s\n" % self.test_file[:-1])
+
+
+class FakeDaemonClient(utils.RootHelperDaemonClient):
+    """Talks to a server running in this process instead of forking one"""
+
+    def __init__(self, server):
+        utils.RootHelperDaemonClient.__init__(self, "sudo")
+        self.server = server
+
+    def _start_daemon(self):
+        return self.server.server_address
+
+
+class RootHelperDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = daemon.RootwrapServer(
+            os.path.join(self.tmpdir, "rootwrap.sock"),
+            [filters.CommandFilter("/bin/cat", "root"),
+             filters.CommandFilter("/bin/ls", "root")],
+            os.getuid())
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        utils._root_helper_daemon = FakeDaemonClient(self.server)
+
+    def tearDown(self):
+        utils._root_helper_daemon.stop()
+        utils._root_helper_daemon = None
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_process_input(self):
+        data = "".join(chr(i) for i in range(256))
+        for i in range(3):
+            self.assertEqual(utils.execute(["cat"], root_helper="sudo",
+                                           process_input=data), data)
+
+    def test_check_exit_code(self):
+        missing = os.path.join(self.tmpdir, "missing")
+        stdout, stderr = utils.execute(["ls", missing], root_helper="sudo",
+                                       check_exit_code=False,
+                                       return_stderr=True)
+        self.assertEqual(stdout, "")
+        self.assertTrue(missing in stderr)
+        self.assertRaises(RuntimeError, utils.execute, ["ls", missing],
+                          root_helper="sudo")
+
+    def test_unauthorized_command(self):
+        self.assertRaises(RuntimeError, utils.execute, ["rm", self.tmpdir],
+                          root_helper="sudo")
+        self.assertTrue(os.path.exists(self.tmpdir))
+
+    def test_without_helper(self):
+        # Commands without a root_helper are still forked
+        result = utils.execute(["echo", "foo"])
+        self.assertEqual(result, "foo\n")
+
+    def test_reconnect(self):
+        utils.execute(["ls", self.tmpdir], root_helper="sudo")
+        utils._root_helper_daemon._sock.close()
+        result = utils.execute(["ls", self.tmpdir], root_helper="sudo")
+        self.assertEqual(result, "rootwrap.sock\n")
+
+
+class FakePeer(object):
+    def __init__(self, uid=None):
+        self.uid = uid
+        self.optnames = []
+
+    def getsockopt(self, level, optname, buflen):
+        self.optnames.append(optname)
+        if self.uid is None:
+            raise socket.error("Protocol not available")
+        return struct.pack("3i", 1234, self.uid, self.uid)
+
+
+class RootwrapServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, "rootwrap.sock")
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def _server(self, owner_uid):
+        server = daemon.RootwrapServer(self.socket_path, [], owner_uid)
+        self.servers.append(server)
+        return server
+
+    def test_socket_mode(self):
+        self._server(os.getuid())
+        mode = os.lstat(self.socket_path).st_mode
+        self.assertTrue(stat.S_ISSOCK(mode))
+        self.assertEqual(stat.S_IMODE(mode), 0600)
+
+    def test_shared_socket_dir(self):
+        os.chmod(self.tmpdir, 0777)
+        self.assertRaises(RuntimeError, self._server, os.getuid() + 1)
+
+    def test_allowed_peer(self):
+        server = self._server(os.getuid())
+        client, peer = socket.socketpair()
+        try:
+            self.assertTrue(server.allowed_peer(peer))
+        finally:
+            client.close()
+            peer.close()
+
+    def test_rejected_peer(self):
+        server = self._server(4242)
+        self.assertTrue(server.allowed_peer(FakePeer(4242)))
+        self.assertTrue(server.allowed_peer(FakePeer(0)))
+        peer = FakePeer(4343)
+        self.assertFalse(server.allowed_peer(peer))
+        self.assertEqual(peer.optnames, [daemon.SO_PEERCRED])
+
+    def test_unknown_peer(self):
+        server = self._server(4242)
+        self.assertFalse(server.allowed_peer(FakePeer()))
+
+
+class RootHelperDaemonStartTest(unittest.TestCase):
+    def test_socket_path(self):
+        client = utils.RootHelperDaemonClient(
+            "sh -c 'echo ready /run/foo/rootwrap.sock; cat'")
+        try:
+            self.assertEqual(client._start_daemon(),
+                             "/run/foo/rootwrap.sock")
+        finally:
+            client.stop()
+
+    def test_failed_start(self):
+        client = utils.RootHelperDaemonClient("sh -c 'echo oops'")
+        self.assertRaises(RuntimeError, client._start_daemon)
@@ -19,6 +19,7 @@
 import unittest
 
 from lxml import etree
+import mock
 from webob import exc
 
 import quantum.api.attachments as atts
@@ -26,6 +27,7 @@ import quantum.api.networks as nets
 import quantum.api.ports as ports
 import quantum.api.versions as versions
 from quantum.common.test_lib import test_config
+from quantum.openstack.common import importutils
 from quantum.openstack.common import jsonutils
 import quantum.tests.unit._test_api as test_api
 import quantum.tests.unit.testlib_api as testlib
@@ -278,6 +280,18 @@ class APIFiltersTest(test_api.AbstractAPITest):
         self.assertEqual(len(network_data['networks']), 1)
         self.assertEqual(network_data['networks'][0]['id'], self.net1_id)
 
+    def test_network_unknown_filter(self):
+        flt = "name=test-1&foo=bar"
+        network_data = self._do_filtered_network_list_request(flt)
+        # Check network count: should return 1
+        self.assertEqual(len(network_data['networks']), 1)
+        self.assertEqual(network_data['networks'][0]['id'], self.net1_id)
+
+        flt = "foo=bar"
+        network_data = self._do_filtered_network_list_request(flt)
+        # Check network count: should return 2
+        self.assertEqual(len(network_data['networks']), 2)
+
     def test_port_state_filter(self):
         # First filter for 'ACTIVE' ports in 1st network
         flt = "state=ACTIVE"
@@ -343,6 +357,36 @@ class APIFiltersTest(test_api.AbstractAPITest):
         # Check port count: should return 2
         self.assertEqual(len(port_data['ports']), 2)
 
+    def test_port_unknown_filter(self):
+        flt = "state=DOWN&foo=bar"
+        port_data = self._do_filtered_port_list_request(flt, self.net1_id)
+        # Check port count: should return 1
+        self.assertEqual(len(port_data['ports']), 1)
+        self.assertEqual(port_data['ports'][0]['id'], self.port12_id)
+
+    def test_port_details_fetched_per_network(self):
+        plugin_klass = importutils.import_class(test_config['plugin_name'])
+        with mock.patch.object(plugin_klass, 'get_port_details') as details:
+            show_network_req = testlib.show_network_detail_request(
+                self.tenant_id, self.net1_id, self.fmt)
+            show_network_res = show_network_req.get_response(self.api)
+            self.assertEqual(show_network_res.status_int, 200)
+            network_data = (self._net_deserializers[self.content_type].
+                            deserialize(show_network_res.body)['body'])
+            self.assertEqual(sorted(port['id'] for port in
+                                    network_data['network']['ports']),
+                             sorted([self.port11_id, self.port12_id]))
+            list_port_req = testlib.port_list_detail_request(
+                self.tenant_id, self.net2_id, self.fmt)
+            list_port_res = list_port_req.get_response(self.api)
+            self.assertEqual(list_port_res.status_int, 200)
+            port_data = (self._port_deserializers[self.content_type].
+                         deserialize(list_port_res.body)['body'])
+            self.assertEqual(sorted(port['id'] for port in
+                                    port_data['ports']),
+                             sorted([self.port21_id, self.port22_id]))
+            self.assertFalse(details.called)
+
 
 class APIRootTest(unittest.TestCase):
     def setUp(self):
@@ -12,6 +12,7 @@
 #  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #  License for the spec
 
+import json
 import logging
 import os
 import unittest
@@ -22,6 +23,7 @@ import webtest
 
 from webob import exc
 
+from quantum.api.v2 import base
 from quantum.api.v2 import resource as wsgi_resource
 from quantum.api.v2 import router
 from quantum.api.v2 import views
@@ -100,6 +102,43 @@ class V2WsgiResourceTestCase(unittest.TestCase):
         res = resource.get('', extra_environ=environ, expect_errors=True)
         self.assertEqual(res.status_int, exc.HTTPInternalServerError.code)
 
+    def test_json_stream(self):
+        data = {'networks': ({'id': i, 'name': 'net%d' % i}
+                             for i in range(100)),
+                'networks_links': [{'rel': 'next', 'href': 'x'}]}
+        expected = {'networks': [{'id': i, 'name': 'net%d' % i}
+                                 for i in range(100)],
+                    'networks_links': [{'rel': 'next', 'href': 'x'}]}
+        chunks = list(wsgi_resource.json_stream(data, chunk_size=256))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(json.loads(''.join(chunks)), expected)
+        self.assertEqual(json.loads(''.join(
+            wsgi_resource.json_stream({'networks': []}))), {'networks': []})
+
+    def test_list_is_streamed(self):
+        controller = mock.MagicMock()
+        controller.index.return_value = {
+            'networks': ({'id': i} for i in range(3))}
+
+        resource = webtest.TestApp(wsgi_resource.Resource(controller))
+
+        environ = {'wsgiorg.routing_args': (None, {'action': 'index'})}
+        res = resource.get('', extra_environ=environ)
+        self.assertEqual(res.json, {'networks': [{'id': 0}, {'id': 1},
+                                                 {'id': 2}]})
+
+    def test_list_serialized_as_xml(self):
+        controller = mock.MagicMock()
+        controller.index.return_value = {
+            'networks': ({'id': i} for i in range(3))}
+
+        resource = webtest.TestApp(wsgi_resource.Resource(controller))
+
+        environ = {'wsgiorg.routing_args': (None, {'action': 'index',
+                                                   'format': 'xml'})}
+        res = resource.get('', extra_environ=environ)
+        self.assertEqual(res.body.count('<network>'), 3)
+
 
 class ResourceIndexTestCase(unittest.TestCase):
     def test_index_json(self):
@@ -375,6 +414,124 @@ class APIv2TestCase(unittest.TestCase):
                                                       fields=['foo'],
                                                       verbose=True)
 
+    def test_paging_emulated(self):
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = [
+            {'id': str(i), 'name': 'net%d' % (i % 3)} for i in range(6)]
+
+        res = self.api.get(_get_path('networks'), {'sort_key': 'name',
+                                                   'sort_dir': 'desc',
+                                                   'limit': 2,
+                                                   'marker': '2'})
+        instance.get_networks.assert_called_once_with(mock.ANY,
+                                                      filters={},
+                                                      fields=[],
+                                                      verbose=[])
+        self.assertEqual([net['id'] for net in res.json['networks']],
+                         ['5', '1'])
+        links = dict((link['rel'], link['href'])
+                     for link in res.json['networks_links'])
+        self.assertTrue('marker=1' in links['next'])
+        self.assertTrue('marker=5' in links['previous'])
+
+    def test_paging_emulated_with_fields(self):
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = [
+            {'id': str(i), 'name': 'net%d' % i} for i in range(3)]
+
+        res = self.api.get(_get_path('networks'), {'fields': 'name',
+                                                   'limit': 2})
+        instance.get_networks.assert_called_once_with(mock.ANY,
+                                                      filters={},
+                                                      fields=['name', 'id'],
+                                                      verbose=[])
+        self.assertEqual(res.json['networks'],
+                         [{'name': 'net0'}, {'name': 'net1'}])
+
+    def test_paging_bad_limit(self):
+        res = self.api.get(_get_path('networks'), {'limit': 'x'},
+                           expect_errors=True)
+        self.assertEqual(res.status_int, exc.HTTPBadRequest.code)
+
+
+class NativePagingPlugin(object):
+    """Sorts and pages networks itself, paging by name and id"""
+    __native_pagination_support = True
+
+    def __init__(self, networks):
+        self.networks = networks
+        self.calls = 0
+
+    def get_networks(self, context, filters=None, fields=None, verbose=None,
+                     sorts=None, limit=None, marker=None, page_reverse=False):
+        self.calls += 1
+        networks = sorted(self.networks, key=lambda n: (n['name'], n['id']),
+                          reverse=page_reverse)
+        if marker:
+            ids = [n['id'] for n in networks]
+            networks = networks[ids.index(marker) + 1:]
+        if limit:
+            networks = networks[:limit]
+        if page_reverse:
+            networks.reverse()
+        return networks
+
+
+class NativePagingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        args = ['--config-file', etcdir('quantum.conf.test')]
+        config.parse(args=args)
+        tenants = ['other', 'mine', 'other', 'other', 'mine', 'other',
+                   'mine', 'other', 'other']
+        self.plugin = NativePagingPlugin(
+            [{'id': str(i), 'name': 'net%d' % i, 'tenant_id': tenant_id}
+             for i, tenant_id in enumerate(tenants)])
+        self.controller = base.Controller(
+            self.plugin, 'networks', 'network',
+            router.RESOURCE_ATTRIBUTE_MAP['networks'])
+
+    def tearDown(self):
+        cfg.CONF.reset()
+
+    def _index(self, params):
+        request = wsgi_resource.Request.blank('/networks?%s' % params)
+        request.environ['quantum.context'] = context.Context('', 'mine')
+        result = self.controller.index(request)
+        links = dict((link['rel'], link['href'])
+                     for link in result.get('networks_links', []))
+        return [n['id'] for n in result['networks']], links
+
+    def test_page_holds_limit_visible_items(self):
+        """Items the tenant cannot see are skipped before the page is cut"""
+        ids, links = self._index('sort_key=name&limit=2')
+        self.assertEqual(ids, ['1', '4'])
+        self.assertTrue('marker=4' in links['next'])
+        self.assertFalse('previous' in links)
+        self.assertTrue(self.plugin.calls > 1)
+
+        ids, links = self._index('sort_key=name&limit=2&marker=4')
+        self.assertEqual(ids, ['6'])
+        self.assertFalse('next' in links)
+        self.assertTrue('marker=6' in links['previous'])
+
+    def test_reverse_page_holds_limit_visible_items(self):
+        ids, links = self._index('sort_key=name&limit=2&marker=8'
+                                 '&page_reverse=True')
+        self.assertEqual(ids, ['4', '6'])
+        self.assertTrue('marker=4' in links['previous'])
+        self.assertTrue('marker=6' in links['next'])
+
+        ids, links = self._index('sort_key=name&limit=2&marker=4'
+                                 '&page_reverse=True')
+        self.assertEqual(ids, ['1'])
+        self.assertFalse('previous' in links)
+
+    def test_no_visible_items(self):
+        ids, links = self._index('sort_key=name&limit=2&marker=6')
+        self.assertEqual(ids, [])
+        self.assertEqual(links, {})
+
 
 # Note: since all resources use the same controller and validation
 # logic, we actually get really good coverage from testing just networks.
@@ -22,6 +22,8 @@ that tests the database api method calls
 
 import unittest
 
+import mock
+
 from quantum.db import api as db
 from quantum.tests.unit import database_stubs as db_stubs
 
@@ -125,3 +127,64 @@ class QuantumDBTest(unittest.TestCase):
         self.dbtest.unplug_interface(net1["id"], port1["id"])
         port = self.dbtest.get_port(net1["id"], port1["id"])
         self.assertTrue(port[0]["attachment"] is None)
+
+    def testh_list_filters(self):
+        """test filters applied by the network and port queries"""
+        net1 = db.network_create(self.tenant_id, "net1")
+        net2 = db.network_create(self.tenant_id, "net2")
+        port1 = db.port_create(net1.uuid, state="ACTIVE", op_status="UP")
+        port2 = db.port_create(net1.uuid, state="DOWN", op_status="UP")
+        db.port_set_attachment(port1.uuid, net1.uuid, "vif1")
+
+        def networks(**filter_opts):
+            nets = db.network_list(self.tenant_id, filter_opts,
+                                   active_op_status=True)
+            self.assertEqual(filter_opts, {'unknown': 'x'})
+            return sorted(net.name for net in nets)
+
+        def ports(net_id, active_op_status=True, **filter_opts):
+            port_list = db.port_list(net_id, filter_opts, active_op_status)
+            self.assertEqual(filter_opts, {'unknown': 'x'})
+            return sorted(port.uuid for port in port_list)
+
+        self.assertEqual(networks(name="net2", unknown="x"), ["net2"])
+        self.assertEqual(networks(attachment="vif1", unknown="x"), ["net1"])
+        self.assertEqual(networks(port=port2.uuid, unknown="x"), ["net1"])
+        self.assertEqual(networks(unknown="x", **{'has-attachment': 'False'}),
+                         ["net2"])
+        self.assertEqual(networks(unknown="x", **{'port-state': 'DOWN'}),
+                         ["net1"])
+        self.assertEqual(networks(unknown="x", **{'port-op-status': 'DOWN'}),
+                         ["net1"])
+        self.assertEqual(ports(net1.uuid, state="ACTIVE", unknown="x"),
+                         [port1.uuid])
+        self.assertEqual(ports(net1.uuid, unknown="x",
+                               **{'has-attachment': 'true'}), [port1.uuid])
+        # ports that are not ACTIVE are reported as operationally DOWN
+        self.assertEqual(ports(net1.uuid, unknown="x",
+                               **{'op-status': 'DOWN'}), [port2.uuid])
+        self.assertEqual(ports(net1.uuid, False, unknown="x",
+                               **{'op-status': 'UP'}),
+                         sorted([port1.uuid, port2.uuid]))
+        self.assertEqual(ports(net2.uuid, unknown="x",
+                               **{'op-status': 'UP'}), [])
+
+
+class EngineDisposalTest(unittest.TestCase):
+    """Tests the disposal of the engines before workers are forked"""
+
+    def test_dispose_engines(self):
+        engines = [mock.Mock(), mock.Mock()]
+        with mock.patch.object(db, '_ENGINES', set()):
+            for engine in engines:
+                db.register_engine(engine)
+            db.dispose_engines()
+        for engine in engines:
+            engine.dispose.assert_called_once_with()
+
+    def test_configured_engine_is_registered(self):
+        db.configure_db({'sql_connection': 'sqlite:///:memory:'})
+        try:
+            self.assertTrue(db._ENGINE in db._ENGINES)
+        finally:
+            db.clear_db()
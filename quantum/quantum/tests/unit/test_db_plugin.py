@@ -19,6 +19,8 @@ import mock
 import os
 import unittest
 
+from sqlalchemy import event
+
 import quantum
 from quantum.api.v2.router import APIRouter
 from quantum.common import config
@@ -71,11 +73,14 @@ class QuantumDbPluginV2TestCase(unittest.TestCase):
         db._MAKER = None
         cfg.CONF.reset()
 
-    def _req(self, method, resource, data=None, fmt='json', id=None):
+    def _req(self, method, resource, data=None, fmt='json', id=None,
+             params=None):
         if id:
             path = '/%(resource)s/%(id)s.%(fmt)s' % locals()
         else:
             path = '/%(resource)s.%(fmt)s' % locals()
+        if params:
+            path = '%s?%s' % (path, params)
         content_type = 'application/%s' % fmt
         body = None
         if data:
@@ -85,8 +90,8 @@ class QuantumDbPluginV2TestCase(unittest.TestCase):
     def new_create_request(self, resource, data, fmt='json'):
         return self._req('POST', resource, data, fmt)
 
-    def new_list_request(self, resource, fmt='json'):
-        return self._req('GET', resource, None, fmt)
+    def new_list_request(self, resource, fmt='json', params=None):
+        return self._req('GET', resource, None, fmt, params=params)
 
     def new_show_request(self, resource, id, fmt='json'):
         return self._req('GET', resource, None, fmt, id=id)
@@ -145,6 +150,30 @@ class QuantumDbPluginV2TestCase(unittest.TestCase):
         req = self.new_delete_request(collection, id)
         req.get_response(self.api)
 
+    @contextlib.contextmanager
+    def count_queries(self):
+        """Collects the SQL statements run against the plugin database"""
+        statements = []
+        collecting = [True]
+
+        def _collect(conn, cursor, statement, *args):
+            if collecting[0]:
+                statements.append(statement)
+
+        # NOTE: SQLAlchemy 0.7 cannot remove engine listeners, but every
+        #       test has an engine of its own
+        event.listen(db._ENGINE, 'before_cursor_execute', _collect)
+        try:
+            yield statements
+        finally:
+            collecting[0] = False
+
+    def _list_query_count(self, resource, params=None):
+        with self.count_queries() as statements:
+            req = self.new_list_request(resource, params=params)
+            self.assertEquals(req.get_response(self.api).status_int, 200)
+        return len(statements)
+
     @contextlib.contextmanager
     def network(self, name='net1', admin_status_up=True, fmt='json'):
         res = self._create_network(fmt, name, admin_status_up)
@@ -231,6 +260,12 @@ class TestPortsV2(QuantumDbPluginV2TestCase):
             self.assertTrue(port1['port']['id'] in ids)
             self.assertTrue(port2['port']['id'] in ids)
 
+    def test_list_ports_query_count(self):
+        with self.port():
+            count = self._list_query_count('ports')
+            with contextlib.nested(self.port(), self.port()):
+                self.assertEquals(self._list_query_count('ports'), count)
+
     def test_show_port(self):
         with self.port() as port:
             req = self.new_show_request('ports', port['port']['id'], 'json')
@@ -317,6 +352,93 @@ class TestNetworksV2(QuantumDbPluginV2TestCase):
                 self.assertEquals(res['networks'][1]['name'],
                                   net2['network']['name'])
 
+    def test_list_networks_with_sort(self):
+        with contextlib.nested(self.network(name='net1'),
+                               self.network(name='net3'),
+                               self.network(name='net2')):
+            req = self.new_list_request('networks',
+                                        params='sort_key=name&sort_dir=desc')
+            res = self.deserialize('json', req.get_response(self.api))
+            self.assertEquals([n['name'] for n in res['networks']],
+                              ['net3', 'net2', 'net1'])
+
+    def test_list_networks_with_pagination(self):
+        with contextlib.nested(self.network(name='net1'),
+                               self.network(name='net2'),
+                               self.network(name='net3')):
+            names = []
+            params = 'sort_key=name&limit=2'
+            while params:
+                req = self.new_list_request('networks', params=params)
+                res = self.deserialize('json', req.get_response(self.api))
+                names.append([n['name'] for n in res['networks']])
+                links = dict((link['rel'], link['href'])
+                             for link in res.get('networks_links', []))
+                params = links.get('next', '?').split('?', 1)[1]
+            self.assertEquals(names, [['net1', 'net2'], ['net3']])
+            self.assertTrue('page_reverse=True' in links['previous'])
+
+            params = links['previous'].split('?', 1)[1]
+            req = self.new_list_request('networks', params=params)
+            res = self.deserialize('json', req.get_response(self.api))
+            self.assertEquals([n['name'] for n in res['networks']],
+                              ['net1', 'net2'])
+            self.assertEquals([link['rel'] for link in res['networks_links']],
+                              ['next'])
+
+    def _list_pages(self, params, rel='next'):
+        """Follows the next or previous links, returning each page's names"""
+        pages = []
+        while params:
+            req = self.new_list_request('networks', params=params)
+            res = self.deserialize('json', req.get_response(self.api))
+            pages.append([n['name'] for n in res['networks']])
+            links = dict((link['rel'], link['href'])
+                         for link in res.get('networks_links', []))
+            params = links.get(rel, '?').split('?', 1)[1]
+        return pages
+
+    def test_list_networks_with_pagination_on_nulls(self):
+        ids = []
+        for name in ('b', None, 'a', None):
+            data = {'network': {'name': name, 'tenant_id': self._tenant_id}}
+            req = self.new_create_request('networks', data)
+            res = self.deserialize('json', req.get_response(self.api))
+            ids.append(res['network']['id'])
+        pages = self._list_pages('sort_key=name&limit=1')
+        self.assertEquals(pages, [[None], [None], ['a'], ['b']])
+        pages = self._list_pages('sort_key=name&sort_dir=desc&limit=1')
+        self.assertEquals(pages, [['b'], ['a'], [None], [None]])
+        params = 'sort_key=name&limit=1&page_reverse=True&marker=%s' % ids[0]
+        pages = self._list_pages(params, 'previous')
+        self.assertEquals(pages, [['a'], [None], [None]])
+
+    def test_list_networks_with_bad_marker(self):
+        req = self.new_list_request('networks', params='limit=2&marker=x')
+        res = req.get_response(self.api)
+        self.assertEquals(res.status_int, 400)
+
+    def test_list_networks_with_fields(self):
+        with self.network(name='net1'):
+            req = self.new_list_request('networks',
+                                        params='fields=name&fields=status')
+            res = self.deserialize('json', req.get_response(self.api))
+            self.assertEquals(res['networks'],
+                              [{'name': 'net1', 'status': 'ACTIVE'}])
+
+            req = self.new_list_request('networks',
+                                        params='fields=name&limit=1')
+            res = self.deserialize('json', req.get_response(self.api))
+            self.assertEquals(res['networks'], [{'name': 'net1'}])
+
+    def test_list_networks_query_count(self):
+        with self.subnet():
+            count = self._list_query_count('networks')
+            with contextlib.nested(self.subnet(), self.subnet()):
+                self.assertEquals(self._list_query_count('networks'), count)
+            self.assertEquals(
+                self._list_query_count('networks', 'fields=name'), 1)
+
     def test_show_network(self):
         with self.network(name='net1') as net:
             req = self.new_show_request('networks', net['network']['id'])
@@ -0,0 +1,132 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from sqlalchemy.ext import sqlsoup
+
+from quantum.agent import db_sync
+from quantum.db import api as db
+from quantum.db import models
+
+
+class DbSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        db.configure_db({'sql_connection': 'sqlite:///:memory:'})
+        self.soup = sqlsoup.SqlSoup(db.get_session().bind)
+        self.sync = db_sync.DbSync({'ports': 'uuid'})
+        self.net_id = db.network_create("t1", "net1").uuid
+        self.port_id = db.port_create(self.net_id).uuid
+        reloaded, changed = self.sync.update(self.soup)
+        self.assertTrue(reloaded)
+        self.assertEqual(changed['ports'].keys(), [self.port_id])
+
+    def tearDown(self):
+        self.soup.session.close()
+        db.clear_db()
+
+    def _update(self):
+        reloaded, changed = self.sync.update(self.soup)
+        self.soup.commit()
+        return reloaded, changed
+
+    def test_no_changes(self):
+        self.assertEqual(self._update(), (False, {}))
+
+    def test_changed_rows_are_read(self):
+        other_id = db.port_create(self.net_id).uuid
+        db.port_set_attachment(self.port_id, self.net_id, "vif1")
+        reloaded, changed = self._update()
+        self.assertFalse(reloaded)
+        self.assertEqual(sorted(changed['ports']),
+                         sorted([self.port_id, other_id]))
+        old, new = changed['ports'][self.port_id]
+        self.assertEqual(old.interface_id, None)
+        self.assertEqual(new.interface_id, "vif1")
+        self.assertEqual(changed['ports'][other_id][0], None)
+        self.assertEqual(self.sync.rows['ports'][other_id].state, "DOWN")
+
+    def test_deleted_rows_are_removed(self):
+        db.port_destroy(self.port_id, self.net_id)
+        reloaded, changed = self._update()
+        self.assertEqual(changed['ports'][self.port_id][1], None)
+        self.assertEqual(self.sync.rows['ports'], {})
+
+    def test_update_column(self):
+        self.sync.update_column(self.soup, 'ports', 'op_status',
+                                {self.port_id: "UP"})
+        self.soup.commit()
+        self.assertEqual(db.port_get(self.port_id, self.net_id).op_status,
+                         "UP")
+        self.assertEqual(self.sync.rows['ports'][self.port_id].op_status,
+                         "UP")
+        # The agents' own updates are not changes to read back
+        self.assertEqual(self._update(), (False, {}))
+
+    def test_pruned_changes_cause_a_reload(self):
+        self.sync.last_change = -1
+        db.port_update(self.port_id, self.net_id, state="ACTIVE")
+        reloaded, changed = self._update()
+        self.assertTrue(reloaded)
+        self.assertEqual(self.sync.rows['ports'][self.port_id].state,
+                         "ACTIVE")
+
+    def test_resync(self):
+        self.sync.request_resync()
+        self.assertTrue(self._update()[0])
+
+    def _commit_change(self, change_id, table_name, row_key):
+        db.get_session().bind.execute(models.Change.__table__.insert(),
+                                      id=change_id, table_name=table_name,
+                                      row_key=row_key)
+
+    def _set_port_state(self, state):
+        # Without recording a change
+        db.get_session().bind.execute(
+            models.Port.__table__.update().values(state=state))
+
+    def test_changes_committed_late_are_read(self):
+        last_change = self.sync.last_change
+        self._commit_change(last_change + 2, 'networks', self.net_id)
+        self.assertEqual(self._update(), (False, {}))
+        self._set_port_state("ACTIVE")
+        self._commit_change(last_change + 1, 'ports', self.port_id)
+        reloaded, changed = self._update()
+        self.assertFalse(reloaded)
+        self.assertEqual(changed['ports'].keys(), [self.port_id])
+        self.assertEqual(self.sync.rows['ports'][self.port_id].state,
+                         "ACTIVE")
+        self.assertEqual(self._update(), (False, {}))
+
+    def test_changes_missing_across_a_resync_are_read(self):
+        last_change = self.sync.last_change
+        self._commit_change(last_change + 2, 'networks', self.net_id)
+        self.sync.request_resync()
+        self.assertTrue(self._update()[0])
+        self._set_port_state("ACTIVE")
+        self._commit_change(last_change + 1, 'ports', self.port_id)
+        reloaded, changed = self._update()
+        self.assertFalse(reloaded)
+        self.assertEqual(changed['ports'].keys(), [self.port_id])
+
+    def test_missing_changes_are_given_up(self):
+        self.sync.gap_timeout = 0
+        last_change = self.sync.last_change
+        self._commit_change(last_change + 2, 'networks', self.net_id)
+        self.assertEqual(self._update(), (False, {}))
+        self._commit_change(last_change + 1, 'ports', self.port_id)
+        self.assertEqual(self._update(), (False, {}))
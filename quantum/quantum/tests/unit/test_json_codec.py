@@ -0,0 +1,123 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import json
+import timeit
+import unittest
+
+from quantum.api.v2 import resource
+from quantum.common import json_codec
+from quantum.openstack.common import jsonutils
+
+
+def network(i):
+    return {'id': 'd1f0e6b2-3c4d-4e5f-8a9b-%012d' % i,
+            'name': 'net%d' % i,
+            'tenant_id': 'c7f1e2d3b4a54f6e8d9c0b1a2f3e4d5c',
+            'admin_state_up': True,
+            'status': 'ACTIVE',
+            'subnets': ['e2a0b1c2-d3e4-4f5a-9b8c-%012d' % i],
+            'shared': False}
+
+
+def port(i):
+    return {'id': '8a1e5f4c-2b3d-4a8e-9c2b-%012d' % i,
+            'name': 'port%d' % i,
+            'network_id': 'd1f0e6b2-3c4d-4e5f-8a9b-%012d' % (i / 100),
+            'tenant_id': 'c7f1e2d3b4a54f6e8d9c0b1a2f3e4d5c',
+            'admin_state_up': True,
+            'status': 'ACTIVE',
+            'mac_address': 'fa:16:3e:%02x:%02x:%02x' % (
+                i / 65536, i / 256 % 256, i % 256),
+            'fixed_ips': [
+                {'subnet_id': 'e2a0b1c2-d3e4-4f5a-9b8c-%012d' % (i / 100),
+                 'ip_address': '10.%d.%d.%d' % (
+                     i / 65536, i / 256 % 256, i % 256)}],
+            'device_id': 'f0a1b2c3-d4e5-4f60-8a9b-%012d' % i,
+            'device_owner': 'compute:nova'}
+
+
+class FakeBackend(object):
+    """The json module, returning str for ASCII strings of a str"""
+
+    JSONEncoder = json.JSONEncoder
+
+    class JSONDecoder(json.JSONDecoder):
+        def decode(self, s):
+            if isinstance(s, str):
+                return str(json.JSONDecoder.decode(self, s))
+            return json.JSONDecoder.decode(self, s)
+
+
+class JSONCodecTest(unittest.TestCase):
+
+    def tearDown(self):
+        json_codec.use_backend(json_codec._load_backend())
+
+    def test_same_as_jsonutils(self):
+        values = [{'ports': [port(i) for i in range(3)]},
+                  {'network': network(1)},
+                  {'name': u'caf\xe9', 'created': datetime.datetime(2012, 1,
+                                                                    1)},
+                  (1, 2.5, None, True), "string"]
+        for value in values:
+            self.assertEqual(json_codec.loads(json_codec.dumps(value)),
+                             jsonutils.loads(jsonutils.dumps(value)))
+
+    def test_invalid_input(self):
+        self.assertRaises(ValueError, json_codec.loads, '{"a": ')
+        self.assertRaises(ValueError, json_codec.loads, '"\xff"')
+
+    def test_use_backend(self):
+        json_codec.use_backend(FakeBackend)
+        self.assertTrue(json_codec.backend is FakeBackend)
+        self.assertEqual(json_codec.dumps({'a': [1]}), '{"a": [1]}')
+        self.assertTrue(isinstance(json_codec.loads('"abc"'), unicode))
+
+    def test_json_stream(self):
+        data = {'ports': (port(i) for i in range(100))}
+        self.assertEqual(
+            json_codec.loads(''.join(resource.json_stream(data, 1024))),
+            {'ports': [port(i) for i in range(100)]})
+
+
+def benchmark(number=20):
+    """Prints the time to encode and decode lists of networks and ports
+    with jsonutils and json_codec"""
+    print 'json_codec backend: %s' % json_codec.backend.__name__
+    for name, make, count in (('networks', network, 100),
+                              ('ports', port, 1000),
+                              ('ports', port, 10000)):
+        data = {name: [make(i) for i in range(count)]}
+        encoded = jsonutils.dumps(data)
+        timings = [
+            ('jsonutils.dumps', lambda: jsonutils.dumps(data)),
+            ('json_codec.dumps', lambda: json_codec.dumps(data)),
+            ('jsonutils.dumps per item',
+             lambda: [jsonutils.dumps(item) for item in data[name]]),
+            ('json_codec.dumps per item',
+             lambda: [json_codec.dumps(item) for item in data[name]]),
+            ('jsonutils.loads', lambda: jsonutils.loads(encoded)),
+            ('json_codec.loads', lambda: json_codec.loads(encoded))]
+        for label, func in timings:
+            seconds = timeit.timeit(func, number=number)
+            print '%-26s %6d %-8s %10.2f msec' % (label, count, name,
+                                                  seconds * 1e3 / number)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -15,6 +15,7 @@
 #    under the License.
 # @author: Dan Wendlandt, Nicira, Inc.
 
+import json
 import unittest
 import uuid
 
@@ -217,28 +218,38 @@ class OVS_Lib_Test(unittest.TestCase):
         self.assertEqual(self.br.add_patch_port(pname, peer), ofport)
         self.mox.VerifyAll()
 
+    def _interfaces_json(self, interfaces):
+        return json.dumps({"headings": ["name", "ofport", "external_ids"],
+                           "data": [[name, ofport,
+                                     ["map", sorted(external_ids.items())]]
+                                    for name, ofport, external_ids
+                                    in interfaces]})
+
+    def _expect_port_interfaces(self, port_names, interfaces):
+        utils.execute(["ovs-vsctl", self.TO, "--format=json",
+                       "--columns=name,ofport,external_ids",
+                       "list", "Interface"],
+                      root_helper=self.root_helper).AndReturn(
+                          self._interfaces_json(interfaces))
+        utils.execute(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
+                      root_helper=self.root_helper).AndReturn(
+                          "".join(name + "\n" for name in port_names))
+
     def _test_get_vif_ports(self, is_xen=False):
         pname = "tap99"
         ofport = "6"
         vif_id = str(uuid.uuid4())
         mac = "ca:fe:de:ad:be:ef"
 
-        utils.execute(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                      root_helper=self.root_helper).AndReturn("%s\n" % pname)
-
         if is_xen:
-            external_ids = ('{xs-vif-uuid="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {"xs-vif-uuid": vif_id, "attached-mac": mac}
         else:
-            external_ids = ('{iface-id="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {"iface-id": vif_id, "attached-mac": mac}
 
-        utils.execute(["ovs-vsctl", self.TO, "get",
-                       "Interface", pname, "external_ids"],
-                      root_helper=self.root_helper).AndReturn(external_ids)
-        utils.execute(["ovs-vsctl", self.TO, "get",
-                       "Interface", pname, "ofport"],
-                      root_helper=self.root_helper).AndReturn(ofport)
+        self._expect_port_interfaces(
+            [pname, "patch-tun"],
+            [(pname, 6, external_ids), ("patch-tun", 1, {}),
+             ("tap-other-bridge", 2, external_ids)])
         if is_xen:
             utils.execute(["xe", "vif-param-get", "param-name=other-config",
                            "param-key=nicira-iface-id", "uuid=" + vif_id],
@@ -267,3 +278,59 @@ class OVS_Lib_Test(unittest.TestCase):
         self.mox.ReplayAll()
         self.br.clear_db_attribute("Port", pname, "tag")
         self.mox.VerifyAll()
+
+    def test_get_vif_ports_forks_twice(self):
+        ports = [("tap%d" % i, i, {"iface-id": str(uuid.uuid4()),
+                                   "attached-mac": "ca:fe:de:ad:be:ef"})
+                 for i in range(300)]
+        ports.append(("tap-unready", ["set", []], ports[0][2]))
+        self._expect_port_interfaces([p[0] for p in ports], ports)
+        self.mox.ReplayAll()
+
+        vif_ports = self.br.get_vif_ports()
+        self.assertEqual([p.port_name for p in vif_ports],
+                         [p[0] for p in ports])
+        self.assertEqual(vif_ports[299].ofport, "299")
+        # an interface without an ofport yet, as "ovs-vsctl get" prints it
+        self.assertEqual(vif_ports[300].ofport, "[]")
+        self.mox.VerifyAll()
+
+    def test_deferred_flows(self):
+        utils.execute(["ovs-ofctl", "add-flows", self.BR_NAME, "-"],
+                      root_helper=self.root_helper,
+                      process_input="hard_timeout=0,idle_timeout=0,"
+                                    "priority=2,in_port=1,actions=drop\n"
+                                    "hard_timeout=0,idle_timeout=0,"
+                                    "priority=2,in_port=2,actions=drop\n")
+        utils.execute(["ovs-ofctl", "del-flows", self.BR_NAME, "in_port=3"],
+                      root_helper=self.root_helper)
+        self.mox.ReplayAll()
+
+        with self.br.deferred_flows():
+            self.br.add_flow(priority=2, in_port=1, actions="drop")
+            with self.br.deferred_flows():
+                self.br.add_flow(priority=2, in_port=2, actions="drop")
+            self.br.delete_flows(in_port=3)
+        self.mox.VerifyAll()
+
+    def test_deferred_remove_all_flows_replaces_flows(self):
+        flows = ("hard_timeout=0,idle_timeout=0,priority=1,"
+                 "actions=normal\n")
+        utils.execute(["ovs-ofctl", "replace-flows", self.BR_NAME,
+                       "--bundle", "-"], root_helper=self.root_helper,
+                      process_input=flows).AndRaise(RuntimeError())
+        utils.execute(["ovs-ofctl", "replace-flows", self.BR_NAME, "-"],
+                      root_helper=self.root_helper, process_input=flows)
+        utils.execute(["ovs-ofctl", "replace-flows", self.BR_NAME, "-"],
+                      root_helper=self.root_helper, process_input=flows)
+        self.mox.ReplayAll()
+
+        self.mox.StubOutWithMock(ovs_lib, "_ofctl_bundle_supported")
+        ovs_lib._ofctl_bundle_supported = None
+        for i in range(2):
+            with self.br.deferred_flows():
+                self.br.delete_flows(in_port=3)
+                self.br.remove_all_flows()
+                self.br.add_flow(priority=1, actions="normal")
+        self.assertEqual(ovs_lib._ofctl_bundle_supported, False)
+        self.mox.VerifyAll()
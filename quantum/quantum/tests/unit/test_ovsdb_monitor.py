@@ -0,0 +1,159 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012, Nicira, Inc.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import unittest
+
+from quantum.agent.linux import ovs_lib, ovsdb_monitor
+
+
+HEADINGS = ["row", "action", "name", "ofport", "external_ids"]
+
+
+def _row(action, name, ofport, vif_id=None):
+    external_ids = ["map", []]
+    if vif_id:
+        external_ids = ["map", [["attached-mac", "ca:fe:de:ad:be:ef"],
+                                ["iface-id", vif_id]]]
+    return ["uuid-" + name, action, name, ofport, external_ids]
+
+
+class FakeProcess(object):
+    def __init__(self):
+        read_fd, self.write_fd = os.pipe()
+        self.stdout = os.fdopen(read_fd)
+
+    def poll(self):
+        return None
+
+    def write(self, *rows):
+        line = json.dumps({"headings": HEADINGS, "data": list(rows)})
+        os.write(self.write_fd, line + "\n")
+
+
+class FakeBridge(ovs_lib.OVSBridge):
+    def __init__(self):
+        ovs_lib.OVSBridge.__init__(self, "br-int", None)
+        self.ports = {}
+        self.listings = 0
+
+    def get_port_name_list(self):
+        return self.ports.keys()
+
+    def get_vif_ports(self):
+        self.listings += 1
+        return [self.get_vif_port(name, ofport, {"iface-id": vif_id,
+                                                 "attached-mac": "mac"})
+                for name, (ofport, vif_id) in self.ports.items()]
+
+
+class FakeMonitor(object):
+    def __init__(self):
+        self.updates = []
+
+    def is_running(self):
+        return True
+
+    def get_updates(self, timeout):
+        if self.updates:
+            return self.updates.pop(0)
+        return {}, set()
+
+
+class OvsdbMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = ovsdb_monitor.OvsdbMonitor(None)
+        self.monitor._process = self.process = FakeProcess()
+
+    def test_get_updates(self):
+        self.process.write(_row("initial", "tap1", 1, "vif1"),
+                           _row("initial", "tap2", ["set", []]))
+        self.process.write(_row("delete", "tap2", ["set", []]),
+                           _row("old", "tap1", 1))
+        updates, deletes = self.monitor.get_updates(1)
+        self.assertEqual(deletes, set(["tap2"]))
+        self.assertEqual(updates.keys(), ["tap1"])
+        self.assertEqual(updates["tap1"]["ofport"], 1)
+        self.assertEqual(updates["tap1"]["external_ids"]["iface-id"], "vif1")
+        self.assertEqual(self.monitor.get_updates(0), ({}, set()))
+
+    def test_partial_line_is_kept(self):
+        line = json.dumps({"headings": HEADINGS,
+                           "data": [_row("insert", "tap1", 1, "vif1")]})
+        os.write(self.process.write_fd, line[:10])
+        self.assertEqual(self.monitor.get_updates(0), ({}, set()))
+        os.write(self.process.write_fd, line[10:] + "\n")
+        self.assertEqual(self.monitor.get_updates(0)[0].keys(), ["tap1"])
+
+
+class VifPortWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = FakeBridge()
+        self.bridge.ports = {"tap1": ("1", "vif1"), "tap2": ("2", "vif2")}
+        self.monitor = FakeMonitor()
+        self.watcher = ovsdb_monitor.VifPortWatcher(self.bridge, self.monitor)
+        full, ports, gone = self.watcher.get_changes()
+        self.assertTrue(full)
+        self.assertEqual(sorted(p.vif_id for p in ports), ["vif1", "vif2"])
+
+    def _update(self, updates=None, deletes=()):
+        self.monitor.updates.append((updates or {}, set(deletes)))
+        return self.watcher.get_changes()
+
+    def test_changes_are_incremental(self):
+        self.bridge.ports["tap3"] = ("3", "vif3")
+        full, ports, gone = self._update(
+            {"tap3": {"name": "tap3", "ofport": 3,
+                      "external_ids": {"iface-id": "vif3",
+                                       "attached-mac": "mac"}}},
+            ["tap1"])
+        self.assertFalse(full)
+        self.assertEqual([p.vif_id for p in ports], ["vif3"])
+        self.assertEqual(ports[0].ofport, "3")
+        self.assertEqual([p.vif_id for p in gone], ["vif1"])
+        self.assertEqual(sorted(self.watcher.vif_ports), ["vif2", "vif3"])
+        self.assertEqual(self.bridge.listings, 1)
+
+    def test_replugged_port_is_reported_gone_and_changed(self):
+        full, ports, gone = self._update(
+            {"tap2": {"name": "tap2", "ofport": 7,
+                      "external_ids": {"iface-id": "vif2",
+                                       "attached-mac": "mac"}}},
+            ["tap2"])
+        self.assertEqual([p.ofport for p in gone], ["2"])
+        self.assertEqual([p.ofport for p in ports], ["7"])
+
+    def test_ports_of_other_bridges_and_unready_ports_are_ignored(self):
+        full, ports, gone = self._update(
+            {"tap9": {"name": "tap9", "ofport": 9,
+                      "external_ids": {"iface-id": "vif9",
+                                       "attached-mac": "mac"}},
+             "tap2": {"name": "tap2", "ofport": [],
+                      "external_ids": {"iface-id": "vif2",
+                                       "attached-mac": "mac"}}})
+        self.assertEqual(ports, [])
+        self.assertEqual([p.vif_id for p in gone], ["vif2"])
+
+    def test_resync(self):
+        self.watcher.request_resync()
+        del self.bridge.ports["tap1"]
+        full, ports, gone = self.watcher.get_changes()
+        self.assertTrue(full)
+        self.assertEqual([p.vif_id for p in ports], ["vif2"])
+        self.assertEqual([p.vif_id for p in gone], ["vif1"])
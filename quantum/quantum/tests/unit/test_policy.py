@@ -0,0 +1,120 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from quantum.common import exceptions
+from quantum import context
+from quantum import policy
+
+
+RULES = {
+    "admin_or_owner": [["role:admin"], ["tenant_id:%(tenant_id)s"]],
+    "default": [["rule:admin_or_owner"]],
+    "create_port": [],
+    "get_port": [["rule:admin_or_owner"]],
+    "delete_port": [["role:admin"]],
+    "update_port": [["role:admin", "tenant_id:%(tenant_id)s"]],
+    "get_network": [["tenant_id:tenant1"]],
+}
+
+
+class PolicyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        policy.reset()
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'policy.json')
+        self._write(RULES)
+        policy._POLICY_PATH = self.path
+        self.user = context.Context('fake', 'tenant1', roles=['member'])
+        self.admin = context.Context('fake', 'tenant2', roles=['admin'])
+        self.ports = [{'id': i, 'tenant_id': 'tenant%d' % (i % 3)}
+                      for i in range(9)]
+
+    def tearDown(self):
+        policy.reset()
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, rules, mtime=None):
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(rules))
+        if mtime:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_check(self):
+        port = {'tenant_id': 'tenant1'}
+        self.assertTrue(policy.check(self.user, 'get_port', port))
+        self.assertTrue(policy.check(self.user, 'create_port', port))
+        self.assertFalse(policy.check(self.user, 'delete_port', port))
+        self.assertFalse(policy.check(self.user, 'get_port',
+                                      {'tenant_id': 'tenant2'}))
+        self.assertTrue(policy.check(self.admin, 'get_port', port))
+        self.assertFalse(policy.check(self.admin, 'update_port', port))
+
+    def test_unknown_action_uses_default_rule(self):
+        self.assertTrue(policy.check(self.user, 'get_thing',
+                                     {'tenant_id': 'tenant1'}))
+        self.assertFalse(policy.check(self.user, 'get_thing',
+                                      {'tenant_id': 'tenant2'}))
+
+    def test_enforce(self):
+        policy.enforce(self.user, 'get_port', {'tenant_id': 'tenant1'})
+        self.assertRaises(exceptions.PolicyNotAuthorized, policy.enforce,
+                          self.user, 'get_port', {'tenant_id': 'tenant2'})
+
+    def test_filter_matches_check(self):
+        for ctx in (self.user, self.admin):
+            for action in ('get_port', 'delete_port', 'update_port',
+                           'get_network'):
+                expected = [port for port in self.ports
+                            if policy.check(ctx, action, port)]
+                self.assertEqual(policy.filter(ctx, action, self.ports),
+                                 expected)
+
+    def test_filter_without_substitution(self):
+        self.assertEqual(policy.filter(self.user, 'get_network', self.ports),
+                         self.ports)
+        self.assertEqual(policy.filter(self.admin, 'get_network',
+                                       self.ports), [])
+
+    def test_filter_evaluates_context_once(self):
+        with mock.patch.object(self.admin, 'to_dict',
+                               wraps=self.admin.to_dict) as to_dict:
+            self.assertEqual(policy.filter(self.admin, 'get_port',
+                                           self.ports), self.ports)
+        self.assertEqual(to_dict.call_count, 1)
+
+    def test_policy_file_is_read_once(self):
+        policy.init()
+        with mock.patch('__builtin__.open') as mock_open:
+            for port in self.ports:
+                policy.check(self.user, 'get_port', port)
+        self.assertFalse(mock_open.called)
+
+    def test_policy_file_reloaded_when_changed(self):
+        port = {'tenant_id': 'tenant1'}
+        self.assertTrue(policy.check(self.user, 'get_port', port))
+        rules = dict(RULES, get_port=[["role:admin"]])
+        self._write(rules, mtime=os.path.getmtime(self.path) + 10)
+        self.assertFalse(policy.check(self.user, 'get_port', port))
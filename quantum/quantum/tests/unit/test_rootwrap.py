@@ -0,0 +1,105 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import unittest
+
+from quantum.rootwrap import daemon
+from quantum.rootwrap import filters
+from quantum.rootwrap import wrapper
+
+
+COMMANDS = [
+    ["ovs-vsctl", "--timeout=2", "list-ports", "br-int"],
+    ["ovs-ofctl", "add-flows", "br-int", "-"],
+    ["ovsdb-client", "monitor", "Interface", "name", "--format=json"],
+    ["ip", "link", "show", "dev", "tap0"],
+    ["brctl", "addif", "brq0", "tap0"],
+    ["iptables-restore"],
+    ["cat", "/etc/passwd"],
+    ["rm", "-rf", "/"],
+    ["kill", "-9", "1"],
+]
+
+
+class CountingFilter(filters.CommandFilter):
+    calls = 0
+
+    def match(self, userargs):
+        CountingFilter.calls += 1
+        return filters.CommandFilter.match(self, userargs)
+
+
+def linear_match(filter_list, userargs):
+    found_filter = None
+    for f in filter_list:
+        if f.match(userargs):
+            if not os.access(f.exec_path, os.X_OK):
+                found_filter = found_filter or f
+                continue
+            return f
+    return found_filter
+
+
+class RootwrapFiltersTest(unittest.TestCase):
+
+    def test_regexp_filter(self):
+        f = filters.RegExpFilter("/sbin/ip", "root", "ip", "link", "set",
+                                 "tap[0-9a-f-]+", "(up|down)")
+        self.assertEqual(f.get_exec_name(), "ip")
+        self.assertTrue(f.match(["ip", "link", "set", "tap1f", "up"]))
+        self.assertFalse(f.match(["ip", "link", "set", "tap1f", "upx"]))
+        self.assertFalse(f.match(["ip", "link", "set", "eth0", "up"]))
+        self.assertFalse(f.match(["ip", "link", "set", "tap1f"]))
+
+    def test_badly_formed_regexp_filter(self):
+        f = filters.RegExpFilter("/sbin/ip", "root", "ip", "(")
+        self.assertFalse(f.match(["ip", "("]))
+
+    def test_same_matches_as_linear_search(self):
+        filter_list = wrapper.load_filters() + [
+            filters.KillFilter("/bin/kill", "root", ["-9"], ["/bin/sleep"]),
+            filters.ReadFileFilter("/etc/passwd"),
+            filters.RegExpFilter("/bin/ls", "root", "l[s]", "-l"),
+            filters.DnsmasqFilter("/usr/sbin/dnsmasq", "root")]
+        index = wrapper.FilterIndex(filter_list)
+        for cmd in COMMANDS + [["ls", "-l"], ["FLAGFILE=x", "NETWORK_ID=y",
+                                              "dnsmasq", "--test"]]:
+            self.assertTrue(wrapper.match_filter(index, cmd) is
+                            linear_match(filter_list, cmd), cmd)
+
+    def test_only_filters_for_the_command_are_tried(self):
+        filter_list = [CountingFilter(f.exec_path, f.run_as)
+                       for f in wrapper.load_filters()]
+        index = wrapper.FilterIndex(filter_list)
+        CountingFilter.calls = 0
+        for cmd in COMMANDS:
+            wrapper.match_filter(index, cmd)
+        # Two paths are allowed for most commands
+        self.assertTrue(CountingFilter.calls <= 2 * len(COMMANDS))
+        CountingFilter.calls = 0
+        for cmd in COMMANDS:
+            linear_match(filter_list, cmd)
+        self.assertTrue(CountingFilter.calls > 5 * len(COMMANDS))
+
+    def test_run_command(self):
+        filter_list = [filters.CommandFilter("/bin/cat", "root")]
+        self.assertEqual(daemon.run_command(filter_list, ["cat"], "foo"),
+                         (0, "foo", ""))
+        returncode, stdout, stderr = daemon.run_command(filter_list,
+                                                        ["ls", "/"])
+        self.assertEqual(returncode, daemon.RC_UNAUTHORIZED)
+        self.assertEqual(stdout, "")
@@ -0,0 +1,180 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import sqlalchemy as sa
+from sqlalchemy.ext import declarative
+from sqlalchemy import orm
+
+from quantum.db import vlan_allocator
+
+
+BASE = declarative.declarative_base()
+
+
+class VlanID(BASE):
+    __tablename__ = 'test_vlan_ids'
+
+    vlan_id = sa.Column(sa.Integer, primary_key=True)
+    vlan_used = sa.Column(sa.Boolean)
+
+
+class VlanAllocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.allocator = vlan_allocator.VlanAllocator(10, 14)
+
+    def test_allocate_lowest_first(self):
+        self.assertEqual([self.allocator.allocate() for i in range(5)],
+                         [10, 11, 12, 13, 14])
+        self.assertEqual(self.allocator.allocate(), None)
+
+    def test_mark_used_splits_range(self):
+        self.assertTrue(self.allocator.mark_used(12))
+        self.assertFalse(self.allocator.mark_used(12))
+        self.assertFalse(self.allocator.is_free(12))
+        self.assertEqual(self.allocator.free_count(), 4)
+        self.assertEqual([self.allocator.allocate() for i in range(4)],
+                         [10, 11, 13, 14])
+
+    def test_mark_free_merges_ranges(self):
+        for vlan_id in (11, 12, 13):
+            self.allocator.mark_used(vlan_id)
+        self.assertTrue(self.allocator.mark_free(12))
+        self.assertFalse(self.allocator.mark_free(12))
+        self.allocator.mark_free(11)
+        self.allocator.mark_free(13)
+        self.assertEqual(self.allocator._starts, [10])
+        self.assertEqual(self.allocator._ends, [14])
+
+    def test_mark_out_of_range(self):
+        self.assertFalse(self.allocator.mark_used(9))
+        self.assertFalse(self.allocator.mark_used(15))
+        self.assertTrue(self.allocator.mark_free(20))
+        self.assertTrue(self.allocator.is_free(20))
+
+    def test_load(self):
+        self.allocator.load([7, 3, 4, 5, 9])
+        self.assertEqual(self.allocator.free_count(), 5)
+        self.assertEqual(self.allocator._starts, [3, 7, 9])
+        self.assertEqual(self.allocator._ends, [5, 7, 9])
+
+
+class DbVlanAllocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        engine = sa.create_engine('sqlite://')
+        BASE.metadata.create_all(engine)
+        self.maker = orm.sessionmaker(bind=engine, autocommit=True)
+        session = self.maker()
+        with session.begin():
+            for vlan_id in range(100, 105):
+                session.add(VlanID(vlan_id=vlan_id, vlan_used=False))
+        self.allocator = vlan_allocator.DbVlanAllocator(VlanID)
+
+    def _used(self):
+        session = self.maker()
+        return sorted(row.vlan_id for row in
+                      session.query(VlanID).filter_by(vlan_used=True))
+
+    def test_reserve_and_release(self):
+        session = self.maker()
+        self.assertEqual(self.allocator.reserve(session), 100)
+        self.assertEqual(self.allocator.reserve(session), 101)
+        self.assertEqual(self._used(), [100, 101])
+        self.assertTrue(self.allocator.release(session, 100))
+        self.assertEqual(self._used(), [101])
+        self.assertEqual(self.allocator.reserve(session), 100)
+
+    def test_release_unknown_vlan(self):
+        self.assertFalse(self.allocator.release(self.maker(), 4000))
+
+    def test_servers_never_share_a_vlan(self):
+        other = vlan_allocator.DbVlanAllocator(VlanID)
+        session = self.maker()
+        self.assertEqual(self.allocator.reserve(session), 100)
+        # The other server loaded the free VLANs before the first one
+        # reserved 100, so its conditional update of 100 fails
+        other.load(range(100, 105))
+        other._loaded = True
+        self.assertEqual(other.reserve(session), 101)
+        self.assertEqual(self._used(), [100, 101])
+
+    def test_reserve_sees_vlans_released_elsewhere(self):
+        session = self.maker()
+        other = vlan_allocator.DbVlanAllocator(VlanID)
+        reserved = [self.allocator.reserve(session) for i in range(5)]
+        self.assertEqual(self.allocator.reserve(session), None)
+        other.release(session, reserved[2])
+        self.assertEqual(self.allocator.reserve(session), reserved[2])
+
+    def test_release_outside_range_deletes_row(self):
+        session = self.maker()
+        allocator = vlan_allocator.DbVlanAllocator(VlanID, 100, 103)
+        self.assertEqual([allocator.reserve(session) for i in range(5)],
+                         [100, 101, 102, 103, None])
+        session.query(VlanID).filter_by(vlan_id=104).update(
+            {'vlan_used': True})
+        self.assertTrue(allocator.release(session, 104))
+        self.assertEqual(session.query(VlanID).get(104), None)
+
+
+class SyncVlanIdsTest(unittest.TestCase):
+
+    def setUp(self):
+        engine = sa.create_engine('sqlite://')
+        BASE.metadata.create_all(engine)
+        self.maker = orm.sessionmaker(bind=engine, autocommit=True)
+
+    def _rows(self):
+        session = self.maker()
+        return [(row.vlan_id, row.vlan_used) for row in
+                session.query(VlanID).order_by(VlanID.vlan_id)]
+
+    def test_ranges(self):
+        self.assertEqual(vlan_allocator.to_ranges([5, 1, 2, 3, 7, 8]),
+                         [(1, 3), (5, 5), (7, 8)])
+        self.assertEqual(
+            vlan_allocator.subtract_ranges([(1, 10), (20, 30)],
+                                           [(3, 4), (8, 22)]),
+            [(1, 2), (5, 7), (23, 30)])
+
+    def test_initial_population_in_chunks(self):
+        chunk_size = vlan_allocator.INSERT_CHUNK_SIZE
+        vlan_allocator.INSERT_CHUNK_SIZE = 7
+        try:
+            self.assertEqual(
+                vlan_allocator.sync_vlan_ids(self.maker(), VlanID, 1, 100),
+                (100, 0))
+        finally:
+            vlan_allocator.INSERT_CHUNK_SIZE = chunk_size
+        self.assertEqual(self._rows(), [(v, False) for v in range(1, 101)])
+        self.assertEqual(
+            vlan_allocator.sync_vlan_ids(self.maker(), VlanID, 1, 100),
+            (0, 0))
+
+    def test_range_change_keeps_used_vlans(self):
+        session = self.maker()
+        vlan_allocator.sync_vlan_ids(session, VlanID, 10, 20)
+        session.query(VlanID).filter_by(vlan_id=11).update(
+            {'vlan_used': True})
+        self.assertEqual(
+            vlan_allocator.sync_vlan_ids(session, VlanID, 15, 25),
+            (5, 4))
+        self.assertEqual(self._rows(),
+                         [(11, True)] + [(v, False) for v in range(15, 26)])
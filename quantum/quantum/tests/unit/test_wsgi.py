@@ -0,0 +1,388 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2012 OpenStack, LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import signal
+import socket
+import tempfile
+import time
+import timeit
+import unittest
+import urllib2
+from xml.dom import minidom
+
+import eventlet
+
+from quantum.api import networks
+from quantum.common import config
+from quantum.openstack.common import cfg
+from quantum import wsgi
+
+
+def pid_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid())]
+
+
+class Ticker(object):
+    """Background work counting how often it got to run"""
+
+    def __init__(self):
+        self.ticks = 0
+        self.running = False
+
+    def start(self):
+        self.running = True
+        eventlet.spawn_n(self._tick)
+
+    def _tick(self):
+        while self.running:
+            self.ticks += 1
+            eventlet.sleep(0.01)
+
+    def app(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [str(self.ticks)]
+
+
+class ServerWorkersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = wsgi.Server("test")
+        self.server.start(pid_app, 0, host='127.0.0.1', workers=2)
+        self.url = "http://127.0.0.1:%d/" % (
+            self.server._socket.getsockname()[1])
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _get_pid(self):
+        return int(urllib2.urlopen(self.url, timeout=10).read())
+
+    def test_served_by_workers(self):
+        self.assertEqual(len(self.server._children), 2)
+        for i in range(4):
+            self.assertTrue(self._get_pid() in self.server._children)
+
+    def test_worker_exits_on_sighup(self):
+        pid = self._get_pid()
+        os.kill(pid, signal.SIGHUP)
+        self.assertEqual(os.waitpid(pid, 0), (pid, 0))
+        del self.server._children[pid]
+        # The other worker is still serving
+        self.assertTrue(self._get_pid() in self.server._children)
+
+    def test_stop(self):
+        children = list(self.server._children)
+        self.server.stop()
+        self.assertEqual(self.server._children, {})
+        for pid in children:
+            self.assertRaises(OSError, os.kill, pid, 0)
+
+
+def extensions_path_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [cfg.CONF.api_extensions_path]
+
+
+class ServerReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.config_file = tempfile.mkstemp()
+        os.close(fd)
+        self._write_config('first')
+        config.parse(['--config-file', self.config_file])
+        self.supervisor = None
+
+    def tearDown(self):
+        if self.supervisor:
+            os.kill(self.supervisor, signal.SIGTERM)
+            os.waitpid(self.supervisor, 0)
+        os.remove(self.config_file)
+        cfg.CONF.reset()
+
+    def _write_config(self, extensions_path):
+        with open(self.config_file, 'w') as f:
+            f.write('[DEFAULT]\napi_extensions_path = %s\n' % extensions_path)
+
+    def _load(self):
+        config.reload_config()
+        return extensions_path_app
+
+    def _get(self, url, expected):
+        """Waits for the workers to serve the expected response"""
+        deadline = time.time() + 10
+        while True:
+            try:
+                body = urllib2.urlopen(url, timeout=10).read()
+            except urllib2.URLError:
+                body = None
+            if body == expected or time.time() > deadline:
+                return body
+            time.sleep(0.1)
+
+    def test_sighup_reloads_the_configuration(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        # The parent supervising the workers runs until it gets SIGTERM
+        self.supervisor = os.fork()
+        if not self.supervisor:
+            try:
+                server = wsgi.Server("test")
+                server.start(extensions_path_app, port, host='127.0.0.1',
+                             workers=1, loader=self._load)
+                server.wait()
+            finally:
+                os._exit(0)
+        url = 'http://127.0.0.1:%d/' % port
+        self.assertEqual(self._get(url, 'first'), 'first')
+        self._write_config('second')
+        os.kill(self.supervisor, signal.SIGHUP)
+        self.assertEqual(self._get(url, 'second'), 'second')
+
+    def test_reload_replaces_the_serving_hooks(self):
+        def old_hook():
+            pass
+
+        def new_hook():
+            pass
+
+        def load():
+            wsgi.call_when_serving(new_hook)
+            return extensions_path_app
+
+        wsgi.call_when_serving(old_hook)
+        server = wsgi.Server("test")
+        server._loader = load
+        try:
+            server._reload_application()
+            self.assertEqual(wsgi._SERVING_HOOKS, [new_hook])
+            self.assertEqual(server._application, extensions_path_app)
+        finally:
+            del wsgi._SERVING_HOOKS[:]
+
+    def test_failed_reload_keeps_the_application(self):
+        def hook():
+            pass
+
+        def load():
+            raise RuntimeError()
+
+        wsgi.call_when_serving(hook)
+        server = wsgi.Server("test")
+        server._application = pid_app
+        server._loader = load
+        try:
+            server._reload_application()
+            self.assertEqual(wsgi._SERVING_HOOKS, [hook])
+            self.assertEqual(server._application, pid_app)
+        finally:
+            del wsgi._SERVING_HOOKS[:]
+
+
+def minidom_xml_node(doc, metadata, nodename, data):
+    """The DOM the serializers used to build, to compare with"""
+    result = doc.createElement(nodename)
+    xmlns = metadata.get('xmlns', None)
+    if xmlns:
+        result.setAttribute('xmlns', xmlns)
+    if isinstance(data, list):
+        collections = metadata.get('list_collections', {})
+        if nodename in collections:
+            metadata = collections[nodename]
+            for item in data:
+                node = doc.createElement(metadata['item_name'])
+                node.setAttribute(metadata['item_key'], str(item))
+                result.appendChild(node)
+            return result
+        singular = metadata.get('plurals', {}).get(nodename, None)
+        if singular is None:
+            if nodename.endswith('s'):
+                singular = nodename[:-1]
+            else:
+                singular = 'item'
+        for item in data:
+            node = minidom_xml_node(doc, metadata, singular, item)
+            result.appendChild(node)
+    elif isinstance(data, dict):
+        collections = metadata.get('dict_collections', {})
+        if nodename in collections:
+            metadata = collections[nodename]
+            for k, v in data.items():
+                node = doc.createElement(metadata['item_name'])
+                node.setAttribute(metadata['item_key'], str(k))
+                text = doc.createTextNode(str(v))
+                node.appendChild(text)
+                result.appendChild(node)
+            return result
+        attrs = metadata.get('attributes', {}).get(nodename, {})
+        for k, v in data.items():
+            if k in attrs:
+                result.setAttribute(k, str(v))
+            else:
+                node = minidom_xml_node(doc, metadata, k, v)
+                result.appendChild(node)
+    else:
+        node = doc.createTextNode(str(data))
+        result.appendChild(node)
+    return result
+
+
+def minidom_dict_serialize(metadata, xmlns, data):
+    root_key = data.keys()[0]
+    node = minidom_xml_node(minidom.Document(), metadata, root_key,
+                            data[root_key])
+    if xmlns is not None:
+        node.setAttribute('xmlns', xmlns)
+    return node.toxml('UTF-8')
+
+
+def minidom_serialize(metadata, default_xmlns, data):
+    root_key = data.keys()[0]
+    node = minidom_xml_node(minidom.Document(), metadata, root_key,
+                            data[root_key])
+    if not node.getAttribute('xmlns') and default_xmlns:
+        node.setAttribute('xmlns', default_xmlns)
+    return node.toprettyxml(indent='', newl='')
+
+
+METADATA = {
+    'attributes': {'network': ['id', 'name'], 'port': ['id', 'state'],
+                   'attachment': ['id']},
+    'plurals': {'networks': 'network', 'ports': 'port', 'mixes': 'mix'},
+    'list_collections': {'tags': {'item_name': 'tag', 'item_key': 'value'}},
+    'dict_collections': {'metadata': {'item_name': 'meta',
+                                      'item_key': 'key'}},
+}
+
+DATA = [
+    {'networks': []},
+    {'network': {}},
+    {'network': {'id': 'n1', 'name': '<a & "b">', 'ports': [],
+                 'description': ''}},
+    {'network': {'id': 'n1', 'name': u'net', u'caf\xe9': u'ascii',
+                 'ports': [{'id': 'p1', 'state': 'ACTIVE',
+                            'attachment': {'id': 'vif1'}},
+                           {'id': 'p2', 'state': 'DOWN'}]}},
+    {'networks': [{'id': 'n1', 'tags': ['a', 'b&c'],
+                   'metadata': {'k1': 'v1', 'k&2': '', 'k3': 3}}]},
+    {'mixes': [1, None, True, 'text', ['nested'], {'x': 'y'}]},
+    {'things': [{'value': 1}], 'tags': []},
+]
+
+
+def port_list(count):
+    return {'ports': [{'id': 'port-%d' % i, 'state': 'ACTIVE',
+                       'attachment': {'id': 'vif-%d' % i}}
+                      for i in range(count)]}
+
+
+class XMLSerializationTest(unittest.TestCase):
+
+    def test_same_output_as_minidom(self):
+        for metadata in (METADATA, dict(METADATA, xmlns='http://ns/1')):
+            for xmlns in (None, 'http://ns/2'):
+                serializer = wsgi.XMLDictSerializer(metadata, xmlns)
+                legacy = wsgi.Serializer({'application/xml': metadata},
+                                         xmlns)
+                for data in DATA:
+                    self.assertEqual(
+                        serializer.serialize(data),
+                        minidom_dict_serialize(metadata, xmlns, data))
+                    self.assertEqual(
+                        legacy.serialize(data, 'application/xml'),
+                        minidom_serialize(metadata, xmlns, data))
+
+    def test_api_metadata(self):
+        metadata = networks.ControllerV11._serialization_metadata
+        serializer = wsgi.XMLDictSerializer(metadata, 'http://ns')
+        data = {'network': {'id': 'n1', 'name': 'net',
+                            'ports': port_list(3)['ports']}}
+        self.assertEqual(serializer.serialize(data),
+                         minidom_dict_serialize(metadata, 'http://ns', data))
+
+
+def benchmark(number=20):
+    """Prints the time to serialize a list of ports with minidom and
+    with the serializers"""
+    metadata = networks.ControllerV11._serialization_metadata
+    serializer = wsgi.XMLDictSerializer(metadata, 'http://ns')
+    for count in (10, 1000, 10000):
+        data = port_list(count)
+        timings = [
+            ('minidom', lambda: minidom_dict_serialize(metadata, 'http://ns',
+                                                       data)),
+            ('XMLDictSerializer', lambda: serializer.serialize(data))]
+        for name, func in timings:
+            seconds = timeit.timeit(func, number=number)
+            print '%-20s %6d ports %10.2f msec' % (name, count,
+                                                   seconds * 1e3 / number)
+
+
+if __name__ == '__main__':
+    benchmark()
+
+
+class ServingHooksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ticker = Ticker()
+        self.server = wsgi.Server("test")
+        wsgi.call_when_serving(self.ticker.start)
+
+    def tearDown(self):
+        wsgi._SERVING_HOOKS.remove(self.ticker.start)
+        wsgi._serving = False
+        self.ticker.running = False
+        self.server.stop()
+
+    def _get_ticks(self):
+        url = "http://127.0.0.1:%d/" % self.server._socket.getsockname()[1]
+        return int(urllib2.urlopen(url, timeout=10).read())
+
+    def test_background_work_runs_in_workers(self):
+        self.server.start(self.ticker.app, 0, host='127.0.0.1', workers=1)
+        time.sleep(0.3)
+        self.assertTrue(self._get_ticks() > 5)
+        self.assertEqual(self.ticker.ticks, 0)
+
+    def test_background_work_runs_without_workers(self):
+        self.server.start(self.ticker.app, 0, host='127.0.0.1')
+        eventlet.sleep(0.1)
+        self.assertTrue(self.ticker.ticks > 5)
+
+    def test_stopping_hooks_run_in_workers(self):
+        fd, stopped_file = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(stopped_file)
+
+        def stopped():
+            open(stopped_file, 'w').close()
+
+        wsgi.call_when_stopping(stopped)
+        try:
+            self.server.start(self.ticker.app, 0, host='127.0.0.1',
+                              workers=1)
+            self._get_ticks()
+            self.assertFalse(os.path.exists(stopped_file))
+            self.server.stop()
+            self.assertTrue(os.path.exists(stopped_file))
+        finally:
+            wsgi._STOPPING_HOOKS.remove(stopped)
+            if os.path.exists(stopped_file):
+                os.remove(stopped_file)
@@ -19,24 +19,35 @@
 Utility methods for working with WSGI servers
 """
 
+import errno
 import logging
+import os
+import signal
 import sys
+import time
 from xml.dom import minidom
 from xml.parsers import expat
 
 import eventlet.wsgi
 eventlet.patcher.monkey_patch(all=False, socket=True)
+import greenlet
 from lxml import etree
 import routes.middleware
 import webob.dec
 import webob.exc
 
 from quantum.common import exceptions as exception
-from quantum.openstack.common import jsonutils
+from quantum.common import json_codec
 
 
 LOG = logging.getLogger(__name__)
 
+# Called by Server in every process serving the application, once it
+# starts and once it stops
+_SERVING_HOOKS = []
+_STOPPING_HOOKS = []
+_serving = False
+
 
 class WritableLogger(object):
     """A thin wrapper that responds to `write` and logs."""
@@ -49,6 +60,44 @@ class WritableLogger(object):
         self.logger.log(self.level, msg.strip("\n"))
 
 
+def call_when_serving(func):
+    """Calls func in each process serving the application, once it does.
+
+    Background work of the application, e.g. green threads polling for
+    jobs in a plugin, must be started this way rather than when it is
+    loaded: with workers, the application is loaded before they are
+    forked, and green threads started until then never run in them.
+    """
+    if _serving:
+        func()
+    else:
+        _SERVING_HOOKS.append(func)
+
+
+def call_when_stopping(func):
+    """Calls func in each process serving the application, once it stops.
+
+    This is where the connections opened by the background work can be
+    closed, after the requests being served have finished.
+    """
+    _STOPPING_HOOKS.append(func)
+
+
+def _start_serving():
+    global _serving
+    _serving = True
+    for func in _SERVING_HOOKS:
+        func()
+
+
+def _stop_serving():
+    for func in _STOPPING_HOOKS:
+        try:
+            func()
+        except Exception:
+            LOG.exception(_("Error while stopping %s"), func)
+
+
 def run_server(application, port):
     """Run a WSGI server with the given application."""
     sock = eventlet.listen(('0.0.0.0', port))
@@ -56,23 +105,182 @@ def run_server(application, port):
 
 
 class Server(object):
-    """Server class to manage multiple WSGI sockets and applications."""
+    """Server class to manage multiple WSGI sockets and applications.
+
+    With workers, the application is served by that many forked processes
+    accepting connections on the same socket, and the parent process only
+    supervises them: it respawns the workers that die, restarts them all
+    on SIGHUP, once each has finished the requests it is serving, and
+    stops them on SIGTERM. Functions given to call_when_serving() and
+    call_when_stopping() are called in each worker, or in this process
+    without workers.
+
+    Given a loader, SIGHUP also reloads the application in the parent
+    before the workers are restarted, so that they serve the new one.
+    Without workers, SIGHUP is not handled.
+    """
 
     def __init__(self, name, threads=1000):
         self.pool = eventlet.GreenPool(threads)
         self.name = name
-
-    def start(self, application, port, host='0.0.0.0', backlog=128):
-        """Run a WSGI server with the given application."""
-        socket = eventlet.listen((host, port), backlog=backlog)
-        self.pool.spawn_n(self._run, application, socket)
+        self._socket = None
+        self._workers = 0
+        # Start times of the worker processes, by pid
+        self._children = {}
+        self._running = False
+        self._reloading = False
+
+    def start(self, application, port, host='0.0.0.0', backlog=128,
+              workers=0, loader=None):
+        """Run a WSGI server with the given application.
+
+        :param workers: the number of worker processes, none to serve from
+            this process.
+        :param loader: returns the application loaded again, called on
+            SIGHUP with workers.
+        """
+        self._socket = eventlet.listen((host, port), backlog=backlog)
+        if workers < 1:
+            _start_serving()
+            self.pool.spawn_n(self._run, application, self._socket)
+            return
+        self._application = application
+        self._loader = loader
+        self._workers = workers
+        self._running = True
+        while len(self._children) < self._workers:
+            self._start_worker()
 
     def wait(self):
         """Wait until all servers have completed running."""
+        if self._workers:
+            self._wait_workers()
+            return
+        try:
+            self.pool.waitall()
+        except KeyboardInterrupt:
+            pass
+        _stop_serving()
+
+    def stop(self):
+        """Stop the worker processes, without waiting for their requests"""
+        self._running = False
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError, e:
+                if e.errno != errno.ESRCH:
+                    raise
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except OSError, e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno != errno.ECHILD:
+                    raise
+                break
+            self._children.pop(pid, None)
+        self._children = {}
+
+    def _start_worker(self):
+        pid = os.fork()
+        if pid:
+            LOG.info(_("Started %(name)s worker %(pid)d"),
+                     {'name': self.name, 'pid': pid})
+            self._children[pid] = time.time()
+            return
+        status = 0
         try:
+            self._run_worker()
+        except BaseException:
+            LOG.exception(_("Unhandled exception in %s worker"), self.name)
+            status = 1
+        # Never return into the parent's code
+        os._exit(status)
+
+    def _run_worker(self):
+        # Do not share the parent's epoll fd with the other workers
+        eventlet.hubs.use_hub()
+        # Interrupting the parent stops its workers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self._children = {}
+        _start_serving()
+        server = eventlet.spawn(self._run, self._application, self._socket)
+        terminating = []
+
+        def _stop_accepting(signo, frame):
+            eventlet.spawn_n(server.kill)
+
+        def _terminate(signo, frame):
+            terminating.append(signo)
+            eventlet.spawn_n(server.kill)
+
+        signal.signal(signal.SIGHUP, _stop_accepting)
+        signal.signal(signal.SIGTERM, _terminate)
+        try:
+            server.wait()
+        except greenlet.GreenletExit:
+            pass
+        if not terminating:
+            # Finish the requests that were accepted
             self.pool.waitall()
+        _stop_serving()
+
+    def _wait_workers(self):
+        def _stop(signo, frame):
+            self._running = False
+
+        def _reload(signo, frame):
+            self._reloading = True
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGHUP, _reload)
+        try:
+            while self._running:
+                if self._reloading:
+                    self._reloading = False
+                    self._reload_application()
+                    LOG.info(_("Restarting %s workers"), self.name)
+                    for pid in self._children:
+                        os.kill(pid, signal.SIGHUP)
+                try:
+                    pid, status = os.wait()
+                except OSError, e:
+                    if e.errno != errno.EINTR:
+                        raise
+                    continue
+                started = self._children.pop(pid, None)
+                if started is None:
+                    continue
+                LOG.info(_("%(name)s worker %(pid)d exited with status "
+                           "%(status)d"),
+                         {'name': self.name, 'pid': pid, 'status': status})
+                if not self._running:
+                    break
+                # Do not respawn workers that fail at once too often
+                if time.time() - started < 1:
+                    time.sleep(1)
+                self._start_worker()
         except KeyboardInterrupt:
             pass
+        self.stop()
+
+    def _reload_application(self):
+        if not self._loader:
+            return
+        LOG.info(_("Reloading %s"), self.name)
+        # The hooks of the new application replace those of the old one
+        hooks = list(_SERVING_HOOKS), list(_STOPPING_HOOKS)
+        del _SERVING_HOOKS[:]
+        del _STOPPING_HOOKS[:]
+        try:
+            self._application = self._loader()
+        except Exception:
+            LOG.exception(_("Unable to reload %s, restarting the workers "
+                            "with the application already loaded"),
+                          self.name)
+            _SERVING_HOOKS[:], _STOPPING_HOOKS[:] = hooks
 
     def _run(self, application, socket):
         """Start a WSGI server in a new green thread."""
@@ -208,7 +416,84 @@ class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization"""
 
     def default(self, data):
-        return jsonutils.dumps(data)
+        return json_codec.dumps(data)
+
+
+def _escape_xml(data):
+    """Escapes text and attribute values the way minidom does"""
+    return (data.replace("&", "&amp;").replace("<", "&lt;").
+            replace("\"", "&quot;").replace(">", "&gt;"))
+
+
+def _write_xml_node(out, metadata, nodename, data, root_attrs=None):
+    """Appends the XML for data to the out list of strings.
+
+    The output is the one minidom used to write for the same data, but
+    no DOM is built.
+
+    :param root_attrs: called with the attributes of the node, by name,
+        before they are written.
+    """
+    start = len(out)
+    # Replaced with the start tag once the attributes are known
+    out.append(None)
+    attrs = {}
+
+    # Set the xml namespace if one is specified
+    # TODO(justinsb): We could also use prefixes on the keys
+    xmlns = metadata.get('xmlns', None)
+    if xmlns:
+        attrs['xmlns'] = xmlns
+
+    #TODO(bcwaldon): accomplish this without a type-check
+    if isinstance(data, list):
+        collections = metadata.get('list_collections', {})
+        if nodename in collections:
+            collection = collections[nodename]
+            for item in data:
+                out.append('<%s %s="%s"/>' % (collection['item_name'],
+                                              collection['item_key'],
+                                              _escape_xml(str(item))))
+        else:
+            singular = metadata.get('plurals', {}).get(nodename, None)
+            if singular is None:
+                if nodename.endswith('s'):
+                    singular = nodename[:-1]
+                else:
+                    singular = 'item'
+            for item in data:
+                _write_xml_node(out, metadata, singular, item)
+    #TODO(bcwaldon): accomplish this without a type-check
+    elif isinstance(data, dict):
+        collections = metadata.get('dict_collections', {})
+        if nodename in collections:
+            collection = collections[nodename]
+            for k, v in data.items():
+                out.append('<%s %s="%s">%s</%s>' % (
+                    collection['item_name'], collection['item_key'],
+                    _escape_xml(str(k)), _escape_xml(str(v)),
+                    collection['item_name']))
+        else:
+            node_attrs = metadata.get('attributes', {}).get(nodename, {})
+            for k, v in data.items():
+                if k in node_attrs:
+                    attrs[k] = str(v)
+                else:
+                    _write_xml_node(out, metadata, k, v)
+    else:
+        # Type is atom. Even an empty text makes an end tag
+        out.append(_escape_xml(str(data)))
+
+    if root_attrs:
+        root_attrs(attrs)
+    tag = [nodename]
+    for name in sorted(attrs):
+        tag.append('%s="%s"' % (name, _escape_xml(attrs[name])))
+    if len(out) > start + 1:
+        out[start] = '<%s>' % ' '.join(tag)
+        out.append('</%s>' % nodename)
+    else:
+        out[start] = '<%s/>' % ' '.join(tag)
 
 
 class XMLDictSerializer(DictSerializer):
@@ -226,10 +511,13 @@ class XMLDictSerializer(DictSerializer):
     def default(self, data):
         # We expect data to contain a single key which is the XML root.
         root_key = data.keys()[0]
-        doc = minidom.Document()
-        node = self._to_xml_node(doc, self.metadata, root_key, data[root_key])
-
-        return self.to_xml_string(node)
+        out = []
+        _write_xml_node(out, self.metadata, root_key, data[root_key],
+                        self._set_xmlns)
+        result = ''.join(out)
+        if isinstance(result, unicode):
+            result = result.encode('UTF-8')
+        return result
 
     def __call__(self, data):
         # Provides a migration path to a cleaner WSGI layer, this
@@ -251,59 +539,9 @@ class XMLDictSerializer(DictSerializer):
         if has_atom:
             node.setAttribute('xmlns:atom', "http://www.w3.org/2005/Atom")
 
-    def _to_xml_node(self, doc, metadata, nodename, data):
-        """Recursive method to convert data members to XML nodes."""
-        result = doc.createElement(nodename)
-
-        # Set the xml namespace if one is specified
-        # TODO(justinsb): We could also use prefixes on the keys
-        xmlns = metadata.get('xmlns', None)
-        if xmlns:
-            result.setAttribute('xmlns', xmlns)
-
-        #TODO(bcwaldon): accomplish this without a type-check
-        if isinstance(data, list):
-            collections = metadata.get('list_collections', {})
-            if nodename in collections:
-                metadata = collections[nodename]
-                for item in data:
-                    node = doc.createElement(metadata['item_name'])
-                    node.setAttribute(metadata['item_key'], str(item))
-                    result.appendChild(node)
-                return result
-            singular = metadata.get('plurals', {}).get(nodename, None)
-            if singular is None:
-                if nodename.endswith('s'):
-                    singular = nodename[:-1]
-                else:
-                    singular = 'item'
-            for item in data:
-                node = self._to_xml_node(doc, metadata, singular, item)
-                result.appendChild(node)
-        #TODO(bcwaldon): accomplish this without a type-check
-        elif isinstance(data, dict):
-            collections = metadata.get('dict_collections', {})
-            if nodename in collections:
-                metadata = collections[nodename]
-                for k, v in data.items():
-                    node = doc.createElement(metadata['item_name'])
-                    node.setAttribute(metadata['item_key'], str(k))
-                    text = doc.createTextNode(str(v))
-                    node.appendChild(text)
-                    result.appendChild(node)
-                return result
-            attrs = metadata.get('attributes', {}).get(nodename, {})
-            for k, v in data.items():
-                if k in attrs:
-                    result.setAttribute(k, str(v))
-                else:
-                    node = self._to_xml_node(doc, metadata, k, v)
-                    result.appendChild(node)
-        else:
-            # Type is atom
-            node = doc.createTextNode(str(data))
-            result.appendChild(node)
-        return result
+    def _set_xmlns(self, attrs):
+        if self.xmlns is not None:
+            attrs['xmlns'] = self.xmlns
 
     def _create_link_nodes(self, xml_doc, links):
         link_nodes = []
@@ -387,7 +625,7 @@ class JSONDeserializer(TextDeserializer):
 
     def _from_json(self, datastring):
         try:
-            return jsonutils.loads(datastring)
+            return json_codec.loads(datastring)
         except ValueError:
             msg = _("cannot understand JSON")
             raise exception.MalformedRequestBody(reason=msg)
@@ -993,7 +1231,7 @@ class Serializer(object):
             raise exception.InvalidContentType(content_type=content_type)
 
     def _from_json(self, datastring):
-        return jsonutils.loads(datastring)
+        return json_codec.loads(datastring)
 
     def _from_xml(self, datastring):
         xmldata = self.metadata.get('application/xml', {})
@@ -1024,68 +1262,17 @@ class Serializer(object):
             return result
 
     def _to_json(self, data):
-        return jsonutils.dumps(data)
+        return json_codec.dumps(data)
 
     def _to_xml(self, data):
         metadata = self.metadata.get('application/xml', {})
         # We expect data to contain a single key which is the XML root.
         root_key = data.keys()[0]
-        doc = minidom.Document()
-        node = self._to_xml_node(doc, metadata, root_key, data[root_key])
-
-        xmlns = node.getAttribute('xmlns')
-        if not xmlns and self.default_xmlns:
-            node.setAttribute('xmlns', self.default_xmlns)
-
-        return node.toprettyxml(indent='', newl='')
-
-    def _to_xml_node(self, doc, metadata, nodename, data):
-        """Recursive method to convert data members to XML nodes."""
-        result = doc.createElement(nodename)
-
-        # Set the xml namespace if one is specified
-        # TODO(justinsb): We could also use prefixes on the keys
-        xmlns = metadata.get('xmlns', None)
-        if xmlns:
-            result.setAttribute('xmlns', xmlns)
-        if isinstance(data, list):
-            collections = metadata.get('list_collections', {})
-            if nodename in collections:
-                metadata = collections[nodename]
-                for item in data:
-                    node = doc.createElement(metadata['item_name'])
-                    node.setAttribute(metadata['item_key'], str(item))
-                    result.appendChild(node)
-                return result
-            singular = metadata.get('plurals', {}).get(nodename, None)
-            if singular is None:
-                if nodename.endswith('s'):
-                    singular = nodename[:-1]
-                else:
-                    singular = 'item'
-            for item in data:
-                node = self._to_xml_node(doc, metadata, singular, item)
-                result.appendChild(node)
-        elif isinstance(data, dict):
-            collections = metadata.get('dict_collections', {})
-            if nodename in collections:
-                metadata = collections[nodename]
-                for k, v in data.items():
-                    node = doc.createElement(metadata['item_name'])
-                    node.setAttribute(metadata['item_key'], str(k))
-                    text = doc.createTextNode(str(v))
-                    node.appendChild(text)
-                    result.appendChild(node)
-                return result
-            attrs = metadata.get('attributes', {}).get(nodename, {})
-            for k, v in data.items():
-                if k in attrs:
-                    result.setAttribute(k, str(v))
-                else:
-                    node = self._to_xml_node(doc, metadata, k, v)
-                    result.appendChild(node)
-        else:
-            # Type is atom.
-            node = doc.createTextNode(str(data))
-            result.appendChild(node)
-        return result
+        out = []
+        _write_xml_node(out, metadata, root_key, data[root_key],
+                        self._set_default_xmlns)
+        return ''.join(out)
+
+    def _set_default_xmlns(self, attrs):
+        if not attrs.get('xmlns') and self.default_xmlns:
+            attrs['xmlns'] = self.default_xmlns
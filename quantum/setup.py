@@ -95,6 +95,7 @@ setuptools.setup(
             'quantum.plugins.openvswitch.agent.ovs_quantum_agent:main',
             'quantum-ryu-agent = '
             'quantum.plugins.ryu.agent.ryu_quantum_agent:main',
+            'quantum-rootwrap-daemon = quantum.rootwrap.daemon:main',
             'quantum-server = quantum.server:main',
         ]
     },